@@ -0,0 +1,75 @@
+"""
+Compare browser profiles on page-load time and bytes transferred. Each
+profile loads the same event and city pages from the fake site, with its
+photos, web font and tracker scripts, until the listings (or the first
+event cards) are on the page:
+
+    python -m benchmarks.browser_profile --pages 30
+
+Both profiles run headless here so that only resource blocking, the eager
+load strategy and the lean switches differ.
+"""
+import argparse
+import statistics
+
+import browser
+import main as crawler
+import tickets
+from benchmarks.common import Timer
+from benchmarks.fake_site import SiteScale, start_fake_site
+from waits import wait_for_any, wait_for_count_above
+
+def page_urls(base_url, scale, pages):
+    urls = []
+    for number in range(1, pages + 1):
+        event_number = (number - 1) % scale.expected_events() + 1
+        urls.append(("event", f"{base_url}/Concert-Tickets/Event-{event_number}/E-{event_number}?quantity=1"))
+        if number % 3 == 0:
+            urls.append(("city", f"{base_url}/State-1/City-{number % scale.cities + 1}"))
+    return urls
+
+def load_page(driver, kind, page_url):
+    driver.get(page_url)
+    if kind == "event":
+        wait_for_any(driver, [tickets.no_tickets_xpath, tickets.ticket_container_xpath], 10, label="listings")
+    else:
+        wait_for_count_above(driver, crawler.event_container_xpath, 0, 10, label="city page")
+
+def measure(profile, server, urls):
+    driver = browser.create_driver(profile)
+    try:
+        load_page(driver, *urls[0])  # Warm up the browser before timing
+        with server.stats_lock:
+            server.bytes_sent = server.requests = 0
+        timings = []
+        for kind, page_url in urls:
+            with Timer() as timer:
+                load_page(driver, kind, page_url)
+            timings.append(timer.elapsed * 1000)
+    finally:
+        driver.quit()
+    return {
+        'p50_ms': statistics.median(timings),
+        'mean_ms': statistics.mean(timings),
+        'kb_per_page': server.bytes_sent / len(urls) / 1024,
+        'requests_per_page': server.requests / len(urls),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Page-load time and bytes per page for each browser profile.")
+    parser.add_argument('--pages', type=int, default=30, help="Event pages to load per profile (plus a city page every third)")
+    args = parser.parse_args()
+
+    scale = SiteScale(assets=True)
+    server, base_url = start_fake_site(scale)
+    urls = page_urls(base_url, scale, args.pages)
+    try:
+        for name in ('compatible', 'performance'):
+            result = measure(browser.profiles[name].with_options(headless=True), server, urls)
+            print(f"{name:<12} p50 {result['p50_ms']:7.1f} ms  mean {result['mean_ms']:7.1f} ms  "
+                  f"{result['kb_per_page']:7.1f} KB/page  {result['requests_per_page']:.1f} requests/page")
+    finally:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
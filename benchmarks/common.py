@@ -0,0 +1,99 @@
+"""
+Helpers shared by the benchmark scripts.
+Run the scripts from the repository root, e.g. `python -m benchmarks.event_extraction`.
+"""
+import pathlib
+import threading
+import time
+
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.remote.command import Command
+from selenium.webdriver.remote.webdriver import WebDriver as RemoteWebDriver
+
+FIXTURES_DIR = pathlib.Path(__file__).resolve().parent / "fixtures"
+
+def fixture_url(name):
+    """file:// URL of a saved HTML page in benchmarks/fixtures."""
+    return (FIXTURES_DIR / name).as_uri()
+
+def headless_driver():
+    chrome_options = Options()
+    chrome_options.add_argument("--headless")
+    chrome_options.add_argument("--no-sandbox")
+    chrome_options.add_argument("--disable-dev-shm-usage")
+    chrome_options.add_argument("--lang=en")
+    return webdriver.Chrome(service=Service(), options=chrome_options)
+
+class RoundTripCounter:
+    """
+    Count WebDriver commands sent by a driver and the elements it hands out.
+    Every WebElement call goes through its parent's execute(), so wrapping the
+    driver instance is enough to see all HTTP round-trips to chromedriver.
+    """
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.count = 0
+        self.by_command = {}
+        self._original = None
+
+    def __enter__(self):
+        self._original = self.driver.execute
+        original = self._original
+
+        def counting_execute(driver_command, params=None):
+            self.count += 1
+            self.by_command[driver_command] = self.by_command.get(driver_command, 0) + 1
+            return original(driver_command, params)
+
+        self.driver.execute = counting_execute
+        return self
+
+    def __exit__(self, *exc):
+        self.driver.execute = self._original
+        return False
+
+class Timer:
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.started
+        return False
+
+class CommandCounter:
+    """
+    Count WebDriver commands across every driver in the process, including
+    drivers created after the counter starts (worker threads make their own).
+    `page_loads` counts driver.get() navigations.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.page_loads = 0
+        self.by_command = {}
+        self._lock = threading.Lock()
+        self._original = None
+
+    def __enter__(self):
+        self._original = RemoteWebDriver.execute
+        original = self._original
+        counter = self
+
+        def counting_execute(driver, driver_command, params=None):
+            with counter._lock:
+                counter.count += 1
+                counter.by_command[driver_command] = counter.by_command.get(driver_command, 0) + 1
+                if driver_command == Command.GET:
+                    counter.page_loads += 1
+            return original(driver, driver_command, params)
+
+        RemoteWebDriver.execute = counting_execute
+        return self
+
+    def __exit__(self, *exc):
+        RemoteWebDriver.execute = self._original
+        return False
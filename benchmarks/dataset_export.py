@@ -0,0 +1,51 @@
+"""
+Time a first (full) partitioned dataset export against the nightly case:
+a second run after a small batch of new tickets, which only reads the rows
+past the watermark.
+
+    python -m benchmarks.dataset_export --rows 200000 --new 2000 --format csv
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+
+import table
+from benchmarks.common import Timer
+from benchmarks.excel_export import make_database
+
+def add_new_tickets(path, count):
+    conn = sqlite3.connect(path)
+    scraped_at = time.time()
+    conn.executemany('''INSERT INTO tickets (ticket_name, ticket_price, event_link, quantity, unique_id, zone, is_vip, scraped_at)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
+                     ((f"Section\n101\nRow\nA\n2 ticket\ns together", "$50", "https://www.viagogo.com/E-0?quantity=2", 2,
+                       f"new-{i}", "Lower Level", 0, scraped_at) for i in range(count)))
+    conn.commit()
+    conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the incremental dataset export.")
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--new', type=int, default=2000)
+    parser.add_argument('--format', choices=['parquet', 'csv'], default='parquet')
+    args = parser.parse_args()
+
+    # The generated rows are committed before each export starts; none needs to settle
+    table.settle_seconds = 0
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "events.db")
+        output_dir = os.path.join(directory, "dataset")
+        make_database(path, args.rows)
+        with Timer() as full:
+            table.export_partitioned_dataset(path, output_dir, args.format)
+        add_new_tickets(path, args.new)
+        with Timer() as incremental:
+            table.export_partitioned_dataset(path, output_dir, args.format)
+
+    print(f"full export of {args.rows} tickets: {full.elapsed:.1f}s")
+    print(f"incremental export of {args.new} new tickets: {incremental.elapsed:.2f}s")
+
+if __name__ == "__main__":
+    main()
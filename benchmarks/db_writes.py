@@ -0,0 +1,78 @@
+"""
+Rows/sec for the per-row commit the scrapers used to do versus the batched
+DatabaseWriter, on a scratch copy of the tickets schema.
+
+    python -m benchmarks.db_writes --rows 20000
+"""
+import argparse
+import hashlib
+import os
+import sqlite3
+import tempfile
+import time
+
+from db_writer import DatabaseWriter
+
+create_tickets_sql = '''
+    CREATE TABLE tickets (
+        ticket_name TEXT,
+        ticket_price REAL,
+        event_link TEXT,
+        quantity INTEGER,
+        unique_id TEXT UNIQUE,
+        event_location TEXT,
+        zone TEXT,
+        is_vip INTEGER
+    )
+'''
+insert_sql = '''INSERT OR IGNORE INTO tickets (ticket_name, ticket_price, event_link, quantity, unique_id, event_location, zone, is_vip)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)'''
+
+def sample_rows(count):
+    for n in range(count):
+        unique_id = hashlib.sha256(f"row-{n}".encode('utf-8')).hexdigest()
+        yield (f"Section\n{n % 300}\nRow\n{n % 26}", f"${50 + n % 400}",
+               f"https://www.viagogo.com/E-{n // 50}?quantity=1", 1 + n % 5, unique_id, "Ball Arena", "Lower Level", n % 2)
+
+def fresh_database(directory, name):
+    path = os.path.join(directory, name)
+    conn = sqlite3.connect(path)
+    conn.execute(create_tickets_sql)
+    conn.commit()
+    conn.close()
+    return path
+
+def per_row_commit(path, rows):
+    conn = sqlite3.connect(path)
+    started = time.perf_counter()
+    for row in rows:
+        conn.execute(insert_sql, row)
+        conn.commit()
+    elapsed = time.perf_counter() - started
+    conn.close()
+    return elapsed
+
+def batched_writer(path, rows):
+    started = time.perf_counter()
+    writer = DatabaseWriter(path)
+    for row in rows:
+        writer.write(insert_sql, row)
+    writer.close()
+    return time.perf_counter() - started
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=20000)
+    args = parser.parse_args()
+
+    rows = list(sample_rows(args.rows))
+    with tempfile.TemporaryDirectory() as directory:
+        before = per_row_commit(fresh_database(directory, "per_row.db"), rows)
+        after = batched_writer(fresh_database(directory, "batched.db"), rows)
+
+    print(f"per-row commit:  {args.rows / before:10.0f} rows/sec ({before:.2f}s)")
+    print(f"DatabaseWriter:  {args.rows / after:10.0f} rows/sec ({after:.2f}s)")
+    print(f"speed-up:        {before / after:10.1f}x")
+
+if __name__ == "__main__":
+    main()
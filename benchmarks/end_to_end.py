@@ -0,0 +1,171 @@
+"""
+Run main.py and tickets.py end to end against the generated fake site and
+report throughput, so regressions show up between commits:
+
+    python -m benchmarks.end_to_end --states 2 --cities 3 --events 40 --workers 2
+    python -m benchmarks.end_to_end --engine network --history benchmarks/history.jsonl
+    python -m benchmarks.end_to_end --events 120 --recrawl-delta 24 --skip-tickets
+    python -m benchmarks.end_to_end --rescrape
+
+Reported: events/sec for the crawl, listings/sec for the ticket scrape, page
+loads and WebDriver round-trips for each phase, the time the DB writer spent
+in SQLite and the tracer's p50/p95 per phase. --recrawl-delta crawls the
+same site a second time with the known-event cutoff. --rescrape scrapes the
+tickets a second time incrementally, where unchanged grids are skipped by
+their fingerprint. --history appends the result as one JSON line.
+"""
+import argparse
+import datetime
+import json
+import os
+import sqlite3
+import subprocess
+import tempfile
+
+import browser
+import main as crawler
+import tickets
+from benchmarks.common import CommandCounter, Timer
+from benchmarks.fake_site import SiteScale, start_fake_site
+from db_writer import DatabaseWriter, configure_connection
+from driver_manager import DriverPool
+from instrumentation import configure_logging, tracer
+from sweep_planner import fingerprint_stats
+from zone_cache import ZoneCache
+
+def phase_timings():
+    """p50/p95 per instrumented phase, in milliseconds."""
+    return {phase: {'count': entry['count'], 'p50_ms': round(entry['p50'] * 1000, 1), 'p95_ms': round(entry['p95'] * 1000, 1)}
+            for phase, entry in tracer.summary().items()}
+
+def crawl(base_url, path, workers, engine, delta_cutoff=0):
+    with CommandCounter() as commands, Timer() as timer:
+        summary = crawler.run(workers, engine, start_url=f"{base_url}/United-States", path=path, delta_cutoff=delta_cutoff)
+    result = {
+        'events': summary['events'],
+        'seconds': round(timer.elapsed, 2),
+        'events_per_sec': round(summary['events'] / timer.elapsed, 2),
+        'page_loads': commands.page_loads,
+        'round_trips': commands.count,
+        'db_write_seconds': round(summary['write_seconds'], 3),
+        'phases': phase_timings(),
+    }
+    if delta_cutoff:
+        result['cut_short'] = summary['cut_short']
+        result['skipped_expansions'] = summary['skipped_expansions']
+    return result
+
+def scrape_tickets(path, engine, incremental=False):
+    pool = DriverPool(tickets.create_driver, network_capture=engine == 'network', warm=0)
+    managed = pool.acquire()
+    conn = configure_connection(sqlite3.connect(path))
+    tickets.setup_tickets_table(conn, drop=not incremental)
+    writer = DatabaseWriter(path)
+    zone_cache = ZoneCache(conn, writer)
+    tracer.reset()
+    fingerprint_stats.reset()
+    try:
+        with CommandCounter() as commands, Timer() as timer:
+            if incremental:
+                tickets.run_incremental(managed, conn, writer, zone_cache=zone_cache)
+            else:
+                tickets.run_full(managed, conn, writer, zone_cache)
+            writer.flush()
+    finally:
+        zone_cache.flush_hits()
+        writer.close()
+        managed.release()
+        pool.close()
+    listings = conn.execute("SELECT COUNT(*) FROM tickets").fetchone()[0]
+    conn.close()
+    return {
+        'listings': listings,
+        'seconds': round(timer.elapsed, 2),
+        'listings_per_sec': round(listings / timer.elapsed, 2),
+        'page_loads': commands.page_loads,
+        'round_trips': commands.count,
+        'db_write_seconds': round(writer.write_seconds, 3),
+        'phases': phase_timings(),
+        'unchanged_events': fingerprint_stats.unchanged,
+        'skip_rate': round(fingerprint_stats.unchanged / fingerprint_stats.events, 3) if fingerprint_stats.events else 0.0,
+    }
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end crawl and ticket scrape against a local fake site.")
+    parser.add_argument('--states', type=int, default=2)
+    parser.add_argument('--cities', type=int, default=2, help="Cities per state")
+    parser.add_argument('--events', type=int, default=24, help="Events per city")
+    parser.add_argument('--page-size', type=int, default=12, help="Events per Load More page")
+    parser.add_argument('--listings', type=int, default=20, help="Listings per event")
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--engine', choices=['dom', 'network'], default='dom')
+    parser.add_argument('--browser-profile', choices=sorted(browser.profiles), default='performance')
+    parser.add_argument('--skip-tickets', action='store_true', help="Only run the event crawl")
+    parser.add_argument('--recrawl-delta', type=int, default=0, metavar='N',
+                        help="Crawl again with main.py --delta N and report it as 'recrawl'")
+    parser.add_argument('--rescrape', action='store_true',
+                        help="Scrape the tickets again incrementally and report it as 'rescrape'")
+    parser.add_argument('--history', help="Append the result to this JSON-lines file")
+    parser.add_argument('--trace', metavar='FILE', help="Write every span to FILE as JSON lines")
+    args = parser.parse_args()
+    configure_logging('WARNING')
+    tracer.configure(args.trace, summary_interval=0)
+
+    scale = SiteScale(args.states, args.cities, args.events, args.page_size, args.listings)
+    server, base_url = start_fake_site(scale)
+    # Both scripts start their browsers with their module's profile; always headless here
+    profile = browser.profiles[args.browser_profile].with_options(headless=True)
+    crawler.browser_profile = profile
+    tickets.browser_profile = profile
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "events.db")
+        result = {
+            'date': datetime.datetime.now().isoformat(timespec='seconds'),
+            'revision': git_revision(),
+            'engine': args.engine,
+            'workers': args.workers,
+            'browser_profile': args.browser_profile,
+            'scale': scale.as_dict(),
+            'crawl': crawl(base_url, path, args.workers, args.engine),
+        }
+        if args.recrawl_delta:
+            result['recrawl'] = crawl(base_url, path, args.workers, args.engine, args.recrawl_delta)
+        if not args.skip_tickets:
+            result['tickets'] = scrape_tickets(path, args.engine)
+            if args.rescrape:
+                result['rescrape'] = scrape_tickets(path, args.engine, incremental=True)
+    server.shutdown()
+    tracer.close()
+
+    crawl_result = result['crawl']
+    print(f"crawl:   {crawl_result['events']}/{scale.expected_events()} events in {crawl_result['seconds']}s "
+          f"({crawl_result['events_per_sec']} events/s), {crawl_result['page_loads']} page loads, "
+          f"{crawl_result['round_trips']} round-trips, {crawl_result['db_write_seconds']}s writing")
+    if 'recrawl' in result:
+        recrawl = result['recrawl']
+        print(f"recrawl: {recrawl['events']} events in {recrawl['seconds']}s with --delta {args.recrawl_delta}, "
+              f"{recrawl['page_loads']} page loads, {recrawl['cut_short']} cities cut short, "
+              f"about {recrawl['skipped_expansions']} Load More clicks skipped")
+    if 'tickets' in result:
+        ticket_result = result['tickets']
+        print(f"tickets: {ticket_result['listings']} listings in {ticket_result['seconds']}s "
+              f"({ticket_result['listings_per_sec']} listings/s), {ticket_result['page_loads']} page loads, "
+              f"{ticket_result['round_trips']} round-trips, {ticket_result['db_write_seconds']}s writing")
+    if 'rescrape' in result:
+        rescrape = result['rescrape']
+        print(f"rescrape: {rescrape['seconds']}s, {rescrape['page_loads']} page loads, {rescrape['round_trips']} round-trips, "
+              f"{rescrape['unchanged_events']} events unchanged ({rescrape['skip_rate']:.0%} skip rate)")
+
+    if args.history:
+        with open(args.history, "a", encoding="utf-8") as history:
+            history.write(json.dumps(result) + "\n")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""
+Compare the per-element event card lookups with the single execute_script
+extraction on a saved city page, loaded from file:// in headless Chrome.
+
+    python -m benchmarks.event_extraction
+"""
+from selenium.webdriver.common.by import By
+
+from main import event_container_xpath, extract_event_cards, parse_event_cards, update_query_param
+from benchmarks.common import RoundTripCounter, Timer, fixture_url, headless_driver
+
+def legacy_extract(driver):
+    # The original loop: four find_element calls plus .text/get_attribute per card
+    rows = []
+    for event in driver.find_elements(By.XPATH, event_container_xpath):
+        event_link = event.find_element(By.XPATH, './/a').get_attribute('href')
+        event_link = update_query_param(event_link, "quantity", "1")
+        event_title = event.find_element(By.XPATH, './/a//p[1]').text
+        event_date_time = event.find_element(By.XPATH, './/a//p[2]').text
+        event_location = event.find_element(By.XPATH, './/a//p[1]').text
+        event_date, event_time = event_date_time.split(' • ') if ' • ' in event_date_time else (event_date_time, '')
+        rows.append((event_link, event_title, event_date, event_time, event_location))
+    return rows
+
+def main():
+    driver = headless_driver()
+    try:
+        page = fixture_url("city_page.html")
+
+        driver.get(page)
+        with RoundTripCounter(driver) as before, Timer() as before_time:
+            legacy_rows = legacy_extract(driver)
+
+        driver.get(page)
+        with RoundTripCounter(driver) as after, Timer() as after_time:
+            rows = parse_event_cards(extract_event_cards(driver))
+    finally:
+        driver.quit()
+
+    assert rows == legacy_rows, "bulk extraction does not match the per-element lookups"
+    print(f"{len(rows)} event cards, identical output")
+    print(f"per-element: {before.count} round-trips, {before_time.elapsed * 1000:.1f} ms")
+    print(f"bulk:        {after.count} round-trips, {after_time.elapsed * 1000:.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Export synthetic tickets tables of growing size and report time and peak
+memory (max RSS of a fresh process per size), which should stay flat once
+the table is larger than one chunk.
+
+    python -m benchmarks.excel_export --rows 20000 80000
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import resource
+import sqlite3
+import tempfile
+
+import table
+from benchmarks.common import Timer
+
+def make_database(path, rows, seed=1):
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    conn.execute('''CREATE TABLE events (event_link TEXT PRIMARY KEY, event_title TEXT, event_date TEXT, event_time TEXT,
+                                         event_location TEXT, state TEXT, city TEXT)''')
+    conn.execute('''CREATE TABLE tickets (ticket_name TEXT, ticket_price TEXT, event_link TEXT, quantity INTEGER,
+                                          unique_id TEXT UNIQUE, event_location TEXT, zone TEXT, is_vip INTEGER,
+                                          scraped_at REAL)''')
+    event_count = max(1, rows // 50)
+    conn.executemany('INSERT INTO events VALUES (?, ?, ?, ?, ?, ?, ?)',
+                     ((f"https://www.viagogo.com/E-{i}?quantity=1", f"Event {i}", "Sat, Mar 2", "7:30 PM",
+                       "Ball Arena, Denver, CO", "Colorado", "Denver") for i in range(event_count)))
+
+    def ticket(i):
+        # The multi-line shape tickets.py stores
+        name = (f"Section \n{rng.randint(100, 330)}\nRow \n{rng.choice('ABCDEFGHK')}\n"
+                f"{rng.randint(1, 8)} ticket\ns together\n{rng.choice(['Clear view', 'Partial view'])}")
+        return (name, f"${rng.randint(20, 400)}", f"https://www.viagogo.com/E-{i % event_count}?quantity=1",
+                rng.randint(1, 5), f"id-{i}", "Ball Arena, Denver, CO", rng.choice(["Lower Level", "Club Level"]),
+                rng.choice([0, 1]), 1700000000.0)
+
+    conn.executemany('INSERT INTO tickets VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', (ticket(i) for i in range(rows)))
+    conn.commit()
+    conn.close()
+
+def export_in_child(path, output_file, results):
+    with Timer() as timer:
+        table.export_to_excel_with_truncation(path, output_file, ["zone"], 40)
+    # ru_maxrss is in KiB on Linux
+    results.put((timer.elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024))
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the streaming Excel export.")
+    parser.add_argument('--rows', type=int, nargs='+', default=[20000, 80000])
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for rows in args.rows:
+            path = os.path.join(directory, f"tickets_{rows}.db")
+            make_database(path, rows)
+            queue = multiprocessing.Queue()
+            child = multiprocessing.Process(target=export_in_child,
+                                            args=(path, os.path.join(directory, f"tickets_{rows}.xlsx"), queue))
+            child.start()
+            elapsed, peak = queue.get()
+            child.join()
+            results.append((rows, elapsed, peak))
+
+    for rows, elapsed, peak in results:
+        print(f"{rows:>9} rows: {elapsed:6.1f}s, {rows / elapsed:8.0f} rows/s, peak RSS {peak / 2 ** 20:6.1f} MiB")
+
+if __name__ == "__main__":
+    main()
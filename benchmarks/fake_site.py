@@ -0,0 +1,236 @@
+"""
+Generated stand-in for the whole site, at any scale, for end-to-end runs.
+
+    /United-States                    state list (main.state_xpath)
+    /State-<s>                        city list (main.city_xpath)
+    /State-<s>/City-<c>               city feed, loaded page by page with Load More
+    /Concert-Tickets/Event-<n>/E-<n>  event page with the listings grid and the zone/VIP modal
+
+The city and event pages are the replay_server shells. Their /api responses
+are generated from the path, so the same SiteScale always serves the same
+site. Listings hold 1 to 8 tickets, some are sold, sections 2xx are club
+level and sections 118 and 230 are VIP.
+
+With assets=True every page also pulls in photos, a web font and two
+tracker scripts, the weight the live pages carry, and the server counts
+the bytes it sends (server.bytes_sent) so browser profiles can be compared.
+
+With Faults the server misbehaves like a busy site: answers slow down with
+the number of requests in flight, requests above a rate get 429 and a
+share of the rest get 503, so pacing can be tested.
+"""
+import collections
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from benchmarks.replay_server import CITY_PAGE, EVENT_PAGE
+
+LIST_PAGE = """<!DOCTYPE html>
+<html lang="en"><head><meta charset="utf-8"><title>{title}</title></head>
+<body>
+<div id="app">
+  <div><a href="https://www.viagogo.com/">viagogo</a></div><div></div><div></div>
+  <div>
+    <div><h1>{title}</h1></div>
+    <div><div><div><ul>
+{items}
+    </ul></div></div></div>
+  </div>
+</div>
+</body></html>
+"""
+
+sections = [101, 102, 118, 140, 204, 210, 230, 312, 326]
+vip_sections = {118, 230}
+
+# What a page with assets=True loads besides its own data
+asset_markup = """
+<style>@font-face { font-family: Brand; src: url(/assets/brand.woff2) format('woff2'); } body { font-family: Brand, sans-serif; }</style>
+<div>""" + "".join(f'<img src="/assets/photo-{index}.jpg" width="240" height="160" alt="">' for index in range(6)) + """</div>
+<script async src="/gtm.js"></script>
+<script async src="/analytics.js"></script>
+"""
+# path suffix -> (content type, size in bytes)
+asset_types = {
+    '.jpg': ("image/jpeg", 60000),
+    '.woff2': ("font/woff2", 80000),
+    '.js': ("application/javascript", 40000),
+}
+
+class SiteScale:
+    def __init__(self, states=2, cities=2, events=24, page_size=12, listings=20, sold_every=7, assets=False):
+        self.states = states
+        self.cities = cities
+        self.events = events  # per city
+        self.page_size = page_size
+        self.listings = listings  # per event
+        self.sold_every = sold_every
+        self.assets = assets
+
+    def as_dict(self):
+        return dict(vars(self))
+
+    def event_number(self, state, city, index):
+        return ((state - 1) * self.cities + (city - 1)) * self.events + index + 1
+
+    def explore_page(self, state, city, page):
+        start = (page - 1) * self.page_size
+        end = min(start + self.page_size, self.events)
+        events = []
+        for index in range(start, end):
+            number = self.event_number(state, city, index)
+            events.append({
+                "eventId": number,
+                "name": f"Event Title {number}",
+                "url": f"/Concert-Tickets/Event-{number}/E-{number}",
+                "formattedDateWithoutYear": f"Sat, Mar {index % 28 + 1}",
+                "formattedTime": "7:30 PM",
+                "venueName": f"Venue {city}, City-{city}, State-{state}",
+            })
+        return {"events": events, "hasMore": end < self.events}
+
+    def listings_for(self, event_number):
+        rng = random.Random(event_number)
+        items = []
+        for index in range(self.listings):
+            section = rng.choice(sections)
+            price = rng.randint(20, 400)
+            zone = "Lower Level" if section < 200 else "Club Level" if section < 300 else "Upper Level"
+            items.append({
+                "id": event_number * 1000 + index,
+                "sectionName": str(section),
+                "row": rng.choice("ABCDEFGHK"),
+                "availableTickets": rng.randint(1, 8),
+                "price": {"amount": price, "currency": "USD"},
+                "formattedPrice": f"${price}",
+                "ticketClassName": zone,
+                "listingNotes": [{"text": "VIP lounge access"}] if section in vip_sections else [{"text": "Mobile tickets"}],
+                "isSold": index % self.sold_every == self.sold_every - 1,
+            })
+        return {"items": items}
+
+    def page(self, html):
+        return html.replace("</body>", asset_markup + "</body>") if self.assets else html
+
+    def expected_events(self):
+        return self.states * self.cities * self.events
+
+class Faults:
+    """Server-side trouble: latency per request in flight, 429 above capacity_rps, random 503s at error_rate."""
+
+    def __init__(self, latency=0.0, latency_per_request=0.0, capacity_rps=None, error_rate=0.0, seed=0):
+        self.latency = latency
+        self.latency_per_request = latency_per_request
+        self.capacity_rps = capacity_rps
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.recent = collections.deque()
+        self.statuses = collections.Counter()
+
+    def admit(self):
+        """Called as a request arrives; returns (seconds to stall, error status or None)."""
+        now = time.monotonic()
+        with self.lock:
+            self.in_flight += 1
+            while self.recent and self.recent[0] < now - 1:
+                self.recent.popleft()
+            self.recent.append(now)
+            delay = self.latency + self.latency_per_request * (self.in_flight - 1)
+            status = None
+            if self.capacity_rps is not None and len(self.recent) > self.capacity_rps:
+                status = 429
+            elif self.rng.random() < self.error_rate:
+                status = 503
+            self.statuses[status or 200] += 1
+            return delay, status
+
+    def done(self):
+        with self.lock:
+            self.in_flight -= 1
+
+def make_handler(scale):
+    class FakeSiteHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def send_body(self, body, content_type):
+            data = body.encode("utf-8") if isinstance(body, str) else body
+            with self.server.stats_lock:
+                self.server.bytes_sent += len(data)
+                self.server.requests += 1
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            faults = self.server.faults
+            if faults is None:
+                return self.serve_page()
+            delay, status = faults.admit()
+            try:
+                time.sleep(delay)
+                if status:
+                    self.send_error(status)
+                else:
+                    self.serve_page()
+            finally:
+                faults.done()
+
+        def serve_page(self):
+            parsed = urlparse(self.path)
+            query = parse_qs(parsed.query)
+            base = f"http://{self.headers['Host']}"
+            path = parsed.path.rstrip('/')
+            city_match = re.fullmatch(r'/State-(\d+)/City-(\d+)', query.get('path', [path])[0].rstrip('/'))
+            event_match = re.search(r'/E-(\d+)$', query.get('path', [path])[0].rstrip('/'))
+
+            if path == "/United-States":
+                items = "\n".join(f'      <li><a href="{base}/State-{state}">State {state}</a></li>'
+                                  for state in range(1, scale.states + 1))
+                self.send_body(scale.page(LIST_PAGE.format(title="United States", items=items)), "text/html; charset=utf-8")
+            elif re.fullmatch(r'/State-(\d+)', path):
+                state = int(path.split('-')[1])
+                items = "\n".join(f'      <li><a href="{base}/State-{state}/City-{city}">City {city}</a></li>'
+                                  for city in range(1, scale.cities + 1))
+                self.send_body(scale.page(LIST_PAGE.format(title=f"State {state}", items=items)), "text/html; charset=utf-8")
+            elif path == "/api/explore" and city_match:
+                page = int(query.get("page", ["1"])[0])
+                payload = scale.explore_page(int(city_match.group(1)), int(city_match.group(2)), page)
+                self.send_body(json.dumps(payload), "application/json")
+            elif path == "/api/listings" and event_match:
+                quantity = int(query.get("quantity", ["1"])[0])
+                payload = scale.listings_for(int(event_match.group(1)))
+                payload["items"] = [item for item in payload["items"] if item["availableTickets"] >= quantity]
+                self.send_body(json.dumps(payload), "application/json")
+            elif city_match:
+                self.send_body(scale.page(CITY_PAGE), "text/html; charset=utf-8")
+            elif event_match:
+                self.send_body(scale.page(EVENT_PAGE), "text/html; charset=utf-8")
+            elif path.startswith("/assets/") or path in ("/gtm.js", "/analytics.js"):
+                content_type, size = asset_types[path[path.rindex('.'):]]
+                body = b"/*" + b" " * (size - 4) + b"*/" if content_type == "application/javascript" else bytes(size)
+                self.send_body(body, content_type)
+            else:
+                self.send_error(404)
+
+    return FakeSiteHandler
+
+def start_fake_site(scale, port=0, faults=None):
+    """Serve the generated site on a background thread; returns (server, base_url)."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(scale))
+    server.faults = faults
+    server.stats_lock = threading.Lock()
+    server.bytes_sent = 0
+    server.requests = 0
+    thread = threading.Thread(target=server.serve_forever, name="fake-site", daemon=True)
+    thread.start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
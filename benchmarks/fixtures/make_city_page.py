@@ -0,0 +1,37 @@
+"""
+Regenerate city_page.html, a saved city feed with the same markup shape as
+the live "#explore_tabpanel-0" event list.
+"""
+import pathlib
+
+CARD = """        <li><a href="https://www.viagogo.com/Concert-Tickets/Event-{n}/E-{eid}?quantity=2">
+          <div><p>Event Title {n}</p><p>Sat, Mar {day} • 7:30 PM</p><p>Venue {n}, Denver, CO</p></div>
+        </a></li>"""
+
+def build(cards=60):
+    items = "\n".join(CARD.format(n=n, eid=150000000 + n, day=n % 28 + 1) for n in range(1, cards + 1))
+    return f"""<!DOCTYPE html>
+<html lang="en">
+<head><meta charset="utf-8"><title>Denver Events</title></head>
+<body>
+<div id="app">
+  <div id="explore_tabpanel-0">
+    <div>
+      <div><h2>Events</h2></div>
+      <div>
+        <ul>
+{items}
+        </ul>
+        <div><div><button type="button">Load more</button></div></div>
+      </div>
+    </div>
+  </div>
+</div>
+</body>
+</html>
+"""
+
+if __name__ == "__main__":
+    path = pathlib.Path(__file__).resolve().parent / "city_page.html"
+    path.write_text(build(), encoding="utf-8")
+    print(f"Wrote {path}")
@@ -0,0 +1,132 @@
+"""
+Split a simulated crawl across node processes through the work queue, with
+no browser: each node runs worker threads that lease city items, "scrape"
+them for --work-ms and complete them.
+
+    python -m benchmarks.multi_node --items 400 --nodes 1 2 4
+    python -m benchmarks.multi_node --backend kv --kill
+
+Reported per node count: items/sec and how many items each node completed.
+With --kill, one node is killed mid-run; its leases expire after --lease
+seconds and the other nodes take its items over. Every run checks that each
+item was completed exactly once.
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import tempfile
+import threading
+import time
+
+import work_queue
+from benchmarks.common import Timer
+
+def node(queue_url, database_path, lease_seconds, threads, work_ms, completed):
+    work = work_queue.open_queue(queue_url, database_path, 'bench', lease_seconds, authkey='bench')
+    work.begin_generation()
+
+    def worker(worker_id):
+        owner = work_queue.node_owner(worker_id)
+        while True:
+            item = work.next_item(owner, ('city',))
+            if item is None:
+                return
+            with work.keep_alive(item):
+                time.sleep(random.uniform(0.5, 1.5) * work_ms / 1000)
+                if work.complete(item):
+                    completed.put((os.getpid(), item.key))
+
+    pool = [threading.Thread(target=worker, args=(worker_id,)) for worker_id in range(1, threads + 1)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+
+def start_store(port):
+    server = multiprocessing.Process(target=work_queue.serve, args=('127.0.0.1', port, 'bench'), daemon=True)
+    server.start()
+    time.sleep(0.5)
+    return server
+
+def run(args, node_count, kill, directory, run_number):
+    if args.backend == 'kv':
+        queue_url = f"kv://127.0.0.1:{args.port + run_number}"
+        store = start_store(args.port + run_number)
+    else:
+        queue_url, store = f"sqlite:///{os.path.join(directory, f'queue-{run_number}.db')}", None
+    try:
+        work = work_queue.open_queue(queue_url, None, 'bench', args.lease, authkey='bench')
+        work.begin_generation()
+        work.enqueue_many('city', [(f"State-{n % 10}/City-{n}", {'city': n}) for n in range(args.items)])
+
+        completed = multiprocessing.Queue()
+        nodes = [multiprocessing.Process(target=node, args=(queue_url, None, args.lease, args.threads, args.work_ms, completed))
+                 for _ in range(node_count)]
+        with Timer() as timer:
+            for process in nodes:
+                process.start()
+            if kill:
+                time.sleep(args.items * args.work_ms / 1000 / (node_count * args.threads) / 3)
+                nodes[0].kill()
+            keys = []
+            while len(keys) < args.items and any(process.is_alive() for process in nodes):
+                try:
+                    keys.append(completed.get(timeout=0.5))
+                except Exception:
+                    continue
+            for process in nodes:
+                process.join()
+        while not completed.empty():
+            keys.append(completed.get())
+
+        per_node = {}
+        for pid, _ in keys:
+            per_node[pid] = per_node.get(pid, 0) + 1
+        unique = {key for _, key in keys}
+        counts = work.counts()
+        return {
+            'seconds': timer.elapsed,
+            'items_per_sec': len(unique) / timer.elapsed,
+            'completions': len(keys),
+            'unique': len(unique),
+            'per_node': [per_node.get(process.pid, 0) for process in nodes],
+            'counts': counts,
+            'finished': work.finish_generation(),
+        }
+    finally:
+        if store:
+            store.kill()
+
+def main():
+    parser = argparse.ArgumentParser(description="Items/sec and exactly-once completion of the work queue across node processes.")
+    parser.add_argument('--backend', choices=['sqlite', 'kv'], default='sqlite')
+    parser.add_argument('--items', type=int, default=400)
+    parser.add_argument('--nodes', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--threads', type=int, default=2, help="Worker threads per node")
+    parser.add_argument('--work-ms', type=float, default=20, help="Simulated scrape time per item")
+    parser.add_argument('--lease', type=float, default=2, help="Lease seconds; a killed node's items come back after this")
+    parser.add_argument('--kill', action='store_true', help="Also run with the first node killed mid-run")
+    parser.add_argument('--port', type=int, default=6390, help="First port for the kv stand-in server")
+    args = parser.parse_args()
+
+    runs = [(count, False) for count in args.nodes]
+    if args.kill:
+        runs.append((max(args.nodes), True))
+    failures = 0
+    with tempfile.TemporaryDirectory() as directory:
+        for run_number, (node_count, kill) in enumerate(runs):
+            result = run(args, node_count, kill, directory, run_number)
+            # A node killed between complete() and reporting it can only lose a report, never an item
+            exact = (result['unique'] == result['completions'] and result['counts']['done'] == args.items
+                     and result['counts']['open'] == 0)
+            failures += not exact
+            print(f"{args.backend} {node_count} node(s){' one killed' if kill else '':<11} "
+                  f"{result['items_per_sec']:7.1f} items/s  {result['seconds']:5.1f}s  per node {result['per_node']}  "
+                  f"{'exactly once' if exact else 'MISMATCH'} ({result['completions']} completions, "
+                  f"{result['unique']} unique, {result['counts']['done']} done of {args.items}), generation finished: {result['finished']}")
+    if failures:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
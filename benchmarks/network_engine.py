@@ -0,0 +1,87 @@
+"""
+Compare the DOM and network engines against the local replay server.
+
+Without --browser only the recorded JSON responses are parsed, which checks
+the payload parsers and needs no Chrome. With --browser both engines scrape
+the replayed city and event pages and their stored rows are compared.
+
+    python -m benchmarks.network_engine
+    python -m benchmarks.network_engine --browser
+"""
+import argparse
+import json
+import os
+import tempfile
+
+from network_capture import parse_event_payload, parse_listing_payload
+from benchmarks.replay_server import RESPONSES_DIR, start_server
+
+def parse_fixtures():
+    pages = sorted(RESPONSES_DIR.glob("explore_page_*.json"))
+    events = []
+    for path in pages:
+        events.extend(parse_event_payload(json.loads(path.read_text(encoding="utf-8")), "https://www.viagogo.com/"))
+    listings = parse_listing_payload(json.loads((RESPONSES_DIR / "listings.json").read_text(encoding="utf-8")))
+
+    assert events and len({event[0] for event in events}) == len(events), "event links missing or duplicated"
+    assert all(event[0].startswith("https://www.viagogo.com/") for event in events), "event links not made absolute"
+    assert listings and all(listing['price'] and listing['raw_name'].startswith(("Section", "Suite")) for listing in listings)
+    print(f"{len(pages)} feed pages -> {len(events)} events; e.g. {events[0]}")
+    print(f"listings.json -> {len(listings)} unsold listings, {sum(listing['is_vip'] for listing in listings)} VIP; "
+          f"e.g. {listings[0]}")
+
+def run_engine(engine, base_url, directory):
+    import main
+    import tickets
+    from db_writer import DatabaseWriter
+    from network_capture import NetworkCapture
+    from benchmarks.common import RoundTripCounter, Timer
+
+    path = os.path.join(directory, f"{engine}.db")
+    conn = main.connect_database(path)
+    main.setup_database(conn)
+    tickets.setup_tickets_table(conn)
+    writer = DatabaseWriter(path)
+    driver = main.create_driver(network_capture=engine == 'network')
+    capture = NetworkCapture(driver) if engine == 'network' else None
+    try:
+        with RoundTripCounter(driver) as counter, Timer() as timer:
+            if capture:
+                main.scrape_city_network(driver, capture, writer, "Colorado", "Denver", base_url + "/city/Denver")
+            else:
+                main.scrape_city(driver, writer, "Colorado", "Denver", base_url + "/city/Denver")
+            writer.flush()
+            first_event = conn.execute('SELECT event_link FROM events ORDER BY event_link LIMIT 1').fetchone()[0]
+            tickets.scrape_event(driver, writer, first_event, capture=capture)
+        writer.close()
+    finally:
+        driver.quit()
+
+    events = conn.execute('SELECT event_link, event_title, event_date, event_time, event_location FROM events ORDER BY event_link').fetchall()
+    ticket_rows = conn.execute('''SELECT ticket_name, ticket_price, quantity, zone, is_vip FROM tickets
+                                  ORDER BY quantity, ticket_name, ticket_price''').fetchall()
+    conn.close()
+    return events, ticket_rows, counter.count, timer.elapsed
+
+def compare_engines():
+    server, base_url = start_server()
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            dom = run_engine('dom', base_url, directory)
+            network = run_engine('network', base_url, directory)
+    finally:
+        server.shutdown()
+
+    assert network[0] == dom[0], "network engine stored different events than the DOM engine"
+    assert network[1] == dom[1], "network engine stored different tickets than the DOM engine"
+    print(f"{len(dom[0])} events and {len(dom[1])} tickets rows, identical for both engines")
+    print(f"dom:     {dom[2]} round-trips, {dom[3]:.1f}s")
+    print(f"network: {network[2]} round-trips, {network[3]:.1f}s")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check the network engine against recorded responses.")
+    parser.add_argument('--browser', action='store_true', help="Also scrape the replay server with both engines (needs Chrome)")
+    args = parser.parse_args()
+    parse_fixtures()
+    if args.browser:
+        compare_engines()
@@ -0,0 +1,104 @@
+"""
+Pacing against a site that pushes back, without a browser. Worker threads
+fetch city feeds (the page and its Load More pages) from the fake site,
+which slows down under load, answers 429 above --capacity requests/sec and
+fails --error-rate of the rest:
+
+    python -m benchmarks.pacing --workers 8 --seconds 30
+
+Three ways of pacing are compared: none, a fixed sleep after every city (the
+scrapers' old approach) and the AIMD Pacer. Reported: cities/sec that came
+through without an error, the share of requests the site refused, and where
+the Pacer's rate and concurrency settled.
+"""
+import argparse
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from benchmarks.fake_site import Faults, SiteScale, start_fake_site
+from pacing import Pacer
+
+def fetch(page_url):
+    with urllib.request.urlopen(page_url, timeout=10) as response:
+        return response.read()
+
+def scrape_city(base_url, scale, number, get):
+    state = number % scale.states + 1
+    city = number // scale.states % scale.cities + 1
+    path = f"/State-{state}/City-{city}"
+    get(f"{base_url}{path}")
+    for page in range(1, scale.events // scale.page_size + 1):
+        get(f"{base_url}/api/explore?page={page}&path={path}")
+
+def run(mode, args, scale):
+    faults = Faults(latency=args.latency, latency_per_request=args.latency_per_request,
+                    capacity_rps=args.capacity, error_rate=args.error_rate)
+    server, base_url = start_fake_site(scale, faults=faults)
+    pacer = Pacer(args.workers, rate=args.rate, max_rate=args.capacity * 4, cooldown=2.0) if mode == 'aimd' else None
+    counts = {'ok': 0, 'failed': 0}
+    lock = threading.Lock()
+    deadline = time.monotonic() + args.seconds
+
+    def worker(worker_id):
+        number = worker_id
+        while time.monotonic() < deadline:
+            try:
+                if pacer is None:
+                    scrape_city(base_url, scale, number, fetch)
+                else:
+                    with pacer.unit():
+                        scrape_city(base_url, scale, number, lambda page_url: pacer.request(page_url, fetch))
+                outcome = 'ok'
+            except (urllib.error.URLError, OSError):
+                outcome = 'failed'
+            with lock:
+                counts[outcome] += 1
+            number += args.workers
+            if mode == 'sleep':
+                time.sleep(args.sleep)
+
+    threads = [threading.Thread(target=worker, args=(worker_id,)) for worker_id in range(args.workers)]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+    server.shutdown()
+
+    requests = sum(faults.statuses.values())
+    result = {
+        'cities_per_sec': counts['ok'] / elapsed,
+        'failed_cities': counts['failed'],
+        'refused': (faults.statuses[429] + faults.statuses[503]) / max(requests, 1),
+        'requests_per_sec': requests / elapsed,
+    }
+    if pacer is not None:
+        summary = pacer.summary()
+        result['settled'] = f"rate {list(summary['hosts'].values())[0]['rate']:.1f}/s, concurrency {summary['concurrency']}"
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Cities/sec and refused requests with and without adaptive pacing.")
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=30, help="Run time per mode")
+    parser.add_argument('--capacity', type=float, default=20, help="Requests/sec the site serves before answering 429")
+    parser.add_argument('--error-rate', type=float, default=0.01, help="Share of requests failed with 503")
+    parser.add_argument('--latency', type=float, default=0.02, help="Seconds per request")
+    parser.add_argument('--latency-per-request', type=float, default=0.02, help="Extra seconds per request in flight")
+    parser.add_argument('--rate', type=float, default=2.0, help="Pacer's starting page loads/sec")
+    parser.add_argument('--sleep', type=float, default=1.0, help="Fixed pause after each city in the sleep mode")
+    parser.add_argument('--modes', nargs='+', choices=['none', 'sleep', 'aimd'], default=['none', 'sleep', 'aimd'])
+    args = parser.parse_args()
+
+    scale = SiteScale(states=4, cities=10, events=48, page_size=12)
+    for mode in args.modes:
+        result = run(mode, args, scale)
+        print(f"{mode:<6} {result['cities_per_sec']:6.2f} cities/s  {result['failed_cities']:4d} failed cities  "
+              f"{result['refused']:6.1%} of {result['requests_per_sec']:.1f} requests/s refused"
+              + (f"  settled at {result['settled']}" if 'settled' in result else ""))
+
+if __name__ == "__main__":
+    main()
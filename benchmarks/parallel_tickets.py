@@ -0,0 +1,69 @@
+"""
+Scaling of tickets.py --workers against the fake site. The events are
+crawled once; each worker count then scrapes every event from a fresh copy
+of that database:
+
+    python -m benchmarks.parallel_tickets --workers 1 2 4 --events 30
+
+Reported per worker count: events/sec, listings/sec and the speed-up over
+the first count, which stays close to linear until the machine runs out of
+cores or memory for the browsers.
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+
+import main as crawler
+import tickets
+from benchmarks.common import Timer
+from benchmarks.fake_site import SiteScale, start_fake_site
+from instrumentation import configure_logging
+
+def scrape(path, workers, engine):
+    args = tickets.parse_args(['--workers', str(workers), '--engine', engine, '--no-pacing', '--warm', '0',
+                               '--log-level', 'WARNING', '--summary-interval', '0'])
+    conn = sqlite3.connect(path)
+    tickets.setup_tickets_table(conn, drop=True)
+    entries = tickets.all_entries(conn)
+    with Timer() as timer:
+        tickets.run_parallel(args, workers, entries, 'tickets', path=path)
+    listings = conn.execute("SELECT COUNT(*) FROM tickets").fetchone()[0]
+    conn.close()
+    return {'events': len(entries), 'listings': listings, 'seconds': timer.elapsed}
+
+def main():
+    parser = argparse.ArgumentParser(description="Events/sec of the parallel ticket scrape by number of worker processes.")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--states', type=int, default=1)
+    parser.add_argument('--cities', type=int, default=2, help="Cities per state")
+    parser.add_argument('--events', type=int, default=12, help="Events per city")
+    parser.add_argument('--listings', type=int, default=20, help="Listings per event")
+    parser.add_argument('--engine', choices=['dom', 'network'], default='dom')
+    args = parser.parse_args()
+    configure_logging('WARNING')
+
+    scale = SiteScale(args.states, args.cities, args.events, page_size=12, listings=args.listings)
+    server, base_url = start_fake_site(scale)
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            crawled = os.path.join(directory, "crawled.db")
+            crawler.run(1, args.engine, start_url=f"{base_url}/United-States", path=crawled)
+            baseline = None
+            for workers in args.workers:
+                path = os.path.join(directory, f"events-{workers}.db")
+                # The backup API also copies what is still in the crawl's WAL
+                with sqlite3.connect(crawled) as source, sqlite3.connect(path) as target:
+                    source.backup(target)
+                result = scrape(path, workers, args.engine)
+                events_per_sec = result['events'] / result['seconds']
+                baseline = baseline or events_per_sec / args.workers[0]
+                print(f"{workers:2d} worker(s): {result['events']} events, {result['listings']} listings in "
+                      f"{result['seconds']:.1f}s  {events_per_sec:.2f} events/s  "
+                      f"{result['listings'] / result['seconds']:.1f} listings/s  "
+                      f"speed-up {events_per_sec / baseline:.2f}x of {workers}")
+    finally:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Time to the first ticket and total run time, running main.py then tickets.py
+against running them as one pipeline (pipeline.py), on the fake site:
+
+    python -m benchmarks.pipeline --states 2 --cities 3 --events 36 --ticket-workers 2
+
+Back to back, no ticket is stored until the last city has been crawled; the
+pipeline stores its first ticket shortly after the first city page loads.
+Also reported for the pipeline: how long the crawl waited on a full queue.
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+
+import main as crawler
+import pipeline
+import tickets
+from benchmarks.common import Timer
+from benchmarks.fake_site import SiteScale, start_fake_site
+from db_writer import DatabaseWriter, configure_connection
+from driver_manager import DriverPool
+from instrumentation import configure_logging
+from zone_cache import ZoneCache
+
+class FirstTicket:
+    """Wraps tickets.record_event_scrape to note when the first listings are stored."""
+
+    def __init__(self):
+        self.at = None
+        self.record = tickets.record_event_scrape
+
+    def __enter__(self):
+        def record(writer, entry, listing_count, scraped_at):
+            if listing_count and self.at is None:
+                self.at = time.time()
+            self.record(writer, entry, listing_count, scraped_at)
+        tickets.record_event_scrape = record
+        return self
+
+    def __exit__(self, *exc):
+        tickets.record_event_scrape = self.record
+
+def back_to_back(start_url, path, engine):
+    started = time.time()
+    with FirstTicket() as first, Timer() as timer:
+        crawler.run(1, engine, start_url=start_url, path=path)
+        pool = DriverPool(tickets.create_driver, network_capture=engine == 'network', warm=0)
+        managed = pool.acquire()
+        conn = configure_connection(sqlite3.connect(path))
+        tickets.setup_tickets_table(conn)
+        writer = DatabaseWriter(path)
+        zone_cache = ZoneCache(conn, writer)
+        try:
+            tickets.run_full(managed, conn, writer, zone_cache)
+        finally:
+            zone_cache.flush_hits()
+            writer.close()
+            managed.release()
+            pool.close()
+            conn.close()
+    return {'first_ticket': first.at - started if first.at else None, 'seconds': timer.elapsed}
+
+def pipelined(start_url, path, engine, ticket_workers, queue_size):
+    network = engine == 'network'
+    with Timer() as timer:
+        summary = pipeline.run_pipeline(1, ticket_workers, engine, start_url, path, queue_size,
+                                        crawl_pool=DriverPool(crawler.create_driver, network_capture=network, warm=0),
+                                        ticket_pool=DriverPool(tickets.create_driver, network_capture=network, warm=0))
+    return {'first_ticket': summary['time_to_first_ticket'], 'seconds': timer.elapsed,
+            'blocked_seconds': summary['blocked_seconds']}
+
+def listings(path):
+    with sqlite3.connect(path) as conn:
+        return conn.execute("SELECT COUNT(*) FROM tickets").fetchone()[0]
+
+def main():
+    parser = argparse.ArgumentParser(description="Time to first ticket, back to back against pipelined.")
+    parser.add_argument('--states', type=int, default=2)
+    parser.add_argument('--cities', type=int, default=2, help="Cities per state")
+    parser.add_argument('--events', type=int, default=24, help="Events per city")
+    parser.add_argument('--listings', type=int, default=10, help="Listings per event")
+    parser.add_argument('--ticket-workers', type=int, default=1,
+                        help="Ticket browsers in the pipeline (back to back always uses one)")
+    parser.add_argument('--queue-size', type=int, default=pipeline.default_queue_size)
+    parser.add_argument('--engine', choices=['dom', 'network'], default='dom')
+    args = parser.parse_args()
+    configure_logging('WARNING')
+
+    scale = SiteScale(args.states, args.cities, args.events, page_size=12, listings=args.listings)
+    server, base_url = start_fake_site(scale)
+    start_url = f"{base_url}/United-States"
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            for name, run in (('back to back', lambda path: back_to_back(start_url, path, args.engine)),
+                              ('pipelined', lambda path: pipelined(start_url, path, args.engine,
+                                                                   args.ticket_workers, args.queue_size))):
+                path = os.path.join(directory, f"{name.replace(' ', '-')}.db")
+                result = run(path)
+                first_ticket = f"{result['first_ticket']:.1f}s" if result['first_ticket'] is not None else "never"
+                print(f"{name:<13} first ticket after {first_ticket:>7}, {listings(path)} listings in "
+                      f"{result['seconds']:.1f}s"
+                      + (f", crawl held back {result['blocked_seconds']:.1f}s" if 'blocked_seconds' in result else ""))
+    finally:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
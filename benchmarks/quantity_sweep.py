@@ -0,0 +1,48 @@
+"""
+Run the naive quantity sweep and the sweep planner against the saved event
+page (which filters its listings by ?quantity= and each listing's split) and
+check they store the same tickets rows, the planner opening each listing's
+dialog once. tests/test_sweep_planner.py checks the same without Chrome.
+
+    python -m benchmarks.quantity_sweep
+"""
+import os
+import sqlite3
+import tempfile
+
+import tickets
+from db_writer import DatabaseWriter
+from sweep_planner import NaiveSweep, QuantitySweep
+from benchmarks.common import RoundTripCounter, Timer, fixture_url, headless_driver
+
+def sweep_rows(driver, directory, sweep_class):
+    path = os.path.join(directory, f"{sweep_class.__name__}.db")
+    conn = sqlite3.connect(path)
+    tickets.setup_tickets_table(conn)
+    writer = DatabaseWriter(path)
+    event_link = fixture_url("event_page.html") + "?quantity=1"
+    with RoundTripCounter(driver) as counter, Timer() as timer:
+        tickets.scrape_event(driver, writer, event_link, sweep_class=sweep_class)
+    writer.close()
+    # unique_id comes from the listing's identity, so it must match too
+    rows = conn.execute('''SELECT ticket_name, ticket_price, event_link, quantity, event_location, zone, is_vip, unique_id
+                           FROM tickets ORDER BY quantity, ticket_name, ticket_price''').fetchall()
+    conn.close()
+    return rows, counter.by_command.get('get', 0), counter.count, timer.elapsed
+
+def main():
+    driver = headless_driver()
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            naive = sweep_rows(driver, directory, NaiveSweep)
+            planned = sweep_rows(driver, directory, QuantitySweep)
+    finally:
+        driver.quit()
+
+    assert planned[0] == naive[0], "sweep planner stored different tickets rows than the naive sweep"
+    print(f"{len(naive[0])} tickets rows, identical for both sweeps")
+    print(f"naive:   {naive[1]} page loads, {naive[2]} round-trips, {naive[3]:.1f}s")
+    print(f"planner: {planned[1]} page loads, {planned[2]} round-trips, {planned[3]:.1f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Run the common queries on a pre-migration database and again after
+migrations.migrate(), printing SQLite's query plan and timing for each.
+
+    python -m benchmarks.query_plans --rows 300000
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+
+import migrations
+from benchmarks.common import Timer
+from benchmarks.excel_export import make_database
+
+# (label, SQL before the migration, SQL after, parameters)
+queries = [
+    ("tickets per event",
+     "SELECT ticket_price, quantity FROM tickets WHERE event_link IN (?, ?, ?, ?, ?)",
+     "SELECT ticket_price, quantity FROM tickets WHERE event_id = ?",
+     lambda: ([f"https://www.viagogo.com/E-7?quantity={q}" for q in range(1, 6)], ["7"])),
+    ("events per city in a date range",
+     # Before: display dates cannot be compared, so every event of the city is read and filtered in Python
+     "SELECT event_link, event_date FROM events WHERE state = ? AND city = ?",
+     "SELECT event_link, event_day FROM events WHERE state = ? AND city = ? AND event_day BETWEEN ? AND ?",
+     lambda: (["Colorado", "City 7"], ["Colorado", "City 7", "2026-03-01", "2026-03-14"])),
+]
+
+def run(conn, sql, params, repeat=50):
+    plan = "; ".join(row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params))
+    with Timer() as timer:
+        for _ in range(repeat):
+            rows = conn.execute(sql, params).fetchall()
+    return plan, len(rows), timer.elapsed / repeat * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description="Show index use for the common queries.")
+    parser.add_argument('--rows', type=int, default=300000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "events.db")
+        make_database(path, args.rows)
+        conn = sqlite3.connect(path)
+        # Spread the events over cities and dates so the filters are selective
+        conn.execute("UPDATE events SET city = 'City ' || (rowid % 50), event_date = 'Mar ' || (rowid % 28 + 1) || ', 2026'")
+        conn.commit()
+
+        results = []
+        for label, before_sql, after_sql, params in queries:
+            results.append((label, "before", *run(conn, before_sql, params()[0])))
+
+        with Timer() as migration:
+            migrate_changes = migrations.migrate(conn)
+        for label, before_sql, after_sql, params in queries:
+            results.append((label, "after", *run(conn, after_sql, params()[1])))
+        conn.close()
+
+    print(f"Migration of {args.rows} tickets: {migration.elapsed:.1f}s {migrate_changes}")
+    for label, stage, plan, rows, milliseconds in results:
+        print(f"{label:<32} {stage:<6} {milliseconds:8.2f} ms  {rows:>5} rows  {plan}")
+
+if __name__ == "__main__":
+    main()
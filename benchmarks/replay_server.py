@@ -0,0 +1,175 @@
+"""
+Local stand-in for the site that replays recorded JSON responses.
+
+The pages are thin shells that load their data over XHR the way the live
+site does: the city page fetches /api/explore?page=N for each Load More and
+the event page fetches /api/listings?quantity=N for its grid (both also send
+their own path, which fake_site.py uses). The responses come from
+benchmarks/fixtures/responses, so both engines can run offline.
+
+    python -m benchmarks.replay_server --port 8765
+"""
+import argparse
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from benchmarks.common import FIXTURES_DIR
+
+RESPONSES_DIR = FIXTURES_DIR / "responses"
+
+CITY_PAGE = """<!DOCTYPE html>
+<html lang="en"><head><meta charset="utf-8"><title>City Events</title></head>
+<body>
+<div id="app">
+  <div id="explore_tabpanel-0"><div>
+    <div><h2>Events</h2></div>
+    <div>
+      <ul id="event-list"></ul>
+      <div><div><button type="button" id="load-more" style="display:none">Load more</button></div></div>
+    </div>
+  </div></div>
+</div>
+<script>
+  let page = 0;
+  const list = document.getElementById('event-list');
+  const button = document.getElementById('load-more');
+  const load = () => {
+    page += 1;
+    fetch('/api/explore?page=' + page + '&path=' + encodeURIComponent(location.pathname)).then(r => r.json()).then(data => {
+      data.events.forEach(event => {
+        const li = document.createElement('li');
+        li.innerHTML = `<a href="${event.url}?quantity=2"><div><p>${event.name}</p>` +
+          `<p>${event.formattedDateWithoutYear} • ${event.formattedTime}</p><p>${event.venueName}</p></div></a>`;
+        list.appendChild(li);
+      });
+      button.style.display = data.hasMore ? '' : 'none';
+    });
+  };
+  button.addEventListener('click', load);
+  load();
+</script>
+</body></html>
+"""
+
+EVENT_PAGE = """<!DOCTYPE html>
+<html lang="en"><head><meta charset="utf-8"><title>Event Tickets</title>
+<style>#modal-root:empty { display: none; } .listing { cursor: pointer; }</style></head>
+<body>
+<div id="app">
+  <div id="event-detail-header"><div><div>
+    <div>
+      <div><h1>Event</h1></div>
+      <div><div><div>
+        <div><span>Sat, Mar 15 • 7:00 PM</span></div>
+        <div><button type="button">Ball Arena, Denver, CO</button></div>
+      </div></div></div>
+    </div>
+  </div></div></div>
+  <div id="stubhub-event-detail-listings-grid"></div>
+</div>
+<div id="modal-root"></div>
+<script>
+  const quantity = new URLSearchParams(location.search).get('quantity') || '1';
+  const grid = document.getElementById('stubhub-event-detail-listings-grid');
+  const openModal = (item) => {
+    const vip = JSON.stringify(item.listingNotes || []).toLowerCase().includes('vip');
+    document.getElementById('modal-root').innerHTML = `
+      <div><div>
+        <div class="close" role="button">&#x2715;</div>
+        <div id="selected-buyer-listing">
+          <div><h2>Section ${item.sectionName}</h2></div>
+          <div>
+            <div><div><div>Details</div><div>
+              <div><div>Section</div><div><div>Zone</div><div>${item.ticketClassName}</div></div></div>
+            </div></div></div>
+            <div></div><div></div><div></div>
+            <div><div><div>Features</div><div><div><p>${vip ? 'VIP access included' : 'Standard entry'}</p></div></div></div></div>
+          </div>
+        </div>
+      </div></div>`;
+    document.querySelector('#modal-root .close').addEventListener('click', () => {
+      document.getElementById('modal-root').innerHTML = '';
+    });
+  };
+  fetch('/api/listings?quantity=' + quantity + '&path=' + encodeURIComponent(location.pathname)).then(r => r.json()).then(data => {
+    if (!data.items.length) {
+      grid.innerHTML = '<div><div><div><div>Sorry</div><div><span>No tickets available for this quantity</span></div></div></div></div>';
+      return;
+    }
+    grid.innerHTML = '<div><div id="listings-container"></div></div>';
+    const container = document.getElementById('listings-container');
+    data.items.forEach(item => {
+      const tickets = item.availableTickets + (item.availableTickets === 1 ? ' ticket' : ' tickets');
+      const card = document.createElement('div');
+      card.className = 'listing';
+      card.innerHTML = `
+        <div><div></div><div><div>
+          <div>
+            <div><div>Section ${item.sectionName} Row ${item.row} ${tickets}</div></div>
+            <div><div><div>Price</div><div>${item.formattedPrice}</div></div></div>
+          </div>
+          ${item.isSold ? '<div>Sold</div>' : ''}
+        </div></div></div>`;
+      card.addEventListener('click', () => openModal(item));
+      container.appendChild(card);
+    });
+  });
+</script>
+</body></html>
+"""
+
+def load_response(name):
+    return json.loads((RESPONSES_DIR / name).read_text(encoding="utf-8"))
+
+class ReplayHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def send_body(self, body, content_type):
+        data = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        query = parse_qs(parsed.query)
+        if parsed.path.startswith("/api/explore"):
+            page = int(query.get("page", ["1"])[0])
+            path = RESPONSES_DIR / f"explore_page_{page}.json"
+            payload = load_response(path.name) if path.exists() else {"events": [], "hasMore": False}
+            self.send_body(json.dumps(payload), "application/json")
+        elif parsed.path.startswith("/api/listings"):
+            # The recorded grid holds every listing; the site filters by quantity
+            quantity = int(query.get("quantity", ["1"])[0])
+            payload = load_response("listings.json")
+            payload["items"] = [item for item in payload["items"] if item["availableTickets"] >= quantity]
+            self.send_body(json.dumps(payload), "application/json")
+        elif parsed.path.startswith("/city"):
+            self.send_body(CITY_PAGE, "text/html; charset=utf-8")
+        elif "/E-" in parsed.path:
+            self.send_body(EVENT_PAGE, "text/html; charset=utf-8")
+        else:
+            self.send_error(404)
+
+def start_server(port=0):
+    """Start the replay server on a background thread; returns (server, base_url)."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), ReplayHandler)
+    thread = threading.Thread(target=server.serve_forever, name="replay-server", daemon=True)
+    thread.start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve recorded responses for offline scraping.")
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+    server, base_url = start_server(args.port)
+    print(f"Replaying recorded responses at {base_url}/city/Denver (Ctrl+C to stop)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,53 @@
+"""
+Check the vectorized ticket_name parser against the fixture corpus and time
+it against the row-by-row DataFrame.apply it replaces in the export.
+
+fixtures/ticket_names.json holds stored ticket_name values (live-grid
+innerText shapes, single-line names, irregular and empty ones) with the
+(Section, Row, View) that table.parse_ticket_name returned for them before
+the vectorized parser existed.
+
+    python -m benchmarks.ticket_name_parsing --rows 200000
+"""
+import argparse
+import json
+
+import pandas as pd
+
+from table import parse_ticket_name
+from ticket_names import parse_ticket_names, split_ticket_name
+from benchmarks.common import FIXTURES_DIR, Timer
+
+def load_corpus():
+    return json.loads((FIXTURES_DIR / "ticket_names.json").read_text(encoding="utf-8"))
+
+def check_corpus(corpus):
+    names = pd.Series([entry['ticket_name'] for entry in corpus], dtype=object)
+    parsed = parse_ticket_names(names)
+    for entry, vectorized in zip(corpus, parsed.itertuples(index=False, name=None)):
+        expected = tuple(entry['expected'])
+        assert vectorized == expected, f"parse_ticket_names({entry['ticket_name']!r}) = {vectorized}, expected {expected}"
+        assert split_ticket_name(entry['ticket_name']) == expected, f"split_ticket_name({entry['ticket_name']!r}) changed"
+    print(f"{len(corpus)} corpus names parsed identically by both parsers")
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the ticket_name parsers.")
+    parser.add_argument('--rows', type=int, default=200000)
+    args = parser.parse_args()
+
+    corpus = load_corpus()
+    check_corpus(corpus)
+
+    names = pd.Series([entry['ticket_name'] for entry in corpus] * (args.rows // len(corpus) + 1), dtype=object)[:args.rows]
+    with Timer() as row_timer:
+        by_row = names.apply(parse_ticket_name)
+    with Timer() as vectorized_timer:
+        vectorized = parse_ticket_names(names)
+    assert by_row.astype(object).where(by_row.notna(), None).values.tolist() == vectorized.values.tolist()
+
+    print(f"{len(names)} names: apply(parse_ticket_name) {row_timer.elapsed:.2f}s, "
+          f"parse_ticket_names {vectorized_timer.elapsed:.2f}s "
+          f"({row_timer.elapsed / vectorized_timer.elapsed:.1f}x faster)")
+
+if __name__ == "__main__":
+    main()
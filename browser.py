@@ -0,0 +1,126 @@
+"""
+Chrome driver factory shared by main.py and tickets.py.
+
+A BrowserProfile holds the options one script starts Chrome with. The
+"performance" profile is the default:
+- it runs headless;
+- it returns from driver.get() at DOMContentLoaded (pageLoadStrategy=eager),
+  since the scrapers wait for the elements they need anyway;
+- it blocks images, media, fonts and known trackers through CDP
+  Network.setBlockedURLs;
+- it turns off extensions and Chrome's background networking.
+
+The "compatible" profile is the previous setup: a visible window, the full
+load event and every resource downloaded. Use it when the site changes and
+a page has to be inspected by eye.
+"""
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service
+
+from instrumentation import get_logger
+from network_capture import enable_performance_log
+
+logger = get_logger('browser')
+
+# Network.setBlockedURLs patterns; '*' matches any run of characters
+image_patterns = ['*.png', '*.png?*', '*.jpg', '*.jpg?*', '*.jpeg', '*.jpeg?*', '*.gif', '*.gif?*',
+                  '*.webp', '*.webp?*', '*.avif', '*.avif?*', '*.svg', '*.svg?*', '*.ico', '*.ico?*']
+media_patterns = ['*.mp4', '*.mp4?*', '*.webm', '*.webm?*', '*.mp3', '*.mp3?*', '*.m3u8', '*.m3u8?*']
+font_patterns = ['*.woff', '*.woff?*', '*.woff2', '*.woff2?*', '*.ttf', '*.ttf?*', '*.otf', '*.otf?*', '*.eot', '*.eot?*']
+tracker_patterns = [
+    '*google-analytics.com*', '*googletagmanager.com*', '*googleadservices.com*', '*doubleclick.net*',
+    '*googlesyndication.com*', '*facebook.net*', '*connect.facebook.*', '*hotjar.com*', '*segment.io*',
+    '*segment.com/analytics*', '*optimizely.com*', '*nr-data.net*', '*newrelic.com*', '*criteo.*',
+    '*bat.bing.com*', '*clarity.ms*', '*tiktok.com/i18n/pixel*', '*quantserve.com*', '*scorecardresearch.com*',
+    '*/gtm.js*', '*/analytics.js*',
+]
+
+# Chrome switches that stop work the scrapers never need
+lean_arguments = [
+    "--disable-extensions",
+    "--disable-background-networking",
+    "--disable-component-update",
+    "--disable-default-apps",
+    "--disable-sync",
+    "--no-first-run",
+    "--mute-audio",
+]
+
+class BrowserProfile:
+    def __init__(self, name, headless=True, page_load_strategy='eager', block_images=True, block_media=True,
+                 block_fonts=True, block_trackers=True, lean=True, extra_blocked_urls=()):
+        self.name = name
+        self.headless = headless
+        self.page_load_strategy = page_load_strategy
+        self.block_images = block_images
+        self.block_media = block_media
+        self.block_fonts = block_fonts
+        self.block_trackers = block_trackers
+        self.lean = lean
+        self.extra_blocked_urls = list(extra_blocked_urls)
+
+    def with_options(self, **changes):
+        """A copy of this profile with some options changed, e.g. with_options(headless=False)."""
+        options = {**vars(self), **changes}
+        return BrowserProfile(**options)
+
+    def blocked_urls(self):
+        urls = []
+        if self.block_images:
+            urls += image_patterns
+        if self.block_media:
+            urls += media_patterns
+        if self.block_fonts:
+            urls += font_patterns
+        if self.block_trackers:
+            urls += tracker_patterns
+        return urls + self.extra_blocked_urls
+
+profiles = {
+    'performance': BrowserProfile('performance'),
+    'compatible': BrowserProfile('compatible', headless=False, page_load_strategy='normal', block_images=False,
+                                 block_media=False, block_fonts=False, block_trackers=False, lean=False),
+}
+
+def chrome_options_for(profile, network_capture=False):
+    chrome_options = Options()
+    if profile.headless:
+        chrome_options.add_argument("--headless")
+    chrome_options.add_argument("--no-sandbox")
+    chrome_options.add_argument("--disable-dev-shm-usage")
+    chrome_options.add_argument("--lang=en")
+    if profile.lean:
+        for argument in lean_arguments:
+            chrome_options.add_argument(argument)
+    if profile.block_images:
+        # Also skip decoding images that slip past the URL patterns (data: URLs, extensionless paths)
+        chrome_options.add_argument("--blink-settings=imagesEnabled=false")
+    chrome_options.page_load_strategy = profile.page_load_strategy
+    if network_capture:
+        enable_performance_log(chrome_options)
+    return chrome_options
+
+def create_driver(profile=profiles['performance'], network_capture=False):
+    """Start Chrome with the profile's options and URL blocking."""
+    service = Service()  # Update with the path to your ChromeDriver
+    driver = webdriver.Chrome(service=service, options=chrome_options_for(profile, network_capture))
+    blocked = profile.blocked_urls()
+    if blocked:
+        # Blocking applies to the driver's tab for every later navigation
+        driver.execute_cdp_cmd('Network.enable', {})
+        driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': blocked})
+    logger.debug("Started Chrome with the %s profile (%d blocked URL patterns).", profile.name, len(blocked))
+    return driver
+
+def add_arguments(parser):
+    """The browser options shared by main.py and tickets.py."""
+    parser.add_argument('--browser-profile', choices=sorted(profiles), default='performance',
+                        help="performance: headless, eager page loads, no images/fonts/trackers; "
+                             "compatible: a normal visible browser")
+    parser.add_argument('--headed', action='store_true',
+                        help="Show the browser window with the chosen profile")
+
+def profile_from_args(args):
+    profile = profiles[args.browser_profile]
+    return profile.with_options(headless=False) if args.headed else profile
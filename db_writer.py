@@ -0,0 +1,276 @@
+"""
+Batched SQLite writer shared by main.py and tickets.py.
+
+Rows are queued from any thread and written by one dedicated writer thread
+with executemany, one transaction per batch. A batch is flushed when it
+reaches batch_size rows or when flush_interval seconds have passed since the
+first queued row, so scraping threads never wait on disk. The database runs
+in WAL mode so readers (claims, event lookups) are not blocked by the writer.
+
+Worker processes (tickets.py --workers) write through a QueueWriter, which
+sends their rows to the parent process; the parent's DatabaseWriter stays
+the only writer.
+"""
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+from instrumentation import get_logger, tracer
+
+logger = get_logger('db_writer')
+
+# A batch that finds the database locked is tried again this many times, lock_backoff, 2 * lock_backoff, ... apart
+lock_retries = 3
+lock_backoff = 1.0
+
+class DatabaseWriteError(sqlite3.Error):
+    """Queued rows were not committed. Raised by their owner's next DatabaseWriter.flush(), or by close()."""
+
+def is_locked(error):
+    message = str(error).lower()
+    return 'locked' in message or 'busy' in message
+
+def configure_connection(conn):
+    """Apply the pragmas every connection to events.db should use."""
+    conn.execute("PRAGMA journal_mode=WAL")
+    # With WAL, NORMAL only syncs at checkpoints and is still crash-safe
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA cache_size=-65536")  # 64 MiB
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA busy_timeout=30000")
+    return conn
+
+class DatabaseWriter:
+    """
+    Queue rows with write(sql, params) and let the writer thread commit them.
+    Consecutive rows with the same SQL are grouped into one executemany call.
+    Call flush() to wait until everything queued so far is committed, and
+    close() at shutdown so nothing is lost. A batch that fails is retried
+    while the database is locked, then written row by row so only the rows
+    that fail are dropped. Each row has an owner, the thread that wrote it
+    unless write() is given another; the owner's next flush() raises
+    DatabaseWriteError for its lost rows, so a thread sharing the writer is
+    never blamed for another's. close() raises for rows no flush() claimed.
+    """
+
+    def __init__(self, database_path, batch_size=500, flush_interval=1.0):
+        self.database_path = database_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.rows_written = 0
+        self.rows_ignored = 0
+        self.batches = 0
+        self.write_seconds = 0.0
+        self.errors = 0
+        self._lock = threading.Lock()
+        self._failures = {}  # owner -> DatabaseWriteError
+        self._queue = queue.Queue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+        self._thread.start()
+
+    def write(self, sql, params, owner=None):
+        if self._closed:
+            raise RuntimeError("DatabaseWriter is closed")
+        self._queue.put((sql, params, threading.get_ident() if owner is None else owner))
+
+    def write_many(self, sql, rows, owner=None):
+        for params in rows:
+            self.write(sql, params, owner)
+
+    def flush(self, owner=None):
+        """
+        Block until every row queued before this call has been committed.
+        Raises DatabaseWriteError if rows of owner (by default the calling
+        thread) were lost since its last flush().
+        """
+        marker = FlushMarker(threading.get_ident() if owner is None else owner)
+        self._queue.put(marker)
+        while not marker.done.wait(1.0):
+            if not self._thread.is_alive():
+                raise DatabaseWriteError("DB writer thread has stopped")
+        if marker.failure is not None:
+            raise marker.failure
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+        logger.info("DB writer closed: %d rows written, %d duplicates ignored, %d batches, %.2fs writing.",
+                    self.rows_written, self.rows_ignored, self.batches, self.write_seconds)
+        with self._lock:
+            failures, self._failures = self._failures, {}
+        if failures:
+            raise next(iter(failures.values()))
+
+    def _run(self):
+        conn = configure_connection(sqlite3.connect(self.database_path))
+        pending = []
+        first_queued = None
+        try:
+            while True:
+                timeout = None
+                if pending:
+                    timeout = max(0.0, first_queued + self.flush_interval - time.time())
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    item = False  # Flush interval elapsed
+
+                if isinstance(item, tuple):
+                    if not pending:
+                        first_queued = time.time()
+                    pending.append(item)
+                    if len(pending) < self.batch_size:
+                        continue
+
+                if pending:
+                    self._commit(conn, pending)
+                    pending = []
+
+                if isinstance(item, FlushMarker):
+                    with self._lock:
+                        item.failure = self._failures.pop(item.owner, None)
+                    item.done.set()
+                elif item is None:
+                    break
+        except Exception as e:
+            self._fail(f"writer thread stopped: {e}", [None])
+            raise
+        finally:
+            conn.close()
+
+    def _commit(self, conn, pending):
+        started = time.time()
+        try:
+            for attempt in range(lock_retries + 1):
+                try:
+                    with conn:
+                        written, ignored = self._execute(conn, pending)
+                except sqlite3.OperationalError as e:
+                    if not is_locked(e):
+                        error = e
+                        break
+                    if attempt == lock_retries:
+                        # Row by row would only wait on the lock again
+                        self._fail(f"{len(pending)} rows not committed, database still locked after "
+                                   f"{lock_retries} retries: {e}", [row[2] for row in pending])
+                        return
+                    logger.warning("DB writer found the database locked (%s), retrying %d rows.", e, len(pending))
+                    time.sleep(lock_backoff * 2 ** attempt)
+                except sqlite3.Error as e:
+                    error = e
+                    break
+                else:
+                    self._count(written, ignored)
+                    return
+            # One bad row must not cost the rest of the batch
+            logger.warning("DB writer failed to commit %d rows (%s), writing them one by one.", len(pending), error)
+            self._commit_rows(conn, pending)
+        finally:
+            elapsed = time.time() - started
+            self.write_seconds += elapsed
+            tracer.record('db_write', elapsed, rows=len(pending))
+
+    def _commit_rows(self, conn, pending):
+        written = ignored = 0
+        dropped = []
+        try:
+            with conn:
+                for row in pending:
+                    try:
+                        row_written, row_ignored = self._execute(conn, [row])
+                    except sqlite3.Error as e:
+                        dropped.append((row[2], e))
+                        logger.error("DB writer dropped a row: %s\n%s\n%r", e, row[0].strip(), row[1])
+                    else:
+                        written += row_written
+                        ignored += row_ignored
+        except sqlite3.Error as e:
+            self._fail(f"{len(pending)} rows not committed: {e}", [row[2] for row in pending])
+            return
+        self._count(written, ignored)
+        for owner in {owner for owner, _ in dropped}:
+            errors = [e for dropped_owner, e in dropped if dropped_owner == owner]
+            self._fail(f"{len(errors)} of {len(pending)} rows not committed: {errors[-1]}", [owner])
+
+    def _execute(self, conn, pending):
+        """Run the rows, grouping consecutive ones that share a statement. Returns (written, ignored) INSERT rows."""
+        written = ignored = 0
+        start = 0
+        while start < len(pending):
+            sql = pending[start][0]
+            end = start
+            while end < len(pending) and pending[end][0] == sql:
+                end += 1
+            before = conn.total_changes
+            conn.executemany(sql, [row[1] for row in pending[start:end]])
+            if sql.lstrip().upper().startswith('INSERT'):
+                changed = conn.total_changes - before
+                written += changed
+                # INSERT OR IGNORE rows that hit a constraint change nothing
+                ignored += end - start - changed
+            start = end
+        return written, ignored
+
+    def _count(self, written, ignored):
+        self.rows_written += written
+        self.rows_ignored += ignored
+        self.batches += 1
+
+    def _fail(self, message, owners):
+        """Record that rows of owners were lost, for their next flush()."""
+        self.errors += 1
+        logger.error("DB writer: %s", message)
+        with self._lock:
+            for owner in set(owners):
+                self._failures.setdefault(owner, DatabaseWriteError(message))
+
+class FlushMarker:
+    """Queued by flush(): set once the rows before it are committed, with the failure of owner's rows if any."""
+
+    def __init__(self, owner):
+        self.owner = owner
+        self.done = threading.Event()
+        self.failure = None
+
+class QueueWriter:
+    """
+    DatabaseWriter stand-in for a worker process. Rows are sent in batches
+    over a multiprocessing queue as ('rows', sender, [(sql, params), ...]).
+    Messages sent with send() arrive after every row written before them, so
+    the parent can act on them (complete a work item) once those rows are
+    committed.
+    """
+
+    def __init__(self, channel, sender, batch_size=200):
+        self.channel = channel
+        self.sender = sender
+        self.batch_size = batch_size
+        self.pending = []
+
+    def write(self, sql, params):
+        self.pending.append((sql, params))
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def write_many(self, sql, rows):
+        for params in rows:
+            self.write(sql, params)
+
+    def flush(self):
+        """Hand the rows queued so far to the parent, which commits them in order."""
+        if self.pending:
+            self.channel.put(('rows', self.sender, self.pending))
+            self.pending = []
+
+    def send(self, kind, payload=None):
+        self.flush()
+        self.channel.put((kind, self.sender, payload))
+
+    def close(self):
+        self.send('exit', os.getpid())
@@ -0,0 +1,71 @@
+"""
+Known-event cutoff for re-crawls (main.py --delta N).
+
+A city's feed lists its events in a stable order, so once a re-crawl has
+read N events in a row that are already in the database, the pages behind
+them are almost always known too. KnownEvents loads the stored event links
+of every city with one query at the start of a run; each city's feed is then
+followed by a CityCutoff, which says when to stop clicking Load More and
+estimates how many clicks that saved.
+
+Events that only appear behind the cutoff are picked up by the next crawl
+run without --delta.
+"""
+import math
+
+# Consecutive known events after which --delta stops a city's feed when no N is given
+default_cutoff = 30
+
+class CityCutoff:
+    """Follows one city's feed, batch by batch, against the event links stored for that city."""
+
+    def __init__(self, known_links, cutoff):
+        self.known_links = known_links
+        self.cutoff = cutoff
+        self.reset()
+
+    def reset(self):
+        # A retried city starts over on a fresh browser
+        self.known_run = 0
+        self.known_seen = 0
+        self.batch_size = 0
+        self.stopped = False
+
+    def observe_batch(self, event_links):
+        """Record one Load More batch in feed order. Returns True once the feed should stop."""
+        if not self.batch_size:
+            self.batch_size = len(event_links)
+        for event_link in event_links:
+            if event_link in self.known_links:
+                self.known_run += 1
+                self.known_seen += 1
+            else:
+                self.known_run = 0
+        self.stopped = self.known_run >= self.cutoff
+        return self.stopped
+
+    def skipped_expansions(self):
+        """Load More clicks saved, estimated from the known events not reached and the size of the first batch."""
+        if not self.stopped or not self.batch_size:
+            return 0
+        return math.ceil(max(len(self.known_links) - self.known_seen, 0) / self.batch_size)
+
+class KnownEvents:
+    """Stored event links by (state, city), loaded in bulk."""
+
+    def __init__(self, links_by_city, cutoff=default_cutoff):
+        self.links_by_city = links_by_city
+        self.cutoff = cutoff
+
+    @classmethod
+    def load(cls, conn, cutoff=default_cutoff):
+        links_by_city = {}
+        for state, city, event_link in conn.execute('SELECT state, city, event_link FROM events'):
+            links_by_city.setdefault((state, city), set()).add(event_link)
+        return cls(links_by_city, cutoff)
+
+    def __len__(self):
+        return sum(len(links) for links in self.links_by_city.values())
+
+    def for_city(self, state, city):
+        return CityCutoff(self.links_by_city.get((state, city), frozenset()), self.cutoff)
@@ -0,0 +1,304 @@
+"""
+Browser lifecycle for long runs.
+
+A DriverPool hands out ManagedDriver slots. Each slot wraps one Chrome and
+runs units of work (a city, an event) on it:
+
+- recycling: between units, a browser that has loaded max_pages pages, or
+  whose process tree uses more than max_rss_mb of memory, is replaced.
+  Chrome's memory otherwise keeps growing over thousands of pages;
+- crash recovery: when a unit fails because the session is dead (renderer
+  crash, chromedriver gone, a page that never finished loading), the
+  browser is replaced and the unit is retried up to unit_retries times;
+- warm spares: a background thread keeps `warm` browsers started, so a
+  recycle or respawn swaps in a ready browser instead of waiting for Chrome;
+- pacing: with a pacing.Pacer, every page load waits for its host's rate
+  limit and every unit for a concurrency slot.
+
+    pool = DriverPool(create_driver, network_capture=True, warm=1)
+    managed = pool.acquire()
+    managed.run(lambda driver, capture: scrape_city(driver, writer, state, city, city_href, capture))
+    pool.close()
+"""
+import os
+import queue
+import threading
+import time
+
+from selenium.common.exceptions import InvalidSessionIdException, NoSuchWindowException, WebDriverException
+from urllib3.exceptions import HTTPError as Urllib3HTTPError
+
+from instrumentation import get_logger
+from network_capture import NetworkCapture
+
+logger = get_logger('driver_manager')
+
+# Messages of WebDriverExceptions that mean the browser session cannot be used any more
+dead_session_markers = (
+    'chrome not reachable',
+    'session deleted',
+    'invalid session id',
+    'no such session',
+    'disconnected',
+    'tab crashed',
+    'target crashed',
+    'target window already closed',
+    'timed out receiving message from renderer',
+    'unable to receive message from renderer',
+)
+
+# A page that takes longer than this to load raises a TimeoutException instead of hanging the worker
+page_load_timeout = 60
+
+def is_session_dead_error(error):
+    """True if the exception says the browser session is gone (crashed, killed or unreachable)."""
+    if isinstance(error, (InvalidSessionIdException, NoSuchWindowException, ConnectionError, Urllib3HTTPError)):
+        return True
+    if isinstance(error, WebDriverException):
+        message = (error.msg or str(error)).lower()
+        return any(marker in message for marker in dead_session_markers)
+    return False
+
+def describe_error(error):
+    lines = str(error).strip().splitlines()
+    return lines[0] if lines else type(error).__name__
+
+def process_tree_rss_mb(pid):
+    """
+    Resident memory of a process and all its descendants in MiB, read from
+    /proc. chromedriver's pid covers every Chrome process it started.
+    Returns None where /proc is not available.
+    """
+    if not os.path.isdir('/proc'):
+        return None
+    children = {}
+    rss_pages = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat', 'rb') as stat_file:
+                # The command name can contain spaces; the fields after it are fixed
+                fields = stat_file.read().rsplit(b')', 1)[1].split()
+        except OSError:
+            continue
+        children.setdefault(int(fields[1]), []).append(int(entry))
+        rss_pages[int(entry)] = int(fields[21])
+    total = 0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        total += rss_pages.get(current, 0)
+        pending.extend(children.get(current, []))
+    return total * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+
+def available_memory_mb():
+    """MemAvailable from /proc/meminfo in MiB, or None where it is not available."""
+    try:
+        with open('/proc/meminfo') as meminfo:
+            for line in meminfo:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+def worker_budget(max_rss_mb):
+    """Browsers this machine can run side by side: one per core, and only as many as fit in available memory at max_rss_mb each."""
+    budget = os.cpu_count() or 4
+    memory = available_memory_mb()
+    if memory and max_rss_mb:
+        budget = min(budget, int(memory // max_rss_mb))
+    return max(1, budget)
+
+class ManagedDriver:
+    """One browser slot. Use run() for each unit of work; the driver behind it may change between units."""
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.driver = None
+        self.capture = None
+        self.pages = 0
+        self._install(pool.take_driver())
+
+    def _install(self, driver):
+        self.driver = driver
+        self.capture = NetworkCapture(driver) if self.pool.network_capture else None
+        self.pages = 0
+        original_get = driver.get
+
+        def counting_get(page_url):
+            self.pages += 1
+            if self.pool.pacer is None:
+                return original_get(page_url)
+            return self.pool.pacer.request(page_url, original_get)
+
+        driver.get = counting_get
+
+    def rss_mb(self):
+        service = getattr(self.driver, 'service', None)
+        process = getattr(service, 'process', None)
+        return process_tree_rss_mb(process.pid) if process else None
+
+    def recycle_reason(self):
+        if self.pool.max_pages and self.pages >= self.pool.max_pages:
+            return f"{self.pages} pages loaded"
+        if self.pool.max_rss_mb:
+            rss = self.rss_mb()
+            if rss is not None and rss > self.pool.max_rss_mb:
+                return f"{rss:.0f} MiB resident"
+        return None
+
+    def is_alive(self):
+        try:
+            self.driver.execute_script("return 1")
+            return True
+        except Exception:
+            return False
+
+    def replace(self, reason):
+        logger.info("Replacing browser (%s).", reason)
+        old_driver = self.driver
+        self._install(self.pool.take_driver())
+        self.pool.discard(old_driver)
+
+    def run(self, unit):
+        """
+        Call unit(driver, capture) and return its result. A browser due for
+        recycling is replaced first. If the unit fails on a dead session, the
+        browser is replaced and the unit runs again, up to the pool's
+        unit_retries; other errors are raised as they are.
+        """
+        if self.pool.pacer is None:
+            return self._run(unit)
+        with self.pool.pacer.unit():
+            return self._run(unit)
+
+    def _run(self, unit):
+        reason = self.recycle_reason()
+        if reason:
+            self.pool.count('recycled')
+            self.replace(reason)
+
+        attempt = 0
+        while True:
+            try:
+                return unit(self.driver, self.capture)
+            except Exception as e:
+                # Errors without a known marker can still come from a dead browser; probe it
+                if not is_session_dead_error(e) and self.is_alive():
+                    raise
+                if attempt >= self.pool.unit_retries:
+                    logger.error("Browser died again after %d retries: %s", attempt, describe_error(e))
+                    self.pool.count('respawned')
+                    self.replace("dead session")
+                    raise
+                attempt += 1
+                self.pool.count('respawned')
+                self.pool.count('retries')
+                self.replace(f"dead session: {describe_error(e)}")
+
+    def release(self):
+        self.pool.discard(self.driver)
+        self.driver = None
+        self.capture = None
+
+class DriverPool:
+    def __init__(self, factory, network_capture=False, warm=1, max_pages=500, max_rss_mb=1500, unit_retries=1, pacer=None):
+        self.factory = factory
+        self.pacer = pacer
+        self.network_capture = network_capture
+        self.warm = warm
+        self.max_pages = max_pages
+        self.max_rss_mb = max_rss_mb
+        self.unit_retries = unit_retries
+        self.stats = {'started': 0, 'recycled': 0, 'respawned': 0, 'retries': 0}
+        self.lock = threading.Lock()
+        self._spares = queue.Queue()
+        self._closed = False
+        self._refill = threading.Event()
+        self._warmer = None
+        if warm:
+            self._warmer = threading.Thread(target=self._keep_warm, name="driver-warmer", daemon=True)
+            self._warmer.start()
+            self._refill.set()
+
+    def count(self, key):
+        with self.lock:
+            self.stats[key] += 1
+
+    def _start_driver(self):
+        driver = self.factory(network_capture=self.network_capture)
+        driver.set_page_load_timeout(page_load_timeout)
+        self.count('started')
+        return driver
+
+    def _keep_warm(self):
+        while True:
+            self._refill.wait()
+            self._refill.clear()
+            while not self._closed and self._spares.qsize() < self.warm:
+                try:
+                    driver = self._start_driver()
+                except Exception as e:
+                    logger.error("Could not start a spare browser: %s", e)
+                    time.sleep(5)
+                    continue
+                if self._closed:
+                    self._quit(driver)
+                    break
+                self._spares.put(driver)
+            if self._closed:
+                return
+
+    def take_driver(self):
+        """A started browser: a warm spare if one is ready, otherwise a new one."""
+        try:
+            driver = self._spares.get_nowait()
+        except queue.Empty:
+            driver = self._start_driver()
+        self._refill.set()
+        return driver
+
+    def acquire(self):
+        return ManagedDriver(self)
+
+    def _quit(self, driver):
+        try:
+            driver.quit()
+        except Exception as e:
+            logger.debug("Browser did not quit cleanly: %s", e)
+
+    def discard(self, driver):
+        if driver is not None:
+            self._quit(driver)
+
+    def close(self):
+        self._closed = True
+        self._refill.set()
+        if self._warmer:
+            self._warmer.join(timeout=60)
+        while True:
+            try:
+                self._quit(self._spares.get_nowait())
+            except queue.Empty:
+                break
+        logger.info("Browsers: %(started)d started, %(recycled)d recycled, %(respawned)d respawned, "
+                    "%(retries)d unit retries.", self.stats)
+        if self.pacer is not None:
+            self.pacer.log_summary()
+
+def add_arguments(parser):
+    """The browser lifecycle options shared by main.py and tickets.py."""
+    parser.add_argument('--recycle-pages', type=int, default=500,
+                        help="Restart a browser after this many page loads (0: never)")
+    parser.add_argument('--max-rss', type=float, default=1500,
+                        help="Restart a browser whose processes use more than this many MiB (0: never)")
+    parser.add_argument('--warm', type=int, default=1,
+                        help="Spare browsers kept started for recycling and crash recovery")
+    parser.add_argument('--unit-retries', type=int, default=1,
+                        help="Times a city or event is retried on a fresh browser after the old one died")
+
+def pool_from_args(args, factory, network_capture=False, pacer=None, warm=None):
+    return DriverPool(factory, network_capture, warm=args.warm if warm is None else warm, max_pages=args.recycle_pages,
+                      max_rss_mb=args.max_rss, unit_retries=args.unit_retries, pacer=pacer)
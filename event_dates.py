@@ -0,0 +1,78 @@
+"""
+Parse the display strings the event feed shows for dates and times
+(e.g. "Sat, Mar 15" and "7:30 PM") into datetime objects.
+"""
+import datetime
+import time
+
+# Formats seen on the event cards, with and without the year
+date_formats_with_year = ["%a, %b %d %Y", "%a, %b %d, %Y", "%b %d %Y", "%b %d, %Y", "%a %b %d %Y", "%Y-%m-%d"]
+date_formats_without_year = ["%a, %b %d", "%a %b %d", "%b %d"]
+time_formats = ["%I:%M %p", "%I:%M%p", "%H:%M", "%I %p"]
+
+# A date without a year this close before today is an event that has just taken place, not next year's
+past_grace = datetime.timedelta(days=7)
+
+def parse_event_date(text, today=None):
+    """
+    Return the event date as a datetime.date, or None if it cannot be parsed.
+    The feed only lists upcoming events, so a date shown without a year is
+    the next one on or after today, less past_grace for events that have
+    just taken place: "Mar 15" read in December is next year's. If the
+    weekday is shown and that date falls on another weekday, the year after
+    is taken when it matches.
+    """
+    if not text:
+        return None
+    today = today or datetime.date.today()
+    value = " ".join(text.replace("\n", " ").split())
+
+    lowered = value.lower()
+    if lowered == "today":
+        return today
+    if lowered == "tomorrow":
+        return today + datetime.timedelta(days=1)
+
+    for date_format in date_formats_with_year:
+        try:
+            return datetime.datetime.strptime(value, date_format).date()
+        except ValueError:
+            pass
+
+    for date_format in date_formats_without_year:
+        try:
+            # Parse with a leap year so "Feb 29" is accepted, then pick the year
+            parsed = datetime.datetime.strptime(f"{value} 2000", f"{date_format} %Y").date()
+        except ValueError:
+            continue
+        earliest = today - past_grace
+        candidates = []
+        # Feb 29 comes round within four years
+        for year in range(earliest.year, earliest.year + 5):
+            try:
+                candidate = parsed.replace(year=year)
+            except ValueError:  # Feb 29 in a non-leap year
+                continue
+            if candidate >= earliest:
+                candidates.append(candidate)
+        if not candidates:
+            return None
+        if date_format.startswith("%a"):
+            weekday = time.strptime(value.split()[0].rstrip(","), "%a").tm_wday
+            for candidate in candidates[:2]:
+                if candidate.weekday() == weekday:
+                    return candidate
+        return candidates[0]
+    return None
+
+def parse_event_time(text):
+    """Return the event time as a datetime.time, or None if it cannot be parsed."""
+    if not text:
+        return None
+    value = " ".join(text.split()).upper()
+    for time_format in time_formats:
+        try:
+            return datetime.datetime.strptime(value, time_format).time()
+        except ValueError:
+            pass
+    return None
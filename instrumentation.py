@@ -0,0 +1,170 @@
+"""
+Logging and phase timing for the scrapers.
+
+Messages go through the standard logging module under the "viagogo" logger.
+Per-event and per-listing messages are DEBUG, so they are skipped (and not
+even formatted) at the default INFO level.
+
+Time is measured with spans. Each span times one phase: page_load, wait,
+extract, modal or db_write. It carries the tags of the thread it runs on:
+
+    with tracer.tagged(state=state, city=city):
+        with tracer.span('page_load'):
+            driver.get(city_href)
+
+Every span goes into a per-phase window, which the periodic summary uses to
+log p50/p95 per phase and pages/min. With a trace file configured, each span
+is also written as one JSON line, so a production run can be profiled later:
+
+    {"ts": 1760700000.12, "phase": "page_load", "ms": 812.4, "thread": "city-worker-1", "state": "Colorado", "city": "Denver"}
+"""
+import collections
+import contextlib
+import json
+import logging
+import threading
+import time
+
+logger = logging.getLogger("viagogo")
+
+log_format = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+log_levels = ['DEBUG', 'INFO', 'WARNING', 'ERROR']
+
+# Spans of this phase are the page loads counted for pages/min
+page_load_phase = 'page_load'
+
+def get_logger(name):
+    """Logger for one module, e.g. get_logger('tickets') -> "viagogo.tickets"."""
+    return logger.getChild(name)
+
+def configure_logging(level='INFO'):
+    # Selenium and urllib3 log every WebDriver request at DEBUG; keep them at WARNING
+    logging.basicConfig(level=logging.WARNING, format=log_format)
+    logger.setLevel(level)
+
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+class Tracer:
+    """
+    Collect spans from any thread. Tags set with tagged() apply to every span
+    opened inside that block on the same thread. The summary is logged every
+    summary_interval seconds by whichever thread closes a span after it is due.
+    """
+
+    def __init__(self, summary_interval=60.0, window=2000):
+        self.summary_interval = summary_interval
+        self.window = window
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.trace_file = None
+        self.reset()
+
+    def configure(self, trace_path=None, summary_interval=None):
+        """Start writing spans to trace_path (JSON lines, appended) and/or change the summary interval."""
+        with self.lock:
+            if self.trace_file:
+                self.trace_file.close()
+            self.trace_file = open(trace_path, "a", encoding="utf-8") if trace_path else None
+            if summary_interval is not None:
+                self.summary_interval = summary_interval
+
+    def reset(self):
+        with self.lock:
+            self.started = time.time()
+            self.last_summary = self.started
+            self.samples = {}
+            self.counts = collections.Counter()
+            self.totals = collections.Counter()
+
+    def current_tags(self):
+        stack = getattr(self.local, 'tags', None)
+        return stack[-1] if stack else {}
+
+    @contextlib.contextmanager
+    def tagged(self, **tags):
+        """Add tags to the spans opened in this block on the current thread."""
+        stack = self.local.__dict__.setdefault('tags', [])
+        stack.append({**self.current_tags(), **tags})
+        try:
+            yield
+        finally:
+            stack.pop()
+
+    def update_tags(self, **tags):
+        """Change the tags of the innermost tagged() block, e.g. the quantity inside an event."""
+        stack = getattr(self.local, 'tags', None)
+        if stack:
+            stack[-1].update(tags)
+
+    @contextlib.contextmanager
+    def span(self, phase, **tags):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(phase, time.perf_counter() - started, **tags)
+
+    def record(self, phase, seconds, **tags):
+        """Record a span that was timed elsewhere (the waits and the DB writer time their own work)."""
+        now = time.time()
+        with self.lock:
+            window = self.samples.get(phase)
+            if window is None:
+                window = self.samples[phase] = collections.deque(maxlen=self.window)
+            window.append(seconds)
+            self.counts[phase] += 1
+            self.totals[phase] += seconds
+            if self.trace_file:
+                entry = {'ts': round(now, 3), 'phase': phase, 'ms': round(seconds * 1000, 1),
+                         'thread': threading.current_thread().name, **self.current_tags(), **tags}
+                self.trace_file.write(json.dumps(entry, default=str) + "\n")
+            summary_due = self.summary_interval and now - self.last_summary >= self.summary_interval
+            if summary_due:
+                self.last_summary = now
+        if summary_due:
+            self.log_summary()
+
+    def pages_per_minute(self):
+        elapsed = time.time() - self.started
+        return self.counts[page_load_phase] / (elapsed / 60) if elapsed > 0 else 0.0
+
+    def summary(self):
+        """{phase: {count, total, p50, p95}} with times in seconds; p50/p95 cover the recent window."""
+        with self.lock:
+            windows = {phase: sorted(window) for phase, window in self.samples.items()}
+            counts = dict(self.counts)
+            totals = dict(self.totals)
+        return {phase: {'count': counts[phase], 'total': totals[phase],
+                        'p50': percentile(ordered, 0.5), 'p95': percentile(ordered, 0.95)}
+                for phase, ordered in windows.items()}
+
+    def log_summary(self, level=logging.INFO):
+        if not logger.isEnabledFor(level):
+            return
+        phases = self.summary()
+        logger.log(level, "Timing: %.1f pages/min over %.0fs", self.pages_per_minute(), time.time() - self.started)
+        for phase, entry in sorted(phases.items()):
+            logger.log(level, "  %s: %d spans, %.1fs total, p50 %.0f ms, p95 %.0f ms",
+                       phase, entry['count'], entry['total'], entry['p50'] * 1000, entry['p95'] * 1000)
+
+    def close(self):
+        with self.lock:
+            if self.trace_file:
+                self.trace_file.close()
+                self.trace_file = None
+
+tracer = Tracer()
+
+def add_arguments(parser):
+    """The logging and tracing options shared by main.py and tickets.py."""
+    parser.add_argument('--log-level', choices=log_levels, default='INFO',
+                        help="DEBUG logs every event and listing (slow under load)")
+    parser.add_argument('--trace', metavar='FILE',
+                        help="Append a JSON line per span (page load, wait, extract, modal, DB write) to FILE")
+    parser.add_argument('--summary-interval', type=float, default=60,
+                        help="Seconds between p50/p95 timing summaries (0 disables them until the end of the run)")
+
+def configure(args):
+    configure_logging(args.log_level)
+    tracer.configure(args.trace, args.summary_interval)
@@ -1,14 +1,58 @@
-from selenium import webdriver
 from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import StaleElementReferenceException, NoSuchElementException
 from urllib.parse import urlparse, parse_qs, urlencode, urlunparse
+import argparse
+import json
+import os
 import sqlite3
+import threading
 import time
 
+import browser
+import driver_manager
+import instrumentation
+import pacing
+import page_archive
+import work_queue
+from db_writer import DatabaseWriter, configure_connection
+from delta_crawl import KnownEvents, default_cutoff
+from page_archive import archive
+from driver_manager import is_session_dead_error
+from instrumentation import get_logger, tracer
+from migrations import canonical_event_id, iso_event_day, iso_event_start, migrate
+from network_capture import parse_event_payload
+from waits import AdaptiveTimeout, resolve_timeout, wait_for_count_above, wait_stats
+
+# Base URL
+url = "https://www.viagogo.com/United-States"
+
+# XPath for state links
+state_xpath = '//*[@id="app"]/div[4]/div[2]/div[1]/div/ul//li//a'
+# XPath for city links on the state page
+city_xpath = '//*[@id="app"]/div[4]/div[2]//ul//li//a'
+event_container_xpath = '//*[@id="explore_tabpanel-0"]/div/div[2]/ul/li'
+load_more_xpath = '//*[@id="explore_tabpanel-0"]/div/div[2]/div/div/button'
+
+database_path = 'events.db'
+
+insert_event_sql = '''INSERT OR IGNORE INTO events (event_link, event_title, event_date, event_time, event_location, state, city,
+                                             event_id, event_day, event_start)
+                      VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)'''
+
+# Waits tune themselves from observed latencies, within these bounds
+city_page_timeout = AdaptiveTimeout("city page", initial=10, minimum=2, maximum=30)
+load_more_timeout = AdaptiveTimeout("load more", initial=5, minimum=1, maximum=15)
+
+# Upper bound for --workers; each worker is a full Chrome instance
+MAX_WORKERS = os.cpu_count() or 4
+
+# Chrome options for every browser this script starts (see browser.py); set from --browser-profile
+browser_profile = browser.profiles['performance']
+
+logger = get_logger('main')
+
 def remove_event_elements(driver):
     script = """
         const eventList = document.querySelectorAll('#explore_tabpanel-0 div ul li');
@@ -29,166 +73,469 @@ def update_query_param(url, key, value):
     updated_url_parts = url_parts._replace(query=updated_query)
     return urlunparse(updated_url_parts)
 
-# Set up Selenium WebDriver with Chrome
-chrome_options = Options()
-# chrome_options.add_argument("--headless")  # Run in headless mode
-chrome_options.add_argument("--no-sandbox")
-chrome_options.add_argument("--disable-dev-shm-usage")
-chrome_options.add_argument("--lang=en")
-
-service = Service()  # Update with the path to your ChromeDriver
-
-driver = webdriver.Chrome(service=service, options=chrome_options)
-
-# Database setup
-conn = sqlite3.connect('events.db')
-cursor = conn.cursor()
-cursor.execute('''CREATE TABLE IF NOT EXISTS events (
-    event_link TEXT PRIMARY KEY,
-    event_title TEXT,
-    event_date TEXT,
-    event_time TEXT,
-    event_location TEXT,
-    state TEXT,
-    city TEXT
-)''')
-
-cursor.execute('''CREATE TABLE IF NOT EXISTS tickets (
-    ticket_name TEXT,
-    ticket_price REAL,
-    event_link TEXT,
-    FOREIGN KEY (event_link) REFERENCES events (event_link)
-)''')
-
-cursor.execute('''CREATE TABLE IF NOT EXISTS scraped_cities (
-    city TEXT PRIMARY KEY,
-    state TEXT
-)''')
+# Reads every event card under the explore tab in a single WebDriver call.
+# The relative XPaths are the ones the per-element lookups used, so the
+# fields match what find_element(By.XPATH, ...) returned card by card.
+extract_event_cards_script = """
+    const containerXPath = arguments[0];
+    const remove = arguments[1];
+    const first = (node, xpath) => document.evaluate(
+        xpath, node, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+    const text = (node, xpath) => {
+        const el = first(node, xpath);
+        return el ? el.innerText : null;
+    };
+    const snapshot = document.evaluate(
+        containerXPath, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+    const cards = [];
+    for (let i = 0; i < snapshot.snapshotLength; i++) {
+        const li = snapshot.snapshotItem(i);
+        const a = first(li, './/a');
+        cards.push({
+            link: a ? a.href : null,
+            title: text(li, './/a//p[1]'),
+            date_time: text(li, './/a//p[2]'),
+            location: text(li, './/a//p[1]')
+        });
+    }
+    if (remove) {
+        document.querySelectorAll('#explore_tabpanel-0 div ul li').forEach(event => event.remove());
+    }
+    return JSON.stringify(cards);
+"""
+
+def extract_event_cards(driver, remove=False):
+    """
+    Return the raw event cards currently on the page as a list of dicts
+    (link, title, date_time, location) using one execute_script call.
+    With remove=True the cards are also dropped from the DOM in the same call.
+    """
+    return json.loads(driver.execute_script(extract_event_cards_script, event_container_xpath, remove))
 
-# Base URL
-url = "https://www.viagogo.com/United-States"
+def parse_event_cards(cards):
+    """
+    Turn raw event cards into (event_link, event_title, event_date, event_time, event_location) rows.
+    Cards without a link, title or date are skipped, as the per-element lookups did.
+    """
+    rows = []
+    for card in cards:
+        if not card.get('link') or card.get('title') is None or card.get('date_time') is None:
+            logger.warning("Error processing event: incomplete event card %s", card)
+            continue
+        event_link = update_query_param(card['link'], "quantity", "1")
+        event_date_time = card['date_time']
+        event_date, event_time = event_date_time.split(' • ', 1) if ' • ' in event_date_time else (event_date_time, '')
+        rows.append((event_link, card['title'], event_date, event_time, card['location'] or ''))
+    return rows
+
+def create_driver(network_capture=False):
+    # Set up Selenium WebDriver with Chrome, using this script's browser profile
+    return browser.create_driver(browser_profile, network_capture)
+
+def event_record(event_link, event_title, event_date, event_time, event_location, state, city):
+    """Parameters for insert_event_sql, with the canonical id and ISO dates derived from the display strings."""
+    return (event_link, event_title, event_date, event_time, event_location, state, city,
+            canonical_event_id(event_link), iso_event_day(event_date), iso_event_start(event_date, event_time))
+
+def connect_database(path=database_path):
+    # Event rows go through the shared DatabaseWriter; this connection is for setup
+    conn = sqlite3.connect(path, timeout=30)
+    return configure_connection(conn)
+
+def setup_database(conn):
+    cursor = conn.cursor()
+    cursor.execute('''CREATE TABLE IF NOT EXISTS events (
+        event_link TEXT PRIMARY KEY,
+        event_title TEXT,
+        event_date TEXT,
+        event_time TEXT,
+        event_location TEXT,
+        state TEXT,
+        city TEXT,
+        event_id TEXT,  -- Canonical id shared by every quantity variant of the link
+        event_day TEXT,  -- event_date as YYYY-MM-DD
+        event_start TEXT  -- YYYY-MM-DDTHH:MM, or the day alone if the time is unknown
+    )''')
+
+    cursor.execute('''CREATE TABLE IF NOT EXISTS tickets (
+        ticket_name TEXT,
+        ticket_price REAL,
+        event_link TEXT,
+        FOREIGN KEY (event_link) REFERENCES events (event_link)
+    )''')
+    conn.commit()
 
-# Navigate to the URL
-driver.get(url)
+    # Older databases (city-only keys, no status column, no indexes) are upgraded in place
+    migrate(conn)
 
-# XPath for state links
-state_xpath = '//*[@id="app"]/div[4]/div[2]/div[1]/div/ul//li//a'
+def collect_state_hrefs(driver, start_url=url):
+    # Navigate to the URL
+    driver.get(start_url)
 
-# Extract state links
-# Extract state links
-state_links = driver.find_elements(By.XPATH, state_xpath)
-state_hrefs = []  # Collect all state links first
-for state_link in state_links:
-    state_href = state_link.get_attribute('href')
-    if state_href and state_href != "https://www.viagogo.com/":
-        state_hrefs.append(state_href)
-        print("State Link:", state_href)
-
-# Visit each state link to collect city links
-for state_href in state_hrefs:
+    # Extract state links
+    state_links = driver.find_elements(By.XPATH, state_xpath)
+    state_hrefs = []  # Collect all state links first
+    for state_link in state_links:
+        state_href = state_link.get_attribute('href')
+        if state_href and state_href != "https://www.viagogo.com/":
+            state_hrefs.append(state_href)
+            logger.debug("State Link: %s", state_href)
+    return state_hrefs
+
+def collect_city_hrefs(driver, state_href):
     driver.get(state_href)
 
-    # Extract state from state_href (assumes URL structure includes state)
-    state = state_href.split('/')[3]
+    # Read every href up front so the list does not go stale once we navigate away
+    city_hrefs = []
+    for city_link in driver.find_elements(By.XPATH, city_xpath):
+        city_href = city_link.get_attribute('href')
+        if city_href:
+            city_hrefs.append(city_href)
+    return city_hrefs
 
-    # XPath for city links on the state page
-    city_xpath = '//*[@id="app"]/div[4]/div[2]//ul//li//a'
-    city_links = driver.find_elements(By.XPATH, city_xpath)
+def scrape_city(driver, writer, state, city, city_href, capture=None, cutoff=None, on_event=None):
+    """
+    Walk a city's event feed, clicking "Load More" until no new events are loaded.
+    Events are queued on the DatabaseWriter. Returns the number of events seen.
+    With a NetworkCapture the events are read from the feed's JSON responses.
+    With a CityCutoff (delta crawls) the feed also stops after a run of known events.
+    on_event(event_link) is called for every event as it is read (pipeline.py).
+    """
+    if cutoff is not None:
+        cutoff.reset()
+    if capture is not None:
+        return scrape_city_network(driver, capture, writer, state, city, city_href, cutoff, on_event)
 
-    # Start processing each city
-    for i in range(len(city_links)):
-        try:
-            # Re-fetch city links and get the current city
-            city_links = driver.find_elements(By.XPATH, city_xpath)
-            city_link = city_links[i]
-            city_href = city_link.get_attribute('href')
-            if not city_href:
-                continue
-
-            # Extract city name from the URL
-            city = city_href.split('/')[-1]
-
-            # Skip cities that are already scraped
-            cursor.execute('SELECT 1 FROM scraped_cities WHERE city = ? AND state = ?', (city, state))
-            if cursor.fetchone():
-                print(f"City {city} in state {state} already scraped. Skipping.")
-                continue
-
-            print("Processing City:", city_href)
-
-            # Navigate to the city page
-            driver.get(city_href)
-
-            # Keep clicking "Load More" and process events until no new events are loaded
-            while True:
-                # Extract event details
-                event_container_xpath = '//*[@id="explore_tabpanel-0"]/div/div[2]/ul/li'
-                try:
-                    event_containers = driver.find_elements(By.XPATH, event_container_xpath)
-                    if not event_containers:
-                        print("No more events to process.")
-                        break
-
-                    for event in event_containers:
-                        try:
-                            # Extract event details
-                            event_link = event.find_element(By.XPATH, './/a').get_attribute('href')
-                            event_link = update_query_param(event_link, "quantity", "1")
-
-                            event_title = event.find_element(By.XPATH, './/a//p[1]').text
-                            event_date_time = event.find_element(By.XPATH, './/a//p[2]').text
-                            event_location = event.find_element(By.XPATH, './/a//p[1]').text
-                            event_date, event_time = event_date_time.split(' • ') if ' • ' in event_date_time else (event_date_time, '')
-
-                            print("Event Link:", event_link)
-                            print("Event Title:", event_title)
-
-                            # Save event to the database
-                            try:
-                                cursor.execute('''INSERT INTO events (event_link, event_title, event_date, event_time, event_location, state, city)
-                                                VALUES (?, ?, ?, ?, ?, ?, ?)''',
-                                            (event_link, event_title, event_date, event_time, event_location, state, city))
-                                conn.commit()
-                            except sqlite3.IntegrityError:
-                                print("Duplicate event, skipping:", event_link)
-
-                        except Exception as e:
-                            print("Error processing event:", e)
-
-                    # Remove processed event elements using JavaScript
-                    remove_event_elements(driver)
-
-                    # Click "Load More" button
-                    load_more_xpath = '//*[@id="explore_tabpanel-0"]/div/div[2]/div/div/button'
-                    load_more_button = WebDriverWait(driver, 5).until(
-                        EC.element_to_be_clickable((By.XPATH, load_more_xpath))
-                    )
-                    load_more_button.click()
-                    time.sleep(5)
+    events_seen = 0
 
-                except Exception as e:
-                    print("No more events or button not clickable:", e)
-                    break
+    # Navigate to the city page and wait for the first event cards to render
+    with tracer.span('page_load'):
+        driver.get(city_href)
+    wait_for_count_above(driver, event_container_xpath, 0, city_page_timeout, label="city page")
 
-            # Mark city as scraped
-            cursor.execute('INSERT INTO scraped_cities (city, state) VALUES (?, ?)', (city, state))
-            conn.commit()
+    # Keep clicking "Load More" and process events until no new events are loaded
+    while True:
+        # Extract event details
+        try:
+            # With --archive, the cards are saved before they go
+            archive.save_page(driver, 'city', city_href, {'state': state, 'city': city})
+            # One round-trip reads every card and removes it from the DOM
+            with tracer.span('extract'):
+                cards = extract_event_cards(driver, remove=True)
+            if not cards:
+                logger.debug("No more events to process.")
+                break
+
+            rows = parse_event_cards(cards)
+            for event_link, event_title, event_date, event_time, event_location in rows:
+                logger.debug("Event: %s (%s)", event_link, event_title)
+                events_seen += 1
+
+                # Save event to the database; duplicates are ignored by the primary key
+                writer.write(insert_event_sql, event_record(event_link, event_title, event_date, event_time, event_location, state, city))
+                if on_event is not None:
+                    on_event(event_link)
+
+            if cutoff is not None and cutoff.observe_batch([row[0] for row in rows]):
+                logger.debug("%d known events in a row, skipping the rest of the feed.", cutoff.known_run)
+                break
+
+            # Click "Load More" button
+            load_more_button = WebDriverWait(driver, 5).until(
+                EC.element_to_be_clickable((By.XPATH, load_more_xpath))
+            )
+            load_more_button.click()
+
+            # The processed cards were removed, so any card on the page is a new one
+            if wait_for_count_above(driver, event_container_xpath, 0, load_more_timeout, label="load more") is None:
+                logger.debug("Load More did not return new events in time.")
 
         except Exception as e:
-            print("Error processing city:", e)
-
-# Check if all cities have been scraped
-cursor.execute('SELECT COUNT(*) FROM scraped_cities')
-scraped_city_count = cursor.fetchone()[0]
+            # A crashed browser is not the end of the feed; the driver manager replaces it
+            if is_session_dead_error(e):
+                raise
+            logger.debug("No more events or button not clickable: %s", e)
+            break
 
-if scraped_city_count > 0:
-    print(f"All cities have been scraped. Clearing the scraped_cities table.")
-    cursor.execute('DELETE FROM scraped_cities')
-    conn.commit()
-
-driver.quit()
-conn.close()
+    return events_seen
 
+def scrape_city_network(driver, capture, writer, state, city, city_href, cutoff=None, on_event=None):
+    """
+    Network engine for scrape_city: parse each Load More batch from the JSON
+    responses captured after the click. A batch that arrived without any JSON
+    (the first page may be rendered server-side) is read from the DOM instead.
+    """
+    events_seen = 0
+    capture.reset()
+    with tracer.span('page_load'):
+        driver.get(city_href)
+
+    while True:
+        with tracer.span('wait', label="load more responses"):
+            responses = capture.wait_for_responses(timeout=resolve_timeout(load_more_timeout))
+        archive.save_responses('city_json', responses, {'state': state, 'city': city})
+        with tracer.span('extract'):
+            rows = []
+            for response_url, payload in responses:
+                rows.extend(parse_event_payload(payload, response_url))
+            if rows:
+                rows = [(update_query_param(link, "quantity", "1"), title, date, event_time, location)
+                        for link, title, date, event_time, location in rows]
+                # The cards were rendered anyway; drop them so the DOM stays small
+                remove_event_elements(driver)
+            else:
+                archive.save_page(driver, 'city', city_href, {'state': state, 'city': city})
+                rows = parse_event_cards(extract_event_cards(driver, remove=True))
+        if not rows:
+            logger.debug("No more events to process.")
+            break
+
+        for event_link, event_title, event_date, event_time, event_location in rows:
+            logger.debug("Event: %s (%s)", event_link, event_title)
+            events_seen += 1
+            writer.write(insert_event_sql, event_record(event_link, event_title, event_date, event_time, event_location, state, city))
+            if on_event is not None:
+                on_event(event_link)
+
+        if cutoff is not None and cutoff.observe_batch([row[0] for row in rows]):
+            logger.debug("%d known events in a row, skipping the rest of the feed.", cutoff.known_run)
+            break
 
-driver.quit()
-conn.close()
+        try:
+            load_more_button = WebDriverWait(driver, 5).until(
+                EC.element_to_be_clickable((By.XPATH, load_more_xpath))
+            )
+            load_more_button.click()
+        except Exception as e:
+            # A crashed browser is not the end of the feed; the driver manager replaces it
+            if is_session_dead_error(e):
+                raise
+            logger.debug("No more events or button not clickable: %s", e)
+            break
+
+    return events_seen
+
+class WorkerStats:
+    """Per-worker throughput counters, reported as cities/minute."""
+
+    def __init__(self, worker_id):
+        self.worker_id = worker_id
+        self.cities = 0
+        self.events = 0
+        self.errors = 0
+        # Delta crawls: cities whose feed was cut short, and the Load More clicks that saved
+        self.cut_short = 0
+        self.skipped_expansions = 0
+        self.started = time.time()
+
+    def cities_per_minute(self):
+        elapsed = time.time() - self.started
+        return self.cities / (elapsed / 60) if elapsed > 0 else 0.0
+
+    def __str__(self):
+        return (f"[worker {self.worker_id}] {self.cities} cities, {self.events} events, "
+                f"{self.errors} errors, {self.cities_per_minute():.2f} cities/min")
+
+def seed_states(driver, work, start_url=url):
+    """Queue a work item for every state on the start page. Returns how many were new to this generation."""
+    items = []
+    for state_href in collect_state_hrefs(driver, start_url):
+        # Extract state from state_href (assumes URL structure includes state)
+        items.append((state_href, {'state': state_href.split('/')[3], 'href': state_href}))
+    return work.enqueue_many('state', items)
+
+def queue_state_cities(driver, work, state, state_href):
+    """Queue a work item for every city of a state. Returns how many were new to this generation."""
+    items = []
+    for city_href in collect_city_hrefs(driver, state_href):
+        # Extract city name from the URL
+        items.append((city_href, {'state': state, 'city': city_href.split('/')[-1], 'href': city_href}))
+    return work.enqueue_many('city', items)
+
+def city_worker(worker_id, work, stats, writer, pool, managed=None, known=None, on_event=None):
+    """
+    Lease state and city work items until the crawl generation is drained.
+    A state item queues its cities; a city item scrapes its events. Cities
+    go first, so states are only expanded while there is no city to do.
+    Leases are renewed while an item is worked on, and an item whose worker
+    dies is taken over by another worker (on this node or another) once its
+    lease expires. Each item runs on a browser from the DriverPool, which is
+    replaced (and the item retried) if it dies. With KnownEvents, each city's
+    feed stops after a run of events already in the database.
+    """
+    own_driver = managed is None
+    if own_driver:
+        managed = pool.acquire()
+    owner = work_queue.node_owner(worker_id)
+    try:
+        while True:
+            item = work.next_item(owner, ('city', 'state'))
+            if item is None:
+                break
+            state = item.payload['state']
+            with work.keep_alive(item):
+                try:
+                    if item.kind == 'state':
+                        added = managed.run(lambda driver, capture: queue_state_cities(driver, work, state, item.payload['href']))
+                        logger.info("Queued %d cities for state %s", added, state)
+                    else:
+                        city, city_href = item.payload['city'], item.payload['href']
+                        logger.info("[worker %d] Processing City: %s", worker_id, city_href)
+                        cutoff = known.for_city(state, city) if known is not None else None
+                        with tracer.tagged(state=state, city=city):
+                            stats.events += managed.run(
+                                lambda driver, capture: scrape_city(driver, writer, state, city, city_href, capture, cutoff, on_event))
+                        if cutoff is not None and cutoff.stopped:
+                            stats.cut_short += 1
+                            stats.skipped_expansions += cutoff.skipped_expansions()
+                        # Complete the city only once its events are on disk
+                        writer.flush()
+                        stats.cities += 1
+                        logger.info("%s", stats)
+                    if not work.complete(item):
+                        logger.info("%s was completed by another worker first.", item)
+                except Exception as e:
+                    logger.error("Error processing %s: %s", item, e)
+                    stats.errors += 1
+                    work.release(item, failed=True)
+    finally:
+        if own_driver:
+            managed.release()
+
+def run(workers=1, engine='dom', start_url=url, path=database_path, pool=None, work=None, delta_cutoff=0,
+        writer=None, on_event=None):
+    """
+    Crawl every state and city reachable from start_url into the database at path.
+    Browsers come from pool (a DriverPool with default settings if None) and
+    work items from work (a WorkQueue; by default a SQLite queue in the same
+    database). Several processes or machines can run this against the same
+    queue; they share the open crawl generation.
+    With delta_cutoff > 0, a city's feed stops after that many events in a
+    row that are already in the database.
+    A DatabaseWriter shared with other stages can be passed as writer (it is
+    flushed, not closed), and on_event(event_link) is called for every event
+    read from a feed.
+    Returns a summary dict (generation, cities, events, errors, delta cutoff
+    counts, elapsed seconds and the DB writer's counters).
+    """
+    conn = connect_database(path)
+    setup_database(conn)
+    known = None
+    if delta_cutoff:
+        known = KnownEvents.load(conn, delta_cutoff)
+        logger.info("Delta crawl: %d known events in %d cities, cutoff after %d in a row.",
+                    len(known), len(known.links_by_city), delta_cutoff)
+    conn.close()
+
+    if work is None:
+        work = work_queue.open_queue(None, path, 'crawl')
+    generation = work.begin_generation()
+    logger.info("Joined crawl generation %d: %s", generation, work.counts())
+
+    wait_stats.reset()
+    tracer.reset()
+    all_stats = [WorkerStats(worker_id) for worker_id in range(1, workers + 1)]
+    started = time.time()
+
+    own_writer = writer is None
+    if own_writer:
+        writer = DatabaseWriter(path)
+    if pool is None:
+        pool = driver_manager.DriverPool(create_driver, network_capture=engine == 'network')
+    seeder = pool.acquire()
+    try:
+        # Every node reads the state list; states already in the generation are ignored
+        seeded = seeder.run(lambda driver, capture: seed_states(driver, work, start_url))
+        logger.info("Queued %d new state(s).", seeded)
+
+        threads = []
+        for stats in all_stats[1:]:
+            thread = threading.Thread(target=city_worker, args=(stats.worker_id, work, stats, writer, pool, None, known, on_event),
+                                      name=f"city-worker-{stats.worker_id}", daemon=True)
+            thread.start()
+            threads.append(thread)
+        # The seeding browser becomes the first worker
+        city_worker(1, work, all_stats[0], writer, pool, managed=seeder, known=known, on_event=on_event)
+        for thread in threads:
+            thread.join()
+    finally:
+        # Flush queued events before the browsers go away
+        try:
+            if own_writer:
+                writer.close()
+            else:
+                writer.flush()
+        finally:
+            seeder.release()
+            pool.close()
+
+    elapsed = time.time() - started
+    total_cities = sum(stats.cities for stats in all_stats)
+    logger.info("Crawl finished in %.1f min with %d worker(s):", elapsed / 60, workers)
+    for stats in all_stats:
+        logger.info("%s", stats)
+    if elapsed > 0:
+        logger.info("Total: %d cities, %.2f cities/min", total_cities, total_cities / (elapsed / 60))
+    cut_short = sum(stats.cut_short for stats in all_stats)
+    skipped_expansions = sum(stats.skipped_expansions for stats in all_stats)
+    if known is not None:
+        logger.info("Delta cutoff: %d of %d cities cut short, about %d Load More clicks skipped",
+                    cut_short, total_cities, skipped_expansions)
+    wait_stats.report(workers)
+    tracer.log_summary()
+
+    # The generation stays on record; the next run starts a new one
+    counts = work.counts()
+    if work.finish_generation():
+        logger.info("Crawl generation %d finished: %d items done, %d failed.", generation, counts['done'], counts['failed'])
+    else:
+        logger.info("Crawl generation %d still has %d open item(s) on other nodes.", generation, counts['open'])
+
+    return {
+        'generation': generation,
+        'cities': total_cities,
+        'events': sum(stats.events for stats in all_stats),
+        'errors': sum(stats.errors for stats in all_stats),
+        'cut_short': cut_short,
+        'skipped_expansions': skipped_expansions,
+        'elapsed': elapsed,
+        'rows_written': writer.rows_written,
+        'batches': writer.batches,
+        'write_seconds': writer.write_seconds,
+    }
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Crawl Viagogo events for every US state and city.")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Number of parallel Chrome workers (default: 1)")
+    parser.add_argument('--max-workers', type=int, default=MAX_WORKERS,
+                        help=f"Upper bound on --workers (default: {MAX_WORKERS})")
+    parser.add_argument('--engine', choices=['dom', 'network'], default='dom',
+                        help="Read events from the rendered page (dom) or from the feed's JSON responses (network)")
+    parser.add_argument('--delta', type=int, nargs='?', const=default_cutoff, default=0, metavar='N',
+                        help=f"Re-crawl: stop a city's Load More after N events in a row that are already stored "
+                             f"(default N: {default_cutoff})")
+    browser.add_arguments(parser)
+    driver_manager.add_arguments(parser)
+    pacing.add_arguments(parser)
+    work_queue.add_arguments(parser)
+    instrumentation.add_arguments(parser)
+    page_archive.add_arguments(parser)
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    instrumentation.configure(args)
+    page_archive.configure(args)
+    browser_profile = browser.profile_from_args(args)
+    workers = max(1, min(args.workers, args.max_workers))
+    if workers != args.workers:
+        logger.info("Limiting workers from %d to %d.", args.workers, workers)
+    pacer = pacing.pacer_from_args(args, max_concurrency=workers)
+    pool = driver_manager.pool_from_args(args, create_driver, network_capture=args.engine == 'network', pacer=pacer)
+    work = work_queue.queue_from_args(args, database_path, 'crawl')
+    try:
+        run(workers, args.engine, pool=pool, work=work, delta_cutoff=args.delta)
+    finally:
+        archive.close()
+        tracer.close()
@@ -0,0 +1,223 @@
+"""
+Schema upgrades for events.db.
+
+main.py and tickets.py create their tables with CREATE TABLE IF NOT EXISTS
+and then call migrate(), which brings any database, however old, up to the
+current schema in place. The number of steps a database has been through is
+kept in PRAGMA user_version, and only the steps past it run:
+
+  1. events gets a canonical event_id (the E-<number> id from the link), an
+     ISO event_day (YYYY-MM-DD) and event_start (YYYY-MM-DDTHH:MM), filled in
+     for existing rows.
+  2. tickets gets the same event_id, so tickets join to events without
+     rewriting the quantity in tickets.event_link.
+  3. scraped_cities is keyed on (state, city) instead of city alone. Only
+     databases from before the work queue have that table; main.py no
+     longer reads it, but the step keeps its place in the numbering.
+  4. Indexes for the common queries: events by (state, city, event_day), by
+     event_day and by event_id; tickets by event_id, event_link, scraped_at
+     and stored_at; the price history by event and time, and by listing and
+     time.
+  5. Days without a year that were placed in the past although the weekday
+     shown says otherwise (the parser used to pick the closest year) are
+     worked out again.
+  6. tickets gets stored_at, the time each row was written, which the
+     dataset export uses as its watermark; existing rows take their scraped_at.
+
+New steps go at the end. Every step checks before it changes anything, so
+running one again is harmless. The indexes are checked on every start
+whatever the version, since tickets.py drops and recreates its table and
+tables created after a migration start without them.
+
+    python migrations.py events.db
+"""
+import argparse
+import datetime
+import re
+import sqlite3
+import time
+from urllib.parse import urlparse, urlunparse
+
+from event_dates import parse_event_date, parse_event_time
+from instrumentation import configure_logging, get_logger
+
+logger = get_logger('migrations')
+
+# ".../Concert-Tickets/Event-1/E-150000001?quantity=2" -> "150000001"
+event_id_pattern = re.compile(r'/E-(\d+)(?:[/?#]|$)')
+
+# (name, table, columns)
+indexes = [
+    ('idx_events_state_city_day', 'events', ('state', 'city', 'event_day')),
+    ('idx_events_event_day', 'events', ('event_day',)),
+    ('idx_events_event_id', 'events', ('event_id',)),
+    ('idx_tickets_event_id', 'tickets', ('event_id', 'quantity')),
+    ('idx_tickets_event_link', 'tickets', ('event_link',)),
+    ('idx_tickets_scraped_at', 'tickets', ('scraped_at',)),
+    ('idx_tickets_stored_at', 'tickets', ('stored_at',)),
+    ('idx_listings_event_id', 'listings', ('event_id', 'active')),
+    ('idx_price_history_event_id', 'price_history', ('event_id', 'observed_at')),
+    ('idx_price_history_listing_key', 'price_history', ('listing_key', 'observed_at')),
+]
+
+def canonical_event_id(event_link):
+    """
+    Stable id for an event, the same for every quantity and tracking variant
+    of its link: the numeric E- id, or the link without query string.
+    """
+    if not event_link:
+        return None
+    match = event_id_pattern.search(event_link)
+    if match:
+        return match.group(1)
+    parsed = urlparse(event_link)
+    return urlunparse((parsed.scheme, parsed.netloc.lower(), parsed.path.rstrip('/'), '', '', ''))
+
+def iso_event_day(event_date, today=None):
+    """ISO date (YYYY-MM-DD) of a display date like "Sat, Mar 15", or None."""
+    parsed = parse_event_date(event_date, today)
+    return parsed.isoformat() if parsed else None
+
+def iso_event_start(event_date, event_time, today=None):
+    """ISO date and time (YYYY-MM-DDTHH:MM) of the event, or just the date if the time is unknown."""
+    parsed_date = parse_event_date(event_date, today)
+    if parsed_date is None:
+        return None
+    parsed_time = parse_event_time(event_time)
+    if parsed_time is None:
+        return parsed_date.isoformat()
+    return datetime.datetime.combine(parsed_date, parsed_time).isoformat(timespec='minutes')
+
+def table_columns(conn, table):
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+def add_missing_columns(conn, table, columns):
+    existing = table_columns(conn, table)
+    added = [name for name, _ in columns if name not in existing]
+    for name, column_type in columns:
+        if name in added:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {column_type}")
+    return added
+
+def migrate_event_keys(conn):
+    """Add and backfill events.event_id, event_day and event_start."""
+    if not table_columns(conn, 'events'):
+        return 0
+    add_missing_columns(conn, 'events', [('event_id', 'TEXT'), ('event_day', 'TEXT'), ('event_start', 'TEXT')])
+    cursor = conn.execute('''UPDATE events SET event_id = canonical_event_id(event_link),
+                                               event_day = iso_event_day(event_date),
+                                               event_start = iso_event_start(event_date, event_time)
+                             WHERE event_id IS NULL''')
+    return cursor.rowcount
+
+def redate_events(conn):
+    """Recompute event_day and event_start where the weekday in event_date contradicts event_day."""
+    if 'event_day' not in table_columns(conn, 'events'):
+        return 0
+    # strftime('%w') counts from Sunday; dates that carry their year are left as shown
+    cursor = conn.execute('''UPDATE events SET event_day = iso_event_day(event_date),
+                                               event_start = iso_event_start(event_date, event_time)
+                             WHERE event_day IS NOT NULL
+                               AND instr('SunMonTueWedThuFriSat', substr(event_date, 1, 3)) % 3 = 1
+                               AND event_date NOT GLOB '*[0-9][0-9][0-9][0-9]*'
+                               AND instr('SunMonTueWedThuFriSat', substr(event_date, 1, 3))
+                                   != strftime('%w', event_day) * 3 + 1''')
+    return cursor.rowcount
+
+def migrate_ticket_keys(conn):
+    """Add and backfill tickets.event_id."""
+    if not table_columns(conn, 'tickets'):
+        return 0
+    add_missing_columns(conn, 'tickets', [('event_id', 'TEXT')])
+    cursor = conn.execute('UPDATE tickets SET event_id = canonical_event_id(event_link) WHERE event_id IS NULL')
+    return cursor.rowcount
+
+def migrate_ticket_store_times(conn):
+    """Add tickets.stored_at; rows written before it existed are dated by scraped_at."""
+    columns = table_columns(conn, 'tickets')
+    if 'scraped_at' not in columns:
+        return 0
+    add_missing_columns(conn, 'tickets', [('stored_at', 'REAL')])
+    cursor = conn.execute('UPDATE tickets SET stored_at = scraped_at WHERE stored_at IS NULL AND scraped_at IS NOT NULL')
+    return cursor.rowcount
+
+def migrate_city_keys(conn):
+    """Rebuild scraped_cities with a (state, city) primary key if it is still keyed on city."""
+    info = list(conn.execute("PRAGMA table_info(scraped_cities)"))
+    if not info:
+        return 0
+    primary_key = [row[1] for row in sorted(info, key=lambda row: row[5]) if row[5]]
+    if primary_key == ['state', 'city']:
+        return 0
+    status = "status" if any(row[1] == 'status' for row in info) else "'done'"
+    conn.execute('''CREATE TABLE scraped_cities_new (
+        city TEXT,
+        state TEXT,
+        status TEXT DEFAULT 'done',
+        PRIMARY KEY (state, city)
+    )''')
+    cursor = conn.execute(f"INSERT OR IGNORE INTO scraped_cities_new (city, state, status) SELECT city, state, {status} FROM scraped_cities")
+    conn.execute("DROP TABLE scraped_cities")
+    conn.execute("ALTER TABLE scraped_cities_new RENAME TO scraped_cities")
+    return cursor.rowcount
+
+def create_indexes(conn):
+    existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    created = 0
+    for name, table, columns in indexes:
+        # Skip tables this database does not have (yet)
+        if name in existing or not set(columns) <= set(table_columns(conn, table)):
+            continue
+        conn.execute(f"CREATE INDEX {name} ON {table} ({', '.join(columns)})")
+        created += 1
+    return created
+
+migrations = [
+    ("event keys and ISO dates", migrate_event_keys),
+    ("ticket event keys", migrate_ticket_keys),
+    ("composite city keys", migrate_city_keys),
+    ("indexes", create_indexes),
+    ("event days from weekdays", redate_events),
+    ("ticket store times", migrate_ticket_store_times),
+]
+
+def migrate(conn, verbose=False):
+    """
+    Bring the database up to the current schema: run the steps past its
+    user_version, each in its own transaction, then put back any missing
+    index. Returns {step description: rows changed or indexes created} for
+    the steps that ran.
+    """
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    today = datetime.date.today()
+    conn.create_function('canonical_event_id', 1, canonical_event_id, deterministic=True)
+    conn.create_function('iso_event_day', 1, lambda value: iso_event_day(value, today))
+    conn.create_function('iso_event_start', 2, lambda date, time_text: iso_event_start(date, time_text, today))
+
+    changes = {}
+    for number, (description, step) in enumerate(migrations, start=1):
+        if number <= version:
+            continue
+        started = time.time()
+        with conn:
+            changes[description] = step(conn)
+            conn.execute(f"PRAGMA user_version = {number}")
+        if verbose:
+            logger.info("Migration '%s': %d change(s) in %.2fs.", description, changes[description], time.time() - started)
+    with conn:
+        created = create_indexes(conn)
+    if created:
+        changes['indexes'] = changes.get('indexes', 0) + created
+    return changes
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Upgrade an events.db file to the current schema in place.")
+    parser.add_argument('database', nargs='?', default='events.db')
+    args = parser.parse_args()
+    configure_logging()
+
+    conn = sqlite3.connect(args.database)
+    print(f"Schema version before: {conn.execute('PRAGMA user_version').fetchone()[0]}")
+    migrate(conn, verbose=True)
+    print(f"Schema version after: {conn.execute('PRAGMA user_version').fetchone()[0]}")
+    conn.close()
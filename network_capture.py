@@ -0,0 +1,235 @@
+"""
+Scrape from the JSON responses behind the pages instead of the rendered DOM.
+
+The Load More event feed and the #listings-container grid are both filled
+from JSON XHR responses. NetworkCapture reads those responses from Chrome's
+performance log (CDP Network events) and fetches their bodies with
+Network.getResponseBody, so events and listings can be parsed from
+structured data. No XPaths are needed, and the listing dialog never has to
+be opened for zone/VIP.
+
+The payload schema is not fixed, so the parsers walk each JSON document for
+objects that carry the expected fields, using the candidate key names below.
+"""
+import json
+import re
+import time
+from urllib.parse import urljoin
+
+from instrumentation import get_logger
+
+logger = get_logger('network_capture')
+
+# Candidate keys, first match wins
+event_link_keys = ('url', 'eventUrl', 'webURI', 'link', 'href')
+event_title_keys = ('name', 'eventName', 'title')
+event_date_keys = ('formattedDateWithoutYear', 'formattedDate', 'dateDisplay', 'date')
+event_time_keys = ('formattedTime', 'timeDisplay', 'time')
+event_datetime_keys = ('eventDateLocal', 'startDateLocal', 'eventDate', 'startDate', 'dateTime')
+event_venue_keys = ('venueName', 'venue', 'location', 'formattedVenueLocation')
+
+listing_section_keys = ('sectionName', 'section', 'sectionDisplay')
+listing_row_keys = ('row', 'rowName', 'rowDisplay')
+listing_tickets_keys = ('availableTickets', 'availableQuantity', 'quantity', 'ticketCount')
+listing_price_keys = ('formattedPrice', 'price', 'rawPrice', 'priceWithFees', 'amount')
+listing_zone_keys = ('ticketClassName', 'zoneName', 'zone', 'ticketClass')
+listing_vip_keys = ('isVip', 'vip', 'isVIP')
+listing_sold_keys = ('isSold', 'soldOut', 'sold')
+listing_notes_keys = ('listingNotes', 'features', 'notes', 'ticketFeatures')
+listing_id_keys = ('listingId', 'id')
+
+def first_value(record, keys):
+    for key in keys:
+        if key in record and record[key] not in (None, ''):
+            return record[key]
+    return None
+
+def walk_records(node):
+    """Yield every dict found inside a list anywhere in a JSON document."""
+    if isinstance(node, dict):
+        for value in node.values():
+            yield from walk_records(value)
+    elif isinstance(node, list):
+        for item in node:
+            if isinstance(item, dict):
+                yield item
+            yield from walk_records(item)
+
+def looks_like_event(record):
+    return first_value(record, event_link_keys) is not None and first_value(record, event_title_keys) is not None \
+        and (first_value(record, event_date_keys) is not None or first_value(record, event_datetime_keys) is not None)
+
+def looks_like_listing(record):
+    return first_value(record, listing_price_keys) is not None and first_value(record, listing_section_keys) is not None
+
+def format_price(value):
+    if isinstance(value, dict):
+        formatted = value.get('formatted') or value.get('display')
+        if formatted:
+            return str(formatted)
+        value = value.get('amount', value.get('value'))
+    if isinstance(value, (int, float)):
+        return f"${value:,.2f}".replace('.00', '')
+    return str(value).strip() if value is not None else None
+
+def format_event_datetime(value):
+    """Split an ISO timestamp into the feed's display date and time ("Sat, Mar 15", "7:00 PM")."""
+    match = re.match(r'(\d{4})-(\d{2})-(\d{2})(?:[T ](\d{2}):(\d{2}))?', str(value))
+    if not match:
+        return str(value), ''
+    year, month, day, hour, minute = match.groups()
+    parsed = time.strptime(f"{year}-{month}-{day} {hour or '00'}:{minute or '00'}", "%Y-%m-%d %H:%M")
+    event_date = time.strftime("%a, %b %d", parsed).replace(" 0", " ")
+    event_time = time.strftime("%I:%M %p", parsed).lstrip("0") if hour else ''
+    return event_date, event_time
+
+def parse_event_payload(payload, base_url):
+    """
+    Return (event_link, event_title, event_date, event_time, event_location) rows
+    for every event object in a feed response, links made absolute against base_url.
+    """
+    rows = []
+    seen = set()
+    for record in walk_records(payload):
+        if not looks_like_event(record):
+            continue
+        event_link = urljoin(base_url, str(first_value(record, event_link_keys)))
+        if event_link in seen:
+            continue
+        seen.add(event_link)
+
+        event_date = first_value(record, event_date_keys)
+        event_time = first_value(record, event_time_keys) or ''
+        if event_date is None:
+            event_date, event_time = format_event_datetime(first_value(record, event_datetime_keys))
+        venue = first_value(record, event_venue_keys)
+        if isinstance(venue, dict):
+            venue = ", ".join(str(part) for part in (venue.get('name'), venue.get('city'), venue.get('state')) if part)
+        rows.append((event_link, str(first_value(record, event_title_keys)), str(event_date), str(event_time), venue or ''))
+    return rows
+
+def listing_raw_name(section, row, tickets):
+    # Same shape as the grid's listing text, so normalize_ticket_name and the export parser still apply
+    parts = [f"Section {section}"]
+    if row not in (None, ''):
+        parts.append(f"Row {row}")
+    if tickets is not None:
+        parts.append(f"{tickets} ticket{'s' if int(tickets) != 1 else ''}")
+    return " ".join(parts)
+
+def listing_is_vip(record):
+    vip = first_value(record, listing_vip_keys)
+    if vip is not None:
+        return 1 if vip else 0
+    notes = first_value(record, listing_notes_keys)
+    return 1 if notes is not None and 'vip' in json.dumps(notes).lower() else 0
+
+def parse_listing_payload(payload):
+    """
+    Return listing dicts (raw_name, price, zone, is_vip, index, tickets, listing_id) for every
+    unsold listing object in a listings response, in payload order.
+    """
+    listings = []
+    for record in walk_records(payload):
+        if not looks_like_listing(record):
+            continue
+        sold = first_value(record, listing_sold_keys)
+        tickets = first_value(record, listing_tickets_keys)
+        if sold or tickets == 0:
+            continue
+        try:
+            tickets = int(tickets) if tickets is not None else None
+        except (TypeError, ValueError):
+            tickets = None
+        listings.append({
+            'raw_name': listing_raw_name(first_value(record, listing_section_keys), first_value(record, listing_row_keys), tickets),
+            'price': format_price(first_value(record, listing_price_keys)),
+            'zone': str(first_value(record, listing_zone_keys) or ''),
+            'is_vip': listing_is_vip(record),
+            'index': len(listings) + 1,
+            'tickets': tickets,
+            'listing_id': first_value(record, listing_id_keys),
+        })
+    return listings
+
+def enable_performance_log(chrome_options):
+    """Ask chromedriver to keep the CDP Network events in the 'performance' log."""
+    chrome_options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+    return chrome_options
+
+class NetworkCapture:
+    """
+    Collect JSON response bodies seen by a driver started with enable_performance_log().
+    Call drain() after a page has loaded, before navigating away, while Chrome
+    still holds the bodies.
+    """
+
+    def __init__(self, driver, url_pattern=None):
+        self.driver = driver
+        self.url_pattern = re.compile(url_pattern) if url_pattern else None
+        self.responses_seen = 0
+        self.bytes_captured = 0
+        # JSON responses whose body has not finished loading yet, by request id
+        self.pending = {}
+        driver.execute_cdp_cmd('Network.enable', {})
+
+    def _finished_json_responses(self):
+        finished = []
+        for entry in self.driver.get_log('performance'):
+            message = json.loads(entry['message'])['message']
+            method = message.get('method')
+            params = message.get('params', {})
+            if method == 'Network.responseReceived':
+                response = params['response']
+                if 'json' not in response.get('mimeType', ''):
+                    continue
+                if self.url_pattern and not self.url_pattern.search(response['url']):
+                    continue
+                self.pending[params['requestId']] = response['url']
+            elif method == 'Network.loadingFinished' and params.get('requestId') in self.pending:
+                finished.append((params['requestId'], self.pending.pop(params['requestId'])))
+            elif method == 'Network.loadingFailed':
+                self.pending.pop(params.get('requestId'), None)
+        return finished
+
+    def drain(self):
+        """Return [(url, payload)] for the JSON responses that finished since the last drain."""
+        captured = []
+        for request_id, url in self._finished_json_responses():
+            try:
+                body = self.driver.execute_cdp_cmd('Network.getResponseBody', {'requestId': request_id})
+            except Exception as e:
+                # The body is gone if the page navigated away first
+                logger.debug("Could not read response body for %s: %s", url, e)
+                continue
+            text = body.get('body', '')
+            self.bytes_captured += len(text)
+            try:
+                captured.append((url, json.loads(text)))
+                self.responses_seen += 1
+            except ValueError:
+                continue
+        return captured
+
+    def reset(self):
+        """Forget responses from the previous page; call before navigating."""
+        self._finished_json_responses()
+        self.pending = {}
+
+    def wait_for_responses(self, timeout=10, idle=0.5):
+        """
+        Drain until at least one JSON response has arrived and no new one has
+        come in for `idle` seconds, or until the timeout.
+        """
+        deadline = time.time() + timeout
+        captured = []
+        last_arrival = None
+        while time.time() < deadline:
+            batch = self.drain()
+            if batch:
+                captured.extend(batch)
+                last_arrival = time.time()
+            elif last_arrival is not None and time.time() - last_arrival >= idle:
+                break
+            time.sleep(0.1)
+        return captured
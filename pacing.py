@@ -0,0 +1,327 @@
+"""
+Pacing between the scrapers and the browsers.
+
+A Pacer decides how fast the scrapers may go:
+
+- rate: each host has a token bucket, so page loads are spaced out to
+  `rate` per second, with bursts of up to `burst`;
+- concurrency: at most `concurrency` units of work (cities, events) run at
+  once across all browsers; the other workers wait for a slot.
+
+Both limits adjust themselves (additive increase, multiplicative decrease)
+from windows of outcomes: page loads, and units that failed. After a
+healthy window (mean latency under the target, errors under
+max_error_rate) they go up by a fixed step, or double until the first
+decrease (slow start, so a run finds its speed quickly). After a slow or
+failing window they are halved, at most once per cooldown, so one bad
+patch of the site does not push them to the floor.
+
+    pacer = Pacer(max_concurrency=4)
+    pool = DriverPool(create_driver, pacer=pacer)   # every driver.get() and unit is paced
+
+Worker processes share one Pacer, kept in a PacerManager process: each
+uses it through a SharedPacer, so --rate holds for the whole run and one
+worker's slowdown throttles the others too.
+
+Failed units are retried with a growing delay by the work queue (cities)
+and by tickets.py (events), see work_queue.retry_delay.
+"""
+import contextlib
+import threading
+import time
+from multiprocessing.managers import BaseManager
+from urllib.parse import urlparse
+
+from instrumentation import configure_logging, get_logger
+
+logger = get_logger('pacing')
+
+default_rate = 2.0
+default_max_rate = 20.0
+default_target_latency = 4.0
+# Share of failed page loads and units in a window above which the scrapers slow down
+default_max_error_rate = 0.1
+
+class TokenBucket:
+    """Hands out `rate` tokens per second, up to `burst` at once. Thread-safe."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self):
+        """Take a token; returns the seconds to wait before using it. Tokens can go into debt, which keeps callers in order."""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+class AimdLimit:
+    """A limit that grows by `step` and shrinks by `factor`, within [minimum, maximum]."""
+
+    def __init__(self, name, value, minimum, maximum, step, factor=0.5, cooldown=10.0):
+        self.name = name
+        self.value = value
+        self.minimum = minimum
+        self.maximum = maximum
+        self.step = step
+        self.factor = factor
+        self.cooldown = cooldown
+        self.last_decrease = 0.0
+        self.increases = 0
+        self.decreases = 0
+
+    def increase(self):
+        if self.value < self.maximum:
+            grown = self.value * 2 if not self.decreases else self.value + self.step
+            self.value = min(self.maximum, grown)
+            self.increases += 1
+
+    def decrease(self, reason):
+        now = time.monotonic()
+        if now - self.last_decrease < self.cooldown or self.value <= self.minimum:
+            return False
+        self.last_decrease = now
+        self.value = max(self.minimum, self.value * self.factor)
+        self.decreases += 1
+        logger.info("Lowering %s to %.2f (%s).", self.name, self.value, reason)
+        return True
+
+class HostState:
+    """Rate limit and the current window of outcomes for one host."""
+
+    def __init__(self, host, rate, burst, min_rate, max_rate, rate_step, cooldown):
+        self.host = host
+        self.rate = AimdLimit(f"rate for {host}", rate, min_rate, max_rate, rate_step, cooldown=cooldown)
+        self.bucket = TokenBucket(rate, burst)
+        self.latencies = []
+        self.window_errors = 0
+        self.requests = 0
+        self.failed = 0
+        self.throttled_seconds = 0.0
+
+class Pacer:
+    def __init__(self, max_concurrency=1, concurrency=None, rate=default_rate, max_rate=default_max_rate,
+                 min_rate=0.2, rate_step=None, burst=2, target_latency=default_target_latency,
+                 max_error_rate=default_max_error_rate, window=20, cooldown=10.0):
+        self.concurrency = AimdLimit("concurrency", concurrency or max(1, max_concurrency // 2), 1, max_concurrency,
+                                     1, cooldown=cooldown)
+        self.rate_settings = (rate, burst, min_rate, max_rate, rate_step or max(rate / 4, 0.1), cooldown)
+        self.target_latency = target_latency
+        self.max_error_rate = max_error_rate
+        self.window = window
+        self.hosts = {}
+        self.active = 0
+        self.units = 0
+        self.unit_failures = 0
+        self.lock = threading.Lock()
+        self.slot_free = threading.Condition(self.lock)
+        self.local = threading.local()
+
+    def host_state(self, page_url):
+        with self.lock:
+            return self.host_state_locked(page_url)
+
+    def host_state_locked(self, page_url):
+        # Called with the lock held
+        host = urlparse(page_url).netloc or page_url
+        state = self.hosts.get(host)
+        if state is None:
+            state = self.hosts[host] = HostState(host, *self.rate_settings)
+        return state
+
+    def request(self, page_url, fetch):
+        """Call fetch(page_url) once the host's token bucket allows it, and learn from how it went."""
+        waited = self.reserve(page_url)
+        if waited > 0:
+            time.sleep(waited)
+        started = time.monotonic()
+        try:
+            result = fetch(page_url)
+        except Exception:
+            self.record(page_url, waited, error=True)
+            raise
+        self.record(page_url, waited, latency=time.monotonic() - started)
+        return result
+
+    def reserve(self, page_url):
+        """Take a token from the host's bucket; returns the seconds to wait before loading page_url."""
+        self.local.host = page_url
+        return self.host_state(page_url).bucket.reserve()
+
+    def record(self, page_url, waited, latency=None, error=False):
+        """The outcome of a page load reserve() let through."""
+        state = self.host_state(page_url)
+        with self.lock:
+            state.requests += 1
+            state.failed += int(error)
+            state.throttled_seconds += waited
+            self._observe(state, latency=latency, error=error)
+
+    def _observe(self, state, latency=None, error=False):
+        # Called with the lock held
+        if error:
+            state.window_errors += 1
+        else:
+            state.latencies.append(latency)
+        outcomes = len(state.latencies) + state.window_errors
+        # Enough errors to fail the window end it early, so an overloaded site is backed off at once
+        if outcomes < self.window and state.window_errors <= self.max_error_rate * self.window:
+            return
+        failed = state.window_errors / max(outcomes, self.window) > self.max_error_rate
+        mean = sum(state.latencies) / len(state.latencies) if state.latencies else 0.0
+        errors = state.window_errors
+        state.latencies = []
+        state.window_errors = 0
+        if failed:
+            self._slow_down(state, f"{errors} of the last {outcomes} page loads and units failed")
+        elif mean > self.target_latency:
+            self._slow_down(state, f"mean page load {mean:.1f}s over {self.target_latency:.1f}s")
+        else:
+            state.rate.increase()
+            state.bucket.rate = state.rate.value
+            self.concurrency.increase()
+            self.slot_free.notify_all()
+
+    def _slow_down(self, state, reason):
+        # Called with the lock held
+        if state.rate.decrease(reason):
+            state.bucket.rate = state.rate.value
+        self.concurrency.decrease(reason)
+
+    @contextlib.contextmanager
+    def unit(self):
+        """Hold a concurrency slot while a city or event is worked on. A unit that raises counts as an error."""
+        self.begin_unit()
+        self.local.host = None
+        try:
+            yield
+        except Exception as e:
+            self.end_unit(self.local.host, type(e).__name__)
+            raise
+        self.end_unit()
+
+    def begin_unit(self):
+        """Wait for a concurrency slot."""
+        with self.slot_free:
+            while self.active >= int(self.concurrency.value):
+                self.slot_free.wait()
+            self.active += 1
+
+    def end_unit(self, page_url=None, error=None):
+        """
+        Free the slot. error names the exception a failed unit raised;
+        page_url is the last page it loaded, whose host takes the blame.
+        """
+        with self.slot_free:
+            if error is not None:
+                self.unit_failures += 1
+                # A browser shows an error page instead of raising, so most trouble surfaces here
+                if page_url is not None:
+                    self._observe(self.host_state_locked(page_url), error=True)
+                else:
+                    self.concurrency.decrease(f"unit failed: {error}")
+            self.active -= 1
+            self.units += 1
+            self.slot_free.notify_all()
+
+    def summary(self):
+        with self.lock:
+            return {
+                'concurrency': int(self.concurrency.value),
+                'units': self.units,
+                'unit_failures': self.unit_failures,
+                'hosts': {host: {'rate': round(state.rate.value, 2), 'requests': state.requests, 'failed': state.failed,
+                                 'throttled_seconds': round(state.throttled_seconds, 1),
+                                 'increases': state.rate.increases, 'decreases': state.rate.decreases}
+                          for host, state in self.hosts.items()},
+            }
+
+    def log_summary(self):
+        log_summary(self.summary())
+
+def log_summary(summary):
+    logger.info("Pacing: concurrency %d, %d units (%d failed).", summary['concurrency'], summary['units'],
+                summary['unit_failures'])
+    for host, state in summary['hosts'].items():
+        logger.info("Pacing %s: %.2f pages/s allowed, %d page loads (%d failed), %.1fs throttled, "
+                    "%d increases, %d decreases.", host, state['rate'], state['requests'], state['failed'],
+                    state['throttled_seconds'], state['increases'], state['decreases'])
+
+class SharedPacer:
+    """A Pacer in a PacerManager, used from a worker process like a local one."""
+
+    def __init__(self, proxy):
+        self.proxy = proxy
+        self.local = threading.local()
+
+    def request(self, page_url, fetch):
+        self.local.host = page_url
+        waited = self.proxy.reserve(page_url)
+        if waited > 0:
+            time.sleep(waited)
+        started = time.monotonic()
+        try:
+            result = fetch(page_url)
+        except Exception:
+            self.proxy.record(page_url, waited, error=True)
+            raise
+        self.proxy.record(page_url, waited, latency=time.monotonic() - started)
+        return result
+
+    @contextlib.contextmanager
+    def unit(self):
+        self.proxy.begin_unit()
+        self.local.host = None
+        try:
+            yield
+        except Exception as e:
+            self.proxy.end_unit(self.local.host, type(e).__name__)
+            raise
+        self.proxy.end_unit()
+
+    def log_summary(self):
+        # The process that started the PacerManager logs the summary of the whole run
+        pass
+
+class PacerManager(BaseManager):
+    pass
+
+PacerManager.register('Pacer', Pacer, exposed=('reserve', 'record', 'begin_unit', 'end_unit', 'summary'))
+
+def add_arguments(parser):
+    """The pacing options shared by main.py and tickets.py."""
+    parser.add_argument('--rate', type=float, default=default_rate,
+                        help="Page loads per second per host to start with; adjusted as the run goes")
+    parser.add_argument('--max-rate', type=float, default=default_max_rate,
+                        help="Upper bound on page loads per second per host")
+    parser.add_argument('--target-latency', type=float, default=default_target_latency,
+                        help="Seconds per page load above which the scrapers slow down")
+    parser.add_argument('--max-error-rate', type=float, default=default_max_error_rate,
+                        help="Share of failed page loads and units above which the scrapers slow down")
+    parser.add_argument('--no-pacing', action='store_true', help="Load pages as fast as the browsers go")
+
+def pacer_from_args(args, max_concurrency=1):
+    if args.no_pacing:
+        return None
+    return Pacer(max_concurrency, rate=args.rate, max_rate=max(args.max_rate, args.rate),
+                 target_latency=args.target_latency, max_error_rate=args.max_error_rate)
+
+def shared_pacer_from_args(args, max_concurrency, context=None):
+    """
+    (manager, pacer) for worker processes to share: hand each one the pacer
+    (a proxy) and wrap it in a SharedPacer there; shut the manager down at
+    the end. (None, None) with --no-pacing.
+    """
+    if args.no_pacing:
+        return None, None
+    manager = PacerManager(ctx=context)
+    # The manager process logs the rate and concurrency changes
+    manager.start(configure_logging, (args.log_level,))
+    return manager, manager.Pacer(max_concurrency, rate=args.rate, max_rate=max(args.max_rate, args.rate),
+                                  target_latency=args.target_latency, max_error_rate=args.max_error_rate)
@@ -0,0 +1,462 @@
+"""
+Archive of the raw pages the scrapers parse, and re-extraction from it.
+
+When Viagogo changes its markup, the absolute XPaths in main.py and
+tickets.py stop matching. Without the pages the parsers read, the only fix
+is to crawl everything again. With --archive FILE, main.py, tickets.py and
+pipeline.py keep a copy of everything their parsers see:
+
+- 'city': the document of a city feed, once per Load More batch, before
+  its event cards are removed;
+- 'listings': the document of an event's grid, once per batch of listings,
+  before they are removed;
+- 'modal': the zone/VIP dialog of every listing clicked;
+- 'city_json' and 'listings_json': the JSON responses read by the network
+  engine.
+
+Each snapshot is keyed by URL, kind and fetch time, with what the parser
+needs to know (state and city, event link, quantity, scrape time) as JSON.
+Bodies are stored once per distinct content (SHA-256) and zlib-compressed,
+so pages seen unchanged again cost one snapshot row.
+
+reextract runs the event and ticket parsers over the archive in worker
+processes, one per core, without a browser, into a separate database.
+XPaths are evaluated with lxml (pip install lxml), and element text follows
+the browser's innerText closely enough for the name and price parsers:
+
+    python page_archive.py stats pages.db
+    python page_archive.py reextract pages.db --database reextracted.db --workers 8
+"""
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from urllib.parse import urljoin
+
+from db_writer import DatabaseWriteError, DatabaseWriter, configure_connection
+from instrumentation import configure_logging, get_logger
+
+logger = get_logger('page_archive')
+
+compression_level = 6
+# Snapshots per re-extraction task for city pages; an event's scrape is always one task
+city_chunk_size = 20
+
+# Elements whose text the browser's innerText puts on lines of their own
+block_tags = frozenset(['address', 'article', 'aside', 'blockquote', 'dd', 'div', 'dl', 'dt', 'figcaption', 'figure',
+                        'footer', 'form', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'header', 'hr', 'li', 'main', 'nav',
+                        'ol', 'p', 'pre', 'section', 'table', 'tr', 'ul'])
+hidden_tags = frozenset(['script', 'style', 'noscript', 'template', 'head', 'title'])
+
+insert_body_sql = 'INSERT OR IGNORE INTO bodies (digest, body, size) VALUES (?, ?, ?)'
+insert_snapshot_sql = 'INSERT INTO snapshots (url, fetched_at, kind, digest, meta) VALUES (?, ?, ?, ?, ?)'
+
+document_script = "return document.documentElement.outerHTML;"
+modal_script = "const modal = document.getElementById('modal-root'); return modal ? modal.outerHTML : null;"
+
+def setup_archive_tables(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS bodies (
+            digest TEXT PRIMARY KEY,  -- SHA-256 of the uncompressed body
+            body BLOB,  -- zlib-compressed
+            size INTEGER  -- Uncompressed bytes
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS snapshots (
+            url TEXT,
+            fetched_at REAL,  -- Unix time
+            kind TEXT,  -- 'city', 'listings', 'modal', 'city_json' or 'listings_json'
+            digest TEXT,  -- bodies.digest
+            meta TEXT  -- JSON: state/city, or event_link/quantity/scraped_at
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_snapshots_url ON snapshots (url, fetched_at)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_snapshots_kind ON snapshots (kind, fetched_at)')
+    conn.commit()
+
+class PageArchive:
+    """
+    Process-wide archive, off until configure() is given a path. save() is
+    thread-safe; bodies are compressed in the calling thread and written by
+    a DatabaseWriter of their own.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.path = None
+        self.writer = None
+        self.known_digests = set()
+        self.snapshots = 0
+        self.new_bodies = 0
+        self.raw_bytes = 0
+        self.stored_bytes = 0
+
+    @property
+    def enabled(self):
+        return self.writer is not None
+
+    def configure(self, path):
+        self.close()
+        if not path:
+            return
+        conn = configure_connection(sqlite3.connect(path))
+        setup_archive_tables(conn)
+        self.known_digests = {row[0] for row in conn.execute('SELECT digest FROM bodies')}
+        conn.close()
+        self.path = path
+        self.writer = DatabaseWriter(path)
+
+    def save(self, kind, url, body, meta=None, fetched_at=None):
+        if self.writer is None or body is None:
+            return
+        data = body.encode('utf-8') if isinstance(body, str) else body
+        digest = hashlib.sha256(data).hexdigest()
+        with self.lock:
+            new = digest not in self.known_digests
+            self.known_digests.add(digest)
+            self.snapshots += 1
+            self.raw_bytes += len(data)
+        if new:
+            compressed = zlib.compress(data, compression_level)
+            with self.lock:
+                self.new_bodies += 1
+                self.stored_bytes += len(compressed)
+            self.writer.write(insert_body_sql, (digest, compressed, len(data)))
+        self.writer.write(insert_snapshot_sql, (url, fetched_at or time.time(), kind, digest,
+                                                json.dumps(meta) if meta else None))
+
+    def save_page(self, driver, kind, url, meta=None):
+        """Save the current document of driver (one extra WebDriver call)."""
+        if self.writer is not None:
+            self.save(kind, url, driver.execute_script(document_script), meta)
+
+    def save_modal(self, driver, url, meta=None):
+        if self.writer is not None:
+            self.save('modal', url, driver.execute_script(modal_script), meta)
+
+    def save_responses(self, kind, responses, meta=None):
+        if self.writer is not None:
+            for response_url, payload in responses:
+                self.save(kind, response_url, json.dumps(payload), meta)
+
+    def close(self):
+        if self.writer is None:
+            return
+        writer, self.writer = self.writer, None
+        try:
+            writer.close()
+        except DatabaseWriteError as e:
+            # A gap in the archive is not worth failing the scrape over
+            logger.warning("Page archive %s is missing pages: %s", self.path, e)
+        with self.lock:
+            ratio = self.raw_bytes / self.stored_bytes if self.stored_bytes else 0.0
+            logger.info("Page archive %s: %d snapshots, %d new bodies, %.1f MiB seen, %.1f MiB stored (%.0fx).",
+                        self.path, self.snapshots, self.new_bodies, self.raw_bytes / 2**20, self.stored_bytes / 2**20,
+                        ratio)
+
+archive = PageArchive()
+
+def add_arguments(parser):
+    """The archive option shared by main.py, tickets.py and pipeline.py."""
+    parser.add_argument('--archive', metavar='FILE',
+                        help="Save every page the parsers read to this SQLite file, for page_archive.py reextract")
+
+def configure(args):
+    archive.configure(args.archive)
+
+# Offline parsing
+
+def parse_html(html):
+    import lxml.html
+    return lxml.html.document_fromstring(html)
+
+def inner_text(element):
+    """Text of an lxml element laid out like the browser's innerText: block elements on their own lines."""
+    parts = []
+
+    def walk(node):
+        tag = node.tag if isinstance(node.tag, str) else None
+        if tag in hidden_tags:
+            return
+        block = tag in block_tags
+        if block:
+            parts.append('\n')
+        if tag == 'br':
+            parts.append('\n')
+        if node.text and tag is not None:
+            parts.append(node.text)
+        for child in node:
+            walk(child)
+            if child.tail:
+                parts.append(child.tail)
+        if block:
+            parts.append('\n')
+
+    walk(element)
+    lines = (" ".join(line.split()) for line in "".join(parts).split('\n'))
+    return "\n".join(line for line in lines if line)
+
+def first_text(node, xpath):
+    found = node.xpath(xpath)
+    return inner_text(found[0]) if found else None
+
+def parse_city_html(html, page_url):
+    """The event cards of a city document, as main.extract_event_cards returns them."""
+    import main as crawler
+    document = parse_html(html)
+    cards = []
+    for card in document.xpath(crawler.event_container_xpath):
+        links = card.xpath('.//a')
+        href = links[0].get('href') if links else None
+        cards.append({
+            'link': urljoin(page_url, href) if href else None,
+            'title': first_text(card, './/a//p[1]'),
+            'date_time': first_text(card, './/a//p[2]'),
+            'location': first_text(card, './/a//p[1]'),
+        })
+    return cards
+
+def parse_listings_html(html):
+    """The listing containers of an event document, as tickets.extract_listings returns them."""
+    import tickets
+    document = parse_html(html)
+    listings = []
+    for index, container in enumerate(document.xpath(tickets.ticket_container_xpath), start=1):
+        listings.append({
+            'index': index,
+            'sold': 'sold' in inner_text(container).lower(),
+            'name': first_text(container, tickets.ticket_name_xpath),
+            'price': first_text(container, tickets.ticket_price_xpath),
+        })
+    return listings
+
+def parse_modal_html(html):
+    """(zone, is_vip) from a saved listing dialog, as tickets.read_listing_details reads them."""
+    import tickets
+    document = parse_html(html)
+    zone = first_text(document, tickets.zone_xpath) or ""
+    vip = first_text(document, tickets.vip_status_xpath) or ""
+    return zone.strip(), 1 if 'vip' in vip.lower() else 0
+
+class RowCollector:
+    """DatabaseWriter stand-in that keeps the rows, to send them back from a worker process."""
+
+    def __init__(self):
+        self.rows = []
+
+    def write(self, sql, params):
+        self.rows.append((sql, params))
+
+    def write_many(self, sql, rows):
+        for params in rows:
+            self.write(sql, params)
+
+def read_body(conn, digest):
+    return zlib.decompress(conn.execute('SELECT body FROM bodies WHERE digest = ?', (digest,)).fetchone()[0]).decode('utf-8')
+
+# Per worker process: the archive connection and zone/VIP by venue and section from the target database
+worker_state = {}
+
+def init_worker(archive_path, zones):
+    configure_logging('WARNING')
+    worker_state['conn'] = sqlite3.connect(f"file:{archive_path}?mode=ro", uri=True)
+    worker_state['zones'] = zones
+
+def extract_cities(snapshots):
+    """Event rows of a chunk of 'city' and 'city_json' snapshots."""
+    import main as crawler
+    from network_capture import parse_event_payload
+    conn = worker_state['conn']
+    collector = RowCollector()
+    for url, kind, digest, meta in snapshots:
+        meta = json.loads(meta) if meta else {}
+        body = read_body(conn, digest)
+        if kind == 'city_json':
+            rows = [(crawler.update_query_param(link, "quantity", "1"), title, date, event_time, location)
+                    for link, title, date, event_time, location in parse_event_payload(json.loads(body), url)]
+        else:
+            rows = crawler.parse_event_cards(parse_city_html(body, url))
+        for row in rows:
+            collector.write(crawler.insert_event_sql, crawler.event_record(*row, meta.get('state'), meta.get('city')))
+    return len(snapshots), collector.rows
+
+def extract_event_scrape(snapshots):
+    """Ticket rows of one event scrape: its 'listings', 'listings_json' and 'modal' snapshots."""
+    import tickets
+    from network_capture import parse_listing_payload
+    from zone_cache import parse_section, venue_key
+    conn = worker_state['conn']
+    zones = worker_state['zones']
+
+    dialogs = {}
+    loaded = {}
+    event_link = scraped_at = None
+    event_location = ""
+    for url, kind, digest, meta in snapshots:
+        meta = json.loads(meta) if meta else {}
+        event_link, scraped_at = meta['event_link'], meta['scraped_at']
+        event_location = meta.get('event_location') or event_location
+        body = read_body(conn, digest)
+        if kind == 'modal':
+            dialogs[meta.get('raw_name')] = parse_modal_html(body)
+            continue
+        records = loaded.setdefault(meta['quantity'], [])
+        if kind == 'listings_json':
+            for record in parse_listing_payload(json.loads(body)):
+                record['ticket_name'] = tickets.normalize_ticket_name(record['raw_name'])
+                records.append(record)
+            continue
+        for listing in parse_listings_html(body):
+            if listing['sold'] or listing['name'] is None or listing['price'] is None:
+                continue
+            raw_ticket_name = listing['name'].strip()
+            records.append({'raw_name': raw_ticket_name, 'ticket_name': tickets.normalize_ticket_name(raw_ticket_name),
+                            'price': listing['price'].strip(), 'zone': None, 'is_vip': None})
+
+    for records in loaded.values():
+        for index, record in enumerate(records, start=1):
+            record['index'] = index
+            if record['zone'] is None:
+                # The dialog was only opened for listings not read at another quantity, in sections the zone cache did not know yet
+                details = dialogs.get(record['raw_name']) or zones.get((venue_key(event_location), parse_section(record['raw_name'])))
+                record['zone'], record['is_vip'] = details or ("", 0)
+
+    results = sorted(loaded.items())
+
+    collector = RowCollector()
+    listings, listing_keys = tickets.identify_listings(tickets.canonical_event_id(event_link), results)
+    for (quantity, records), quantity_keys in zip(results, listing_keys):
+        tickets.store_listings(collector, event_link, quantity, records, event_location, scraped_at, quantity_keys)
+    tickets.purge_stale_tickets(collector, event_link, scraped_at)
+    return len(snapshots), collector.rows
+
+def city_tasks(conn, since):
+    chunk = []
+    for row in conn.execute('''SELECT url, kind, digest, meta FROM snapshots WHERE kind IN ('city', 'city_json')
+                               AND fetched_at >= ? ORDER BY fetched_at''', (since,)):
+        chunk.append(row)
+        if len(chunk) >= city_chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def event_tasks(conn, since):
+    """Snapshots grouped by event scrape, oldest scrape first, so the latest rows win."""
+    group, key = [], None
+    for row in conn.execute('''SELECT url, kind, digest, meta, json_extract(meta, '$.event_link'),
+                                      json_extract(meta, '$.scraped_at') AS scraped_at
+                               FROM snapshots WHERE kind IN ('listings', 'listings_json', 'modal') AND fetched_at >= ?
+                               ORDER BY scraped_at, json_extract(meta, '$.event_link'), fetched_at''', (since,)):
+        if row[4:] != key and group:
+            yield group
+            group = []
+        key = row[4:]
+        group.append(row[:4])
+    if group:
+        yield group
+
+def load_zones(path):
+    if not os.path.exists(path):
+        return {}
+    conn = sqlite3.connect(path)
+    try:
+        return {(venue, section): (zone, is_vip)
+                for venue, section, zone, is_vip in conn.execute('SELECT venue, section, zone, is_vip FROM zone_cache')}
+    except sqlite3.OperationalError:
+        return {}
+    finally:
+        conn.close()
+
+def reextract(archive_path, database_path, workers=None, kinds=('events', 'tickets'), since=0.0, zone_source=None):
+    """
+    Run the parsers over the archived snapshots in worker processes and
+    write the events and tickets they find to database_path. Returns
+    {kind: (snapshots parsed, rows written)}.
+    """
+    import main as crawler
+    import tickets
+    workers = workers or os.cpu_count() or 1
+    conn = configure_connection(sqlite3.connect(database_path))
+    crawler.setup_database(conn)
+    tickets.setup_tickets_table(conn, drop=False)
+    conn.close()
+    # The pool reads the task lists from its own thread
+    source = sqlite3.connect(f"file:{archive_path}?mode=ro", uri=True, check_same_thread=False)
+    zones = load_zones(zone_source or database_path)
+
+    jobs = []
+    if 'events' in kinds:
+        jobs.append(('events', extract_cities, city_tasks(source, since)))
+    if 'tickets' in kinds:
+        jobs.append(('tickets', extract_event_scrape, event_tasks(source, since)))
+
+    counts = {}
+    # Workers only read the archive; this process is the only writer
+    writer = DatabaseWriter(database_path)
+    context = multiprocessing.get_context('spawn')
+    started = time.time()
+    try:
+        with context.Pool(workers, initializer=init_worker, initargs=(archive_path, zones)) as pool:
+            for kind, task, batches in jobs:
+                parsed = written = 0
+                # imap keeps the order, so a later scrape of an event replaces the rows of an earlier one
+                for snapshots, rows in pool.imap(task, batches, chunksize=4):
+                    parsed += snapshots
+                    written += len(rows)
+                    for sql, params in rows:
+                        writer.write(sql, params)
+                counts[kind] = (parsed, written)
+                logger.info("Re-extracted %s from %d snapshots: %d rows, %.1fs.", kind, parsed, written,
+                            time.time() - started)
+    finally:
+        writer.close()
+        source.close()
+    return counts
+
+def archive_stats(archive_path):
+    conn = sqlite3.connect(f"file:{archive_path}?mode=ro", uri=True)
+    by_kind = conn.execute('''SELECT s.kind, COUNT(*), COUNT(DISTINCT s.url), SUM(b.size)
+                              FROM snapshots s JOIN bodies b ON b.digest = s.digest GROUP BY s.kind''').fetchall()
+    bodies, raw, stored = conn.execute('SELECT COUNT(*), SUM(size), SUM(LENGTH(body)) FROM bodies').fetchone()
+    conn.close()
+    for kind, snapshots, urls, seen in by_kind:
+        print(f"{kind:<14} {snapshots:8d} snapshots of {urls:7d} URLs, {seen / 2**20:9.1f} MiB as fetched")
+    if bodies:
+        print(f"{bodies} distinct bodies, {raw / 2**20:.1f} MiB uncompressed, {stored / 2**20:.1f} MiB stored "
+              f"({raw / stored:.0f}x smaller)")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Inspect a page archive or re-run the parsers over it without a browser.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    stats = commands.add_parser('stats', help="Snapshots and storage by kind")
+    stats.add_argument('archive')
+    run = commands.add_parser('reextract', help="Parse the archived pages into a database")
+    run.add_argument('archive')
+    run.add_argument('--database', default='reextracted.db', help="Database to write events and tickets to")
+    run.add_argument('--workers', type=int, default=None, help="Parser processes (default: one per core)")
+    run.add_argument('--kind', choices=['events', 'tickets', 'all'], default='all')
+    run.add_argument('--since', type=float, default=0.0, help="Only pages fetched at or after this Unix time")
+    run.add_argument('--zone-cache', metavar='DB',
+                     help="Database whose zone_cache fills in zone/VIP for listings without a saved dialog "
+                          "(default: --database)")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    configure_logging('INFO')
+    if args.command == 'stats':
+        archive_stats(args.archive)
+    else:
+        try:
+            import lxml  # noqa: F401
+        except ImportError:
+            raise SystemExit("Re-extraction needs lxml (pip install lxml).")
+        kinds = ('events', 'tickets') if args.kind == 'all' else (args.kind,)
+        reextract(args.archive, args.database, args.workers, kinds, args.since, args.zone_cache)
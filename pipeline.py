@@ -0,0 +1,216 @@
+"""
+Crawl and ticket scrape as one pipeline.
+
+Running main.py and then tickets.py means no ticket is scraped until the
+whole country has been crawled. Here the two stages run side by side:
+
+- crawl workers (main.city_worker) read the city feeds and hand every new
+  event link to a bounded queue as soon as it is read;
+- ticket workers take links from the queue and scrape their listings
+  (tickets.scrape_managed_event), each on its own browser;
+- when the queue is full, crawl workers wait for the ticket workers
+  (backpressure), so discovery never runs far ahead of scraping;
+- both stages write through one DatabaseWriter.
+
+    python pipeline.py --crawl-workers 2 --ticket-workers 4 --queue-size 200
+
+Time to the first ticket, events discovered and scraped, and how long the
+crawl stage was held back are logged at the end. Tickets already stored
+are kept; each scraped event replaces its own listings.
+"""
+import argparse
+import queue
+import threading
+import time
+
+import browser
+import driver_manager
+import instrumentation
+import main as crawler
+import pacing
+import page_archive
+import tickets
+import work_queue
+from db_writer import DatabaseWriter
+from delta_crawl import default_cutoff
+from instrumentation import get_logger, tracer
+from page_archive import archive
+from price_history import previous_listings
+from zone_cache import ZoneCache
+
+logger = get_logger('pipeline')
+
+default_queue_size = 200
+
+class EventStream:
+    """Bounded hand-off of event links from the crawl stage to the ticket stage, each link once."""
+
+    def __init__(self, maxsize=default_queue_size):
+        self.queue = queue.Queue(maxsize)
+        self.seen = set()
+        self.lock = threading.Lock()
+        self.discovered = 0
+        self.blocked_seconds = 0.0
+        self.high_water = 0
+
+    def put(self, event_link):
+        with self.lock:
+            if event_link in self.seen:
+                return
+            self.seen.add(event_link)
+            self.discovered += 1
+        started = time.monotonic()
+        # Blocks while the ticket workers are behind
+        self.queue.put(event_link)
+        waited = time.monotonic() - started
+        with self.lock:
+            self.blocked_seconds += waited
+            self.high_water = max(self.high_water, self.queue.qsize())
+
+    def close(self, consumers):
+        for _ in range(consumers):
+            self.queue.put(None)
+
+    def get(self):
+        return self.queue.get()
+
+class TicketStage:
+    """Ticket workers consuming an EventStream, and the time of the first stored ticket."""
+
+    def __init__(self, stream, writer, pool, zone_cache=None):
+        self.stream = stream
+        self.writer = writer
+        self.pool = pool
+        self.zone_cache = zone_cache
+        self.lock = threading.Lock()
+        self.scraped = 0
+        self.failed = 0
+        self.first_ticket_at = None
+
+    def worker(self):
+        try:
+            managed = self.pool.acquire()
+        except Exception as e:
+            # Keep taking events, so the crawl is never left waiting on a full queue
+            logger.error("Ticket worker could not start a browser: %s", e)
+            while self.stream.get() is not None:
+                with self.lock:
+                    self.failed += 1
+            return
+        try:
+            while True:
+                event_link = self.stream.get()
+                if event_link is None:
+                    break
+                entry = tickets.new_entry(event_link)
+                ok = tickets.scrape_managed_event(managed, self.writer, entry, self.zone_cache)
+                with self.lock:
+                    if not ok:
+                        self.failed += 1
+                        continue
+                    self.scraped += 1
+                    if entry['listing_count'] and self.first_ticket_at is None:
+                        self.first_ticket_at = time.time()
+        finally:
+            managed.release()
+
+def run_pipeline(crawl_workers=1, ticket_workers=2, engine='dom', start_url=crawler.url, path=crawler.database_path,
+                 queue_size=default_queue_size, crawl_pool=None, ticket_pool=None, work=None, delta_cutoff=0,
+                 zone_cache=True):
+    """
+    Crawl from start_url and scrape the tickets of every event found, in one
+    pass. Returns a summary dict (events discovered and scraped, time to the
+    first ticket and elapsed seconds, the crawl summary).
+    """
+    conn = crawler.connect_database(path)
+    crawler.setup_database(conn)
+    tickets.setup_tickets_table(conn, drop=False)
+    previous_listings.configure(path)
+
+    network = engine == 'network'
+    if crawl_pool is None:
+        crawl_pool = driver_manager.DriverPool(crawler.create_driver, network_capture=network)
+    if ticket_pool is None:
+        ticket_pool = driver_manager.DriverPool(tickets.create_driver, network_capture=network)
+    writer = DatabaseWriter(path)
+    stream = EventStream(queue_size)
+    stage = TicketStage(stream, writer, ticket_pool, ZoneCache(conn, writer) if zone_cache else None)
+
+    started = time.time()
+    consumers = [threading.Thread(target=stage.worker, name=f"ticket-worker-{number}", daemon=True)
+                 for number in range(1, ticket_workers + 1)]
+    for consumer in consumers:
+        consumer.start()
+    try:
+        crawl_summary = crawler.run(crawl_workers, engine, start_url, path, pool=crawl_pool, work=work,
+                                    delta_cutoff=delta_cutoff, writer=writer, on_event=stream.put)
+    finally:
+        # Let the ticket workers finish what is queued, then stop them
+        stream.close(len(consumers))
+        for consumer in consumers:
+            consumer.join()
+        if stage.zone_cache:
+            stage.zone_cache.flush_hits()
+        try:
+            writer.close()
+        finally:
+            ticket_pool.close()
+            conn.close()
+            previous_listings.close()
+
+    elapsed = time.time() - started
+    first_ticket = stage.first_ticket_at - started if stage.first_ticket_at else None
+    logger.info("Pipeline finished in %.1f min: %d events discovered, %d scraped, %d failed.",
+                elapsed / 60, stream.discovered, stage.scraped, stage.failed)
+    logger.info("First ticket after %s; crawl held back %.1fs by a full queue (high water %d of %d).",
+                f"{first_ticket:.1f}s" if first_ticket is not None else "never", stream.blocked_seconds,
+                stream.high_water, queue_size)
+    return {
+        'discovered': stream.discovered,
+        'scraped': stage.scraped,
+        'failed': stage.failed,
+        'time_to_first_ticket': first_ticket,
+        'blocked_seconds': stream.blocked_seconds,
+        'elapsed': elapsed,
+        'crawl': crawl_summary,
+    }
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Crawl events and scrape their tickets in one pipelined run.")
+    parser.add_argument('--crawl-workers', type=int, default=1, help="Browsers reading city feeds")
+    parser.add_argument('--ticket-workers', type=int, default=2, help="Browsers scraping ticket listings")
+    parser.add_argument('--queue-size', type=int, default=default_queue_size,
+                        help="Events discovered but not yet scraped before the crawl waits")
+    parser.add_argument('--engine', choices=['dom', 'network'], default='dom',
+                        help="Read events and listings from the rendered pages (dom) or from their JSON responses (network)")
+    parser.add_argument('--delta', type=int, nargs='?', const=default_cutoff, default=0, metavar='N',
+                        help="Stop a city's Load More after N events in a row that are already stored")
+    parser.add_argument('--no-zone-cache', action='store_true',
+                        help="Open the listing dialog for every listing instead of reusing known zone/VIP by venue and section")
+    browser.add_arguments(parser)
+    driver_manager.add_arguments(parser)
+    pacing.add_arguments(parser)
+    work_queue.add_arguments(parser)
+    instrumentation.add_arguments(parser)
+    page_archive.add_arguments(parser)
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    instrumentation.configure(args)
+    page_archive.configure(args)
+    crawler.browser_profile = tickets.browser_profile = browser.profile_from_args(args)
+    network = args.engine == 'network'
+    # Each stage paces itself: a crawl worker waiting on a full queue must not hold a slot the ticket workers need
+    crawl_pool = driver_manager.pool_from_args(args, crawler.create_driver, network,
+                                               pacing.pacer_from_args(args, max_concurrency=args.crawl_workers))
+    ticket_pool = driver_manager.pool_from_args(args, tickets.create_driver, network,
+                                                pacing.pacer_from_args(args, max_concurrency=args.ticket_workers))
+    try:
+        run_pipeline(args.crawl_workers, args.ticket_workers, args.engine, queue_size=args.queue_size,
+                     crawl_pool=crawl_pool, ticket_pool=ticket_pool,
+                     work=work_queue.queue_from_args(args, crawler.database_path, 'crawl'),
+                     delta_cutoff=args.delta, zone_cache=not args.no_zone_cache)
+    finally:
+        archive.close()
+        tracer.close()
@@ -0,0 +1,282 @@
+"""
+Append-only price history of ticket listings.
+
+The tickets table only holds what the last scrape of each event saw, and a
+full tickets.py run drops it. The price history keeps every listing an event
+has shown, in two tables that tickets.py never drops:
+
+- listings: one row per listing, with its latest price and ticket count,
+  when it was first and last seen and whether the event still shows it;
+- price_history: one row per change only ('appeared', 'price',
+  'disappeared'), so an event whose listings do not change adds nothing
+  however often it is scraped.
+
+A listing is identified by its event and the attributes that do not change
+while it is on sale: section, row and the rest of the listing text without
+the ticket count, or the listing id when the network engine has one. Two
+listings with the same attributes are matched against the ones the event
+showed last time (previous_listings, once configured): the same price
+first, then the rest in price order, so one listing's price change does not
+move the others to new keys. Only listings left over get a key of their
+own. The same listing shown at several quantities is one listing.
+
+    python price_history.py 150000001            # price changes of one event
+"""
+import argparse
+import datetime
+import hashlib
+import re
+import sqlite3
+import threading
+
+from db_writer import configure_connection
+
+from sweep_planner import parse_ticket_count, ticket_count_pattern
+from ticket_names import split_ticket_name
+
+# "$1,234.50" -> 1234.5
+price_pattern = re.compile(r'\d[\d,]*(?:\.\d+)?')
+
+# An unchanged price adds no row; a listing the event did not show before (again) does
+record_changes_sql = '''INSERT INTO price_history (listing_key, event_id, observed_at, change, price)
+                        SELECT :listing_key, :event_id, :observed_at,
+                               CASE WHEN l.active THEN 'price' ELSE 'appeared' END, :price
+                        FROM (SELECT 1) LEFT JOIN listings l ON l.listing_key = :listing_key
+                        WHERE l.active IS NOT 1 OR l.price IS NOT :price'''
+
+upsert_listing_sql = '''INSERT INTO listings (listing_key, event_id, section, row, listing_ref, ticket_count, price,
+                                              first_seen, last_seen, active)
+                        VALUES (:listing_key, :event_id, :section, :row, :listing_ref, :ticket_count, :price,
+                                :observed_at, :observed_at, 1)
+                        ON CONFLICT (listing_key) DO UPDATE SET ticket_count = excluded.ticket_count,
+                            price = excluded.price, last_seen = excluded.last_seen, active = 1'''
+
+record_disappeared_sql = '''INSERT INTO price_history (listing_key, event_id, observed_at, change, price)
+                            SELECT listing_key, event_id, ?, 'disappeared', NULL FROM listings
+                            WHERE event_id = ? AND active = 1 AND last_seen < ?'''
+
+close_disappeared_sql = 'UPDATE listings SET active = 0 WHERE event_id = ? AND active = 1 AND last_seen < ?'
+
+touch_listings_sql = 'UPDATE listings SET last_seen = ? WHERE event_id = ? AND active = 1'
+
+def setup_price_history_tables(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS listings (
+            listing_key TEXT PRIMARY KEY,
+            event_id TEXT,  -- events.event_id
+            section TEXT,
+            row TEXT,
+            listing_ref TEXT,  -- The site's listing id, when the listings came from JSON
+            ticket_count INTEGER,
+            price REAL,  -- Latest price
+            first_seen REAL,  -- Unix time
+            last_seen REAL,
+            active INTEGER  -- 1 while the event still shows the listing
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS price_history (
+            listing_key TEXT,
+            event_id TEXT,
+            observed_at REAL,  -- Unix time of the scrape that saw the change
+            change TEXT,  -- 'appeared', 'price' or 'disappeared'
+            price REAL  -- New price; NULL when the listing disappeared
+        )
+    ''')
+    conn.commit()
+
+def parse_price(price):
+    """The amount of a displayed price ("$1,234"), or None if it has none."""
+    if price is None:
+        return None
+    match = price_pattern.search(str(price))
+    return float(match.group(0).replace(',', '')) if match else None
+
+def listing_attributes(record):
+    """(section, row, listing_ref, text) of a listing; text is its name without the ticket count."""
+    section, row, _ = split_ticket_name(record.get('ticket_name'))
+    listing_ref = record.get('listing_id')
+    text = " ".join(ticket_count_pattern.sub(' ', record.get('raw_name') or '').lower().split())
+    return section, row, str(listing_ref) if listing_ref is not None else None, text
+
+def listing_key(event_id, attributes, ordinal):
+    section, row, listing_ref, text = attributes
+    identity = f"{event_id}|ref|{listing_ref}" if listing_ref else f"{event_id}|{section}|{row}|{text}|{ordinal}"
+    return hashlib.sha256(identity.encode('utf-8')).hexdigest()[:32]
+
+def price_order(price):
+    return (price is None, price or 0.0)
+
+class PreviousListings:
+    """
+    Process-wide reader of the listings each event has shown, off until
+    configure() is given the database path. load() is thread-safe: every
+    thread reads through a connection of its own.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.path = None
+        self.local = threading.local()
+        self.connections = []
+
+    def configure(self, path):
+        self.close()
+        self.path = path
+
+    def load(self, event_id):
+        """{listing_key: (price, active)} of every listing the event has shown, or {} when off."""
+        if self.path is None:
+            return {}
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = configure_connection(sqlite3.connect(self.path, check_same_thread=False))
+            self.local.conn = conn
+            with self.lock:
+                self.connections.append(conn)
+        try:
+            rows = conn.execute('SELECT listing_key, price, active FROM listings WHERE event_id = ?', (event_id,))
+            return {key: (price, active) for key, price, active in rows}
+        except sqlite3.OperationalError:
+            # No listings table yet: every listing is new
+            return {}
+
+    def close(self):
+        with self.lock:
+            connections, self.connections = self.connections, []
+        for conn in connections:
+            conn.close()
+        self.local = threading.local()
+        self.path = None
+
+previous_listings = PreviousListings()
+
+def assign_keys(event_id, attributes, prices, previous):
+    """
+    The listing_key of each of the listings sharing attributes, prices in
+    price order. previous is PreviousListings.load() of the event.
+    """
+    if attributes[2]:
+        return [listing_key(event_id, attributes, 0)] * len(prices)
+    # New keys take the lowest free ordinal, so the keys this group ever had are ordinals 0..known-1
+    known = 0
+    while listing_key(event_id, attributes, known) in previous:
+        known += 1
+    candidates = [listing_key(event_id, attributes, ordinal) for ordinal in range(known)]
+    active = [key for key in candidates if previous[key][1]]
+    inactive = [key for key in candidates if not previous[key][1]]
+
+    keys = [None] * len(prices)
+    for index, price in enumerate(prices):
+        match = next((key for key in active if previous[key][0] == price), None)
+        if match is not None:
+            keys[index] = match
+            active.remove(match)
+    # Price changes: pair what is left on both sides in price order
+    active.sort(key=lambda key: price_order(previous[key][0]))
+    for index in [index for index, key in enumerate(keys) if key is None]:
+        if not active:
+            break
+        keys[index] = active.pop(0)
+    for index, price in enumerate(prices):
+        if keys[index] is None:
+            # A listing back on sale at its old price
+            match = next((key for key in inactive if previous[key][0] == price), None)
+            if match is not None:
+                keys[index] = match
+                inactive.remove(match)
+            else:
+                keys[index] = listing_key(event_id, attributes, known)
+                known += 1
+    return keys
+
+def identify_listings(event_id, results, previous=None):
+    """
+    Identify the listings of one event scrape. results is a list of
+    (quantity, records) as the quantity sweep returns them; previous is the
+    event's listings as PreviousListings.load() returns them (None: identify
+    by price order alone). Returns
+    (listings, keys): one dict per distinct listing for record_snapshot, and
+    for every quantity the listing_key of each of its records, in order.
+    """
+    # A listing shows at every quantity it can sell; count each one on the page that shows most copies
+    copies = {}
+    for _, records in results:
+        counts = {}
+        for record in records:
+            found = (listing_attributes(record), parse_price(record['price']))
+            counts[found] = counts.get(found, 0) + 1
+        for found, count in counts.items():
+            copies[found] = max(copies.get(found, 0), count)
+
+    prices_by_attributes = {}
+    for (attributes, price), count in copies.items():
+        prices_by_attributes.setdefault(attributes, []).extend([price] * count)
+
+    listings = {}
+    for attributes, prices in prices_by_attributes.items():
+        prices = sorted(prices, key=price_order)
+        copies_so_far = {}
+        for price, key in zip(prices, assign_keys(event_id, attributes, prices, previous or {})):
+            copy = copies_so_far.get(price, 0)
+            copies_so_far[price] = copy + 1
+            listings[(attributes, price, copy)] = {
+                'listing_key': key,
+                'event_id': event_id,
+                'section': attributes[0],
+                'row': attributes[1],
+                'listing_ref': attributes[2],
+                'ticket_count': None,
+                'price': price,
+            }
+
+    keys = []
+    for _, records in results:
+        seen = {}
+        quantity_keys = []
+        for record in records:
+            found = (listing_attributes(record), parse_price(record['price']))
+            copy = seen.get(found, 0)
+            seen[found] = copy + 1
+            listing = listings[found + (copy,)]
+            ticket_count = record.get('tickets') or parse_ticket_count(record.get('raw_name'))
+            if ticket_count is not None:
+                listing['ticket_count'] = ticket_count
+            quantity_keys.append(listing['listing_key'])
+        keys.append(quantity_keys)
+    return list(listings.values()), keys
+
+def record_snapshot(writer, event_id, listings, observed_at):
+    """
+    Queue the changes since the event's last scrape on the DatabaseWriter:
+    new and reappearing listings, price changes, and listings that are gone.
+    """
+    rows = [{**listing, 'observed_at': observed_at} for listing in listings]
+    # Every change is read against the listings as they were before this scrape
+    writer.write_many(record_changes_sql, rows)
+    writer.write_many(upsert_listing_sql, rows)
+    writer.write(record_disappeared_sql, (observed_at, event_id, observed_at))
+    writer.write(close_disappeared_sql, (event_id, observed_at))
+
+def touch_listings(writer, event_id, observed_at):
+    """The event was seen unchanged (tickets.py fingerprints): its listings are still there, at the same prices."""
+    writer.write(touch_listings_sql, (observed_at, event_id))
+
+def price_over_time(conn, event_id):
+    """(observed_at, listing_key, section, row, change, price) for every change of one event, oldest first."""
+    return conn.execute('''SELECT h.observed_at, h.listing_key, l.section, l.row, h.change, h.price
+                           FROM price_history h JOIN listings l ON l.listing_key = h.listing_key
+                           WHERE h.event_id = ? ORDER BY h.observed_at, l.section, l.row''', (event_id,)).fetchall()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Print the listing and price changes recorded for one event.")
+    parser.add_argument('event_id', help="The event's id (the number after /E- in its link)")
+    parser.add_argument('--database', default='events.db')
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.database)
+    for observed_at, key, section, row, change, price in price_over_time(conn, args.event_id):
+        when = datetime.datetime.fromtimestamp(observed_at).isoformat(sep=' ', timespec='seconds')
+        amount = f"{price:,.2f}" if price is not None else ""
+        print(f"{when}  {key[:8]}  section {section or '-':<8} row {row or '-':<4} {change:<11} {amount}")
+    conn.close()
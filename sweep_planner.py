@@ -0,0 +1,143 @@
+"""
+Plan the quantity pages tickets.py loads for an event.
+
+The grid at ?quantity=N shows the listings a buyer can take N tickets from,
+which depends on how each seller lets the listing be split (any way, in
+pairs, all together, ...). Neither the grid nor the JSON behind it reports
+those split options, and a listing only sold whole shows at no quantity but
+its own ticket count, so the result at one quantity cannot be proven from
+the others: every quantity from 1 to max_quantity is loaded. What the sweep
+saves is reading the same listing again: a listing already read at an
+earlier quantity (same text and price) keeps the zone and VIP status its
+dialog gave, so its dialog is not opened again.
+
+Given the fingerprint of the event's grid from its last scrape (the number
+of listings and a hash of their names and prices, as first loaded), the
+sweep stops after the first page load when the fingerprint is unchanged:
+no other quantity is loaded and no listing dialog is opened. Only the
+listings the grid renders on that first load count, so a change further
+down a long grid can wait for a later scrape.
+"""
+import hashlib
+import re
+import threading
+
+from instrumentation import get_logger
+
+logger = get_logger('sweep_planner')
+
+# "2 tickets", "1 ticket", "1 - 4 tickets"
+ticket_count_pattern = re.compile(r'(\d+)(?:\s*-\s*(\d+))?\s*tickets?\b', re.IGNORECASE)
+
+def parse_ticket_count(raw_ticket_name):
+    """Return the number of tickets a listing holds, or None if the name does not say."""
+    if not raw_ticket_name:
+        return None
+    match = ticket_count_pattern.search(raw_ticket_name)
+    if not match:
+        return None
+    return int(match.group(2) or match.group(1))
+
+def grid_fingerprint(listings):
+    """
+    "<count>:<hash>" of a grid's unsold listings, given as (raw name, price)
+    pairs; the same listings in any order give the same fingerprint.
+    """
+    pairs = sorted((str(name or '').strip(), str(price or '').strip()) for name, price in listings)
+    digest = hashlib.sha256(repr(pairs).encode('utf-8')).hexdigest()[:16]
+    return f"{len(pairs)}:{digest}"
+
+class FingerprintStats:
+    """Events whose first page was fingerprinted, how many had a stored fingerprint, and how many were unchanged."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.events = 0
+            self.compared = 0
+            self.unchanged = 0
+
+    def record(self, compared, unchanged):
+        with self.lock:
+            self.events += 1
+            self.compared += bool(compared)
+            self.unchanged += bool(unchanged)
+
+    def report(self):
+        with self.lock:
+            events, compared, unchanged = self.events, self.compared, self.unchanged
+        rate = unchanged / events * 100 if events else 0.0
+        logger.info("Fingerprints: %d of %d events unchanged and skipped (%.0f%% skip rate), %d without a stored fingerprint.",
+                    unchanged, events, rate, events - compared)
+
+fingerprint_stats = FingerprintStats()
+
+class QuantitySweep:
+    """
+    Drive the quantity loop for one event:
+
+        sweep = QuantitySweep(max_quantity)
+        while (quantity := sweep.next_quantity()) is not None:
+            sweep.observe(quantity, listings_loaded_at(quantity, sweep.known_details()))
+        for quantity, listings in sweep.results():
+            ...
+
+    Listings are dicts with at least 'raw_name' and 'price', plus 'zone' and
+    'is_vip' once read.
+    """
+
+    # Listings read at an earlier quantity are not read again
+    reuse_details = True
+
+    def __init__(self, max_quantity, known_fingerprint=None):
+        self.max_quantity = max_quantity
+        self.known_fingerprint = known_fingerprint
+        self.fingerprint = None
+        self.unchanged = False
+        self.loaded = {}
+
+    @property
+    def page_loads(self):
+        return len(self.loaded)
+
+    def check_fingerprint(self, fingerprint):
+        """
+        Record the fingerprint of the first page loaded. Returns True, and the
+        sweep ends, if it matches the fingerprint of the last scrape.
+        """
+        self.fingerprint = fingerprint
+        self.unchanged = self.known_fingerprint is not None and fingerprint == self.known_fingerprint
+        fingerprint_stats.record(self.known_fingerprint is not None, self.unchanged)
+        return self.unchanged
+
+    def next_quantity(self):
+        if self.unchanged:
+            return None
+        for quantity in range(1, self.max_quantity + 1):
+            if quantity not in self.loaded:
+                return quantity
+        return None
+
+    def observe(self, quantity, listings):
+        self.loaded[quantity] = list(listings)
+
+    def known_details(self):
+        """(zone, is_vip) of every listing read so far, by (raw name, price); None for a sweep that reads everything."""
+        if not self.reuse_details:
+            return None
+        return {(listing['raw_name'], listing['price']): (listing['zone'], listing['is_vip'])
+                for listings in self.loaded.values() for listing in listings if 'zone' in listing}
+
+    def results(self):
+        """(quantity, listings) for every quantity loaded, in order."""
+        for quantity in range(1, self.max_quantity + 1):
+            if quantity in self.loaded:
+                yield quantity, self.loaded[quantity]
+
+class NaiveSweep(QuantitySweep):
+    """Read every listing again at every quantity, as tickets.py did before the planner; the reference to compare against."""
+
+    reuse_details = False
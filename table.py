@@ -1,10 +1,20 @@
 import pandas as pd
+import argparse
+import datetime
+import json
+import os
 import sqlite3
+import time
+import uuid
+from urllib.parse import quote
 from openpyxl import Workbook
-from openpyxl.utils.dataframe import dataframe_to_rows
-from openpyxl.styles import Font, Alignment, PatternFill
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, Alignment, PatternFill, NamedStyle
 from openpyxl.utils import get_column_letter
 
+from event_dates import parse_event_date
+from ticket_names import parse_ticket_names, split_ticket_name
+
 def truncate_text(text, max_length):
     """Truncate a string and add ellipsis if it exceeds the max_length."""
     if isinstance(text, str) and len(text) > max_length:
@@ -15,59 +25,151 @@ def parse_ticket_name(ticket_name):
     """
     Parse the multi-line ticket_name into separate components:
     Section Number, Row Letter, and View Type.
-    Handles cases where words like 'tickets' are split across lines.
+    Row-by-row form of ticket_names.parse_ticket_names, kept for callers using DataFrame.apply.
     """
-    if not isinstance(ticket_name, str):
-        return pd.Series([None, None, None])
-    
-    # Split the ticket_name by newline characters and strip whitespace
-    lines = [line.strip() for line in ticket_name.split('\n') if line.strip()]
-    
-    section = None
-    row = None
-    view = None
-    
-    try:
-        # Iterate through lines to find Section, Row, and View
-        i = 0
-        while i < len(lines):
-            line = lines[i].lower()
-            if line == 'section':
-                if i + 1 < len(lines):
-                    section = lines[i + 1]
-                    i += 2
-                    continue
-            elif line == 'row':
-                if i + 1 < len(lines):
-                    row = lines[i + 1]
-                    i += 2
-                    continue
-            elif 'view' in line:
-                # Assume the entire line is the view type
-                view = lines[i]
-                i += 1
-                continue
-            else:
-                # Handle split words like '2 ticket' + 's together'
-                if 'ticket' in line and i + 1 < len(lines):
-                    # Combine the current line with the next line to form 'tickets'
-                    combined = line + lines[i + 1]
-                    # Since we don't need 'ticket_arrangement', we skip processing it
-                    i += 2
-                    continue
-            i += 1
-        
-        # Additional handling if 'View' is not explicitly labeled
-        if not view and len(lines) >= 5:
-            # Assume the last line is the view type
-            view = lines[-1]
-        
-    except Exception as e:
-        print(f"[DEBUG] Error parsing ticket_name '{ticket_name}': {e}")
-    
-    return pd.Series([section, row, view])
+    return pd.Series(list(split_ticket_name(ticket_name)))
+
+# Excel's sheet limit, header row included; longer tables continue on "Tickets (2)", ...
+max_sheet_rows = 1048576
+export_chunk_size = 10000
+
+# tickets columns holding the parsed ticket_name, exported as Section, Row and View
+stored_name_columns = ['ticket_section', 'ticket_row', 'ticket_view']
+
+header_style_name = "export_header"
+row_style_names = ("export_even_row", "export_odd_row")
+
+def add_export_styles(workbook):
+    """Register the header and alternating row styles once, as named styles shared by every cell."""
+    workbook.add_named_style(NamedStyle(name=header_style_name, font=Font(bold=True),
+                                        alignment=Alignment(horizontal="center", vertical="center", wrap_text=True)))
+    for name, color in zip(row_style_names, ("DDDDDD", "FFFFFF")):
+        workbook.add_named_style(NamedStyle(name=name, alignment=Alignment(wrap_text=True),
+                                            fill=PatternFill(start_color=color, end_color=color, fill_type="solid")))
+
+def truncate_series(series, max_length):
+    """Vectorized truncate_text for a column chunk."""
+    values = series.astype(object)
+    is_long = values.map(lambda value: isinstance(value, str) and len(value) > max_length)
+    if not is_long.any():
+        return values
+    values = values.copy()
+    values[is_long] = values[is_long].str[:max_length - 3] + "..."
+    return values
+
+def sql_column_widths(conn, table, columns, truncate_columns, max_length):
+    """
+    Widest value per column, computed by SQLite in one scan so the widths can
+    be set before any row is streamed out (write-only sheets emit them first).
+    """
+    if not columns:
+        return {}
+    expressions = ", ".join(f'MAX(LENGTH(CAST("{column}" AS TEXT)))' for column in columns)
+    lengths = conn.execute(f'SELECT {expressions} FROM "{table}"').fetchone()
+    widths = {}
+    for column, length in zip(columns, lengths):
+        length = length or 0
+        if truncate_columns and column in truncate_columns:
+            length = min(length, max_length)
+        widths[column] = length
+    return widths
+
+class SheetStream:
+    """
+    Append rows to a write-only sheet, starting a continuation sheet with the
+    same header and widths whenever the current one reaches max_sheet_rows.
+    """
+
+    def __init__(self, workbook, title, columns, widths):
+        self.workbook = workbook
+        self.title = title
+        self.columns = columns
+        self.widths = widths
+        self.sheets = 0
+        self.rows_in_sheet = 0
+        self.rows_written = 0
+        self._new_sheet()
+
+    def _new_sheet(self):
+        self.sheets += 1
+        title = self.title if self.sheets == 1 else f"{self.title} ({self.sheets})"
+        self.sheet = self.workbook.create_sheet(title=title)
+        for index, column in enumerate(self.columns, start=1):
+            # Width with a buffer; the header counts too
+            width = max(self.widths.get(column, 0), len(str(column)))
+            self.sheet.column_dimensions[get_column_letter(index)].width = width + 2
+        # Cells are written as soon as a row is appended, so one styled cell per
+        # column and parity can be refilled for every row
+        self.row_cells = [[WriteOnlyCell(self.sheet) for _ in self.columns] for _ in range(2)]
+        for cells, style in zip(self.row_cells, row_style_names):
+            for cell in cells:
+                cell.style = style
+        header = []
+        for column in self.columns:
+            cell = WriteOnlyCell(self.sheet, value=column)
+            cell.style = header_style_name
+            header.append(cell)
+        self.sheet.append(header)
+        self.rows_in_sheet = 1
 
-def export_to_excel_with_truncation(database_path, output_file, truncate_columns=None, max_length=30):
+    def append_rows(self, rows):
+        for row in rows:
+            if self.rows_in_sheet >= max_sheet_rows:
+                self._new_sheet()
+            # Even sheet rows are gray; the header is row 1, so the next row is rows_in_sheet + 1
+            cells = self.row_cells[(self.rows_in_sheet + 1) % 2]
+            for cell, value in zip(cells, row):
+                cell.value = value
+            self.sheet.append(cells)
+            self.rows_in_sheet += 1
+            self.rows_written += 1
+
+def chunk_rows(chunk):
+    """Rows of a DataFrame chunk as tuples of plain Python values, NaN as None."""
+    chunk = chunk.astype(object)
+    chunk = chunk.where(chunk.notna(), None)
+    return chunk.itertuples(index=False, name=None)
+
+def prepare_tickets_chunk(tickets_df, truncate_columns, max_length):
+    """Apply the tickets sheet transforms to one chunk; see export_to_excel_with_truncation."""
+    for column in ('title', 'unique_id'):
+        if column in tickets_df.columns:
+            tickets_df = tickets_df.drop(columns=[column])
+
+    # Section/Row/View are stored at insert time; only rows written before that are parsed here
+    if all(column in tickets_df.columns for column in stored_name_columns):
+        parts = tickets_df[stored_name_columns].astype(object)
+        parts.columns = ['Section', 'Row', 'View']
+        unparsed = parts.isna().all(axis=1)
+        if unparsed.any():
+            parts.loc[unparsed] = parse_ticket_names(tickets_df.loc[unparsed, 'ticket_name'])
+        tickets_df = tickets_df.drop(columns=stored_name_columns)
+    else:
+        parts = parse_ticket_names(tickets_df['ticket_name'])
+    tickets_df[['Section', 'Row', 'View']] = parts
+    tickets_df = tickets_df.drop(columns=['ticket_name'])
+
+    if 'is_vip' in tickets_df.columns:
+        tickets_df['is_vip'] = tickets_df['is_vip'].map({1: 'yes', 0: 'no'})
+    else:
+        tickets_df['is_vip'] = 'no'
+
+    # Section, Row, View, zone, is_vip, followed by other columns, with event_link last
+    desired_order = ['Section', 'Row', 'View', 'zone', 'is_vip']
+    other_columns = [col for col in tickets_df.columns if col not in desired_order]
+    if 'event_link' in other_columns:
+        other_columns.remove('event_link')
+        other_columns.append('event_link')
+    tickets_df = tickets_df[[col for col in desired_order if col in tickets_df.columns] + other_columns]
+
+    if truncate_columns:
+        for col in truncate_columns:
+            if col in tickets_df.columns:
+                tickets_df[col] = truncate_series(tickets_df[col], max_length)
+    return tickets_df
+
+def export_to_excel_with_truncation(database_path, output_file, truncate_columns=None, max_length=30,
+                                    chunk_size=export_chunk_size):
     """
     Export events and tickets data from SQLite database to an Excel file with styling.
     Truncate specified columns and add ellipses if the text exceeds max_length.
@@ -76,126 +178,62 @@ def export_to_excel_with_truncation(database_path, output_file, truncate_columns
     Splits 'ticket_name' into separate columns: Section, Row, and View.
     Includes column titles (headers) in the Excel sheets.
     Adds a 'VIP Status' column with values 'yes' or 'no'.
+
+    Tables are read chunk_size rows at a time and streamed through a write-only
+    workbook, so memory stays flat however large the tables are. A sheet that
+    reaches Excel's row limit continues on a numbered sheet.
     """
     # Connect to the SQLite database
     conn = sqlite3.connect(database_path)
     cursor = conn.cursor()
-    
-    # [MODIFICATION] Verify the presence of 'zone' column
-    tickets_columns = [description[0] for description in cursor.execute("PRAGMA table_info(tickets)").fetchall()]
+
+    tickets_columns = [description[1] for description in cursor.execute("PRAGMA table_info(tickets)").fetchall()]
     if 'zone' not in tickets_columns:
         print("[WARNING] 'zone' column not found in 'tickets' table. Please ensure it exists before exporting.")
-    
+    events_columns = [description[1] for description in cursor.execute("PRAGMA table_info(events)").fetchall()]
+
     try:
-        # Load data from events and tickets tables
-        events_df = pd.read_sql_query("SELECT * FROM events", conn)
-        tickets_df = pd.read_sql_query("SELECT * FROM tickets", conn)
-    
-        # [MODIFICATION] Remove 'title' column from events if it exists
-        if 'title' in events_df.columns:
-            events_df = events_df.drop(columns=['title'])
+        wb = Workbook(write_only=True)
+        add_export_styles(wb)
+
+        # Events sheet
+        if 'title' in events_columns:
+            events_columns.remove('title')
             print("[DEBUG] 'title' column removed from 'events' table.")
-    
-        # [MODIFICATION] Remove 'title' column from tickets if it exists
-        if 'title' in tickets_df.columns:
-            tickets_df = tickets_df.drop(columns=['title'])
-            print("[DEBUG] 'title' column removed from 'tickets' table.")
-    
-        # Remove 'unique_id' column from tickets if it exists
-        if 'unique_id' in tickets_df.columns:
-            tickets_df = tickets_df.drop(columns=['unique_id'])
-            print("[DEBUG] 'unique_id' column removed from 'tickets' table.")
-    
-        # [MODIFICATION] Parse 'ticket_name' into separate columns: Section, Row, View
-        tickets_df[['Section', 'Row', 'View']] = tickets_df['ticket_name'].apply(parse_ticket_name)
-        print("[DEBUG] 'ticket_name' parsed into 'Section', 'Row', and 'View' columns.")
-    
-        # [MODIFICATION] Drop the original 'ticket_name' column
-        tickets_df = tickets_df.drop(columns=['ticket_name'])
-        print("[DEBUG] 'ticket_name' column removed from 'tickets' table.")
-    
-        # [MODIFICATION] Map 'is_vip' to 'yes'/'no'
-        if 'is_vip' in tickets_df.columns:
-            tickets_df['is_vip'] = tickets_df['is_vip'].map({1: 'yes', 0: 'no'})
-            print("[DEBUG] 'is_vip' column mapped to 'yes'/'no'.")
-        else:
-            # If 'is_vip' column does not exist, add 'is_vip' as 'no' by default
-            tickets_df['is_vip'] = 'no'
-            print("[DEBUG] 'is_vip' column not found. Set all to 'no'.")
-    
-        # [MODIFICATION] Rearrange columns in 'tickets_df'
-        # Define the desired order: Section, Row, View, zone, is_vip, followed by other columns, with event_link last
-        desired_order = ['Section', 'Row', 'View', 'zone', 'is_vip']
-        other_columns = [col for col in tickets_df.columns if col not in desired_order]
-        # Ensure 'event_link' is last
-        if 'event_link' in other_columns:
-            other_columns.remove('event_link')
-            other_columns.append('event_link')
-        tickets_df = tickets_df[desired_order + other_columns]
-        print("[DEBUG] Columns in 'tickets' table rearranged.")
-    
-        # [MODIFICATION] Verify that 'ticket_name' has been removed
-        if 'ticket_name' in tickets_df.columns:
-            print("[ERROR] 'ticket_name' column still exists in 'tickets_df'. Please check the drop operation.")
-        else:
-            print("[DEBUG] 'ticket_name' column successfully removed from 'tickets_df'.")
-    
-        # Apply truncation if needed
-        if truncate_columns:
-            for col in truncate_columns:
+        events_widths = sql_column_widths(conn, "events", events_columns, truncate_columns, max_length)
+        events_sheet = SheetStream(wb, "Events", events_columns, events_widths)
+        select_events = "SELECT " + ", ".join(f'"{column}"' for column in events_columns) + " FROM events"
+        for events_df in pd.read_sql_query(select_events, conn, chunksize=chunk_size):
+            for col in truncate_columns or []:
                 if col in events_df.columns:
-                    events_df[col] = events_df[col].apply(lambda x: truncate_text(x, max_length))
-                    print(f"[DEBUG] Truncated column '{col}' in 'events' table.")
-                if col in tickets_df.columns:
-                    tickets_df[col] = tickets_df[col].apply(lambda x: truncate_text(x, max_length))
-                    print(f"[DEBUG] Truncated column '{col}' in 'tickets' table.")
-    
-        # [MODIFICATION] Print columns of tickets_df for verification
-        print(f"[DEBUG] Final columns in 'tickets_df': {tickets_df.columns.tolist()}")
-    
-        # Create a new Excel workbook
-        wb = Workbook()
-    
-        # Add the 'Events' sheet with headers
-        ws_events = wb.active
-        ws_events.title = "Events"
-        for row in dataframe_to_rows(events_df, index=False, header=True):  # [MODIFICATION] header=True
-            ws_events.append(row)
-        print("[DEBUG] 'Events' sheet populated with headers.")
-    
-        # Add the 'Tickets' sheet with headers
-        ws_tickets = wb.create_sheet(title="Tickets")
-        for row in dataframe_to_rows(tickets_df, index=False, header=True):  # [MODIFICATION] header=True
-            ws_tickets.append(row)
-        print("[DEBUG] 'Tickets' sheet populated with headers.")
-    
-        # Apply styling to both sheets
-        for sheet in [ws_events, ws_tickets]:
-            # Bold headers, center alignment, and wrap text
-            for cell in sheet[1]:  # First row contains headers
-                cell.font = Font(bold=True)
-                cell.alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
-    
-            # Alternating row colors and text wrapping
-            fill_gray = PatternFill(start_color="DDDDDD", end_color="DDDDDD", fill_type="solid")
-            fill_white = PatternFill(start_color="FFFFFF", end_color="FFFFFF", fill_type="solid")
-    
-            for i, row in enumerate(sheet.iter_rows(min_row=2, max_row=sheet.max_row,
-                                                    min_col=1, max_col=sheet.max_column), start=2):
-                fill = fill_gray if i % 2 == 0 else fill_white
-                for cell in row:
-                    cell.fill = fill
-                    cell.alignment = Alignment(wrap_text=True)
-    
-            # Auto-adjust column widths
-            for col in sheet.columns:
-                col_letter = get_column_letter(col[0].column)
-                # Calculate the maximum length of the column's data
-                max_len = max(len(str(cell.value)) if cell.value else 0 for cell in col)
-                # Set the column width with a buffer
-                sheet.column_dimensions[col_letter].width = max_len + 2
-        print("[DEBUG] Styling applied to both sheets.")
-    
+                    events_df[col] = truncate_series(events_df[col], max_length)
+            events_sheet.append_rows(chunk_rows(events_df))
+        print(f"[DEBUG] 'Events' sheet populated with {events_sheet.rows_written} rows on {events_sheet.sheets} sheet(s).")
+
+        # Tickets sheet; unique_id and title are never read
+        selected = [column for column in tickets_columns if column not in ('unique_id', 'title')]
+        select_tickets = "SELECT " + ", ".join(f'"{column}"' for column in selected) + " FROM tickets"
+        chunks = pd.read_sql_query(select_tickets, conn, chunksize=chunk_size)
+        first_chunk = prepare_tickets_chunk(next(chunks, pd.DataFrame(columns=selected)), truncate_columns, max_length)
+        print(f"[DEBUG] Final columns in 'tickets_df': {first_chunk.columns.tolist()}")
+
+        tickets_widths = sql_column_widths(conn, "tickets", [column for column in selected if column in first_chunk.columns],
+                                           truncate_columns, max_length)
+        if 'is_vip' in tickets_widths:
+            tickets_widths['is_vip'] = len('yes')
+        # Stored parts are measured by SQLite; rows parsed at export time are sampled from the first chunk
+        stored_widths = sql_column_widths(conn, "tickets", [column for column in stored_name_columns if column in selected],
+                                          None, max_length)
+        for column, stored_column in zip(('Section', 'Row', 'View'), stored_name_columns):
+            lengths = first_chunk[column].dropna().astype(str).str.len()
+            tickets_widths[column] = max(stored_widths.get(stored_column, 0), int(lengths.max()) if len(lengths) else 0)
+
+        tickets_sheet = SheetStream(wb, "Tickets", first_chunk.columns.tolist(), tickets_widths)
+        tickets_sheet.append_rows(chunk_rows(first_chunk))
+        for tickets_df in chunks:
+            tickets_sheet.append_rows(chunk_rows(prepare_tickets_chunk(tickets_df, truncate_columns, max_length)))
+        print(f"[DEBUG] 'Tickets' sheet populated with {tickets_sheet.rows_written} rows on {tickets_sheet.sheets} sheet(s).")
+
         # Save the workbook
         wb.save(output_file)
         print(f"Data successfully exported to {output_file} with truncation and no 'unique_id' or 'ticket_name' columns.")
@@ -205,11 +243,224 @@ def export_to_excel_with_truncation(database_path, output_file, truncate_columns
         conn.close()
         print("[DEBUG] Database connection closed.")
 
+# Partitioned dataset export: columns written by default, partition keys and column types
+dataset_event_columns = ['event_link', 'event_title', 'event_date', 'event_time', 'event_location']
+dataset_ticket_columns = ['ticket_section', 'ticket_row', 'ticket_view', 'ticket_price', 'quantity', 'zone', 'is_vip',
+                          'event_location', 'scraped_at', 'event_link']
+partition_columns = ['state', 'city', 'event_day']
+dataset_column_types = {'quantity': 'int64', 'is_vip': 'int64', 'scraped_at': 'float64'}
+watermark_file_name = "_watermark.json"
+# Tickets stored within this many seconds are left for the next run: the
+# writer may have written them in a transaction it has not committed yet
+settle_seconds = 60
+
+def partition_value(value):
+    """Directory-safe form of a partition key value."""
+    if value is None or (isinstance(value, float) and value != value) or str(value).strip() == "":
+        return "unknown"
+    return quote(str(value).strip(), safe=" -_.,'()&")
+
+def add_partition_columns(frame, day_cache, today):
+    """
+    Clean the partition keys. event_day is the stored ISO date; only rows
+    without one (databases migrations.py has not upgraded) parse the display
+    string, and what cannot be parsed is 'unknown'.
+    """
+    def event_day(event_date):
+        if event_date not in day_cache:
+            parsed = parse_event_date(event_date, today) if isinstance(event_date, str) else None
+            day_cache[event_date] = parsed.isoformat() if parsed else None
+        return day_cache[event_date]
+    missing = frame['event_day'].isna()
+    if missing.any():
+        frame.loc[missing, 'event_day'] = frame.loc[missing, '_event_date'].map(event_day)
+    frame['event_day'] = frame['event_day'].map(partition_value)
+    frame['state'] = frame['state'].map(partition_value)
+    frame['city'] = frame['city'].map(partition_value)
+    return frame
+
+class PartitionWriter:
+    """
+    Write rows that arrive grouped by partition, keeping one part file open at
+    a time. Every run writes new part files, so earlier exports are never rewritten.
+    """
+
+    def __init__(self, root, run_id, columns, file_format):
+        self.root = root
+        self.run_id = run_id
+        self.columns = columns
+        self.file_format = file_format
+        self.key = None
+        self.writer = None
+        self.path = None
+        self.files = 0
+        self.rows = 0
+        if file_format == 'parquet':
+            import pyarrow as pa
+            self.schema = pa.schema([(column, pa.from_numpy_dtype(dataset_column_types[column])
+                                      if column in dataset_column_types else pa.string()) for column in columns])
+
+    def _open(self, key):
+        self.close()
+        directory = os.path.join(self.root, *(f"{name}={value}" for name, value in zip(partition_columns, key)))
+        os.makedirs(directory, exist_ok=True)
+        self.key = key
+        self.files += 1
+        self.path = os.path.join(directory, f"part-{self.run_id}-{self.files:05d}.{self.file_format}")
+        if self.file_format == 'parquet':
+            import pyarrow.parquet as pq
+            self.writer = pq.ParquetWriter(self.path, self.schema)
+
+    def write(self, key, frame):
+        if key != self.key:
+            self._open(key)
+        # SQLite columns can mix types; text columns are written as strings, integers stay nullable
+        frame = frame[self.columns].astype({column: "Int64" if dataset_column_types.get(column) == 'int64'
+                                            else dataset_column_types.get(column, "string") for column in self.columns})
+        if self.file_format == 'parquet':
+            import pyarrow as pa
+            self.writer.write_table(pa.Table.from_pandas(frame, schema=self.schema, preserve_index=False))
+        else:
+            frame.to_csv(self.path, mode='a', header=not os.path.exists(self.path), index=False)
+        self.rows += len(frame)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.writer = None
+        self.key = None
+
+def read_watermark(output_dir):
+    path = os.path.join(output_dir, watermark_file_name)
+    if not os.path.exists(path):
+        return {'events_rowid': 0, 'tickets_stored_at': 0.0}
+    with open(path, encoding="utf-8") as f:
+        watermark = json.load(f)
+    # Watermarks from before stored_at: migrations.py dated the rows stored then by their scraped_at
+    watermark.setdefault('tickets_stored_at', watermark.pop('tickets_scraped_at', 0.0))
+    return watermark
+
+def write_watermark(output_dir, watermark):
+    # Written last and replaced atomically: a failed run leaves the old watermark and is redone next time
+    path = os.path.join(output_dir, watermark_file_name)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(watermark, f, indent=1)
+    os.replace(path + ".tmp", path)
+
+def export_partitioned_dataset(database_path, output_dir, file_format='parquet', event_columns=None,
+                               ticket_columns=None, chunk_size=export_chunk_size):
+    """
+    Append events and tickets added since the previous export to Parquet (or
+    CSV) datasets under output_dir/events and output_dir/tickets, partitioned
+    as state=.../city=.../event_day=.../part-<run>-<n>.<format>.
+
+    Only the requested columns are read (event_columns/ticket_columns, by
+    default dataset_event_columns/dataset_ticket_columns). The watermark in
+    output_dir/_watermark.json records the last events rowid and tickets
+    stored_at exported, so each run only reads rows written after that; a
+    rescraped listing is written again and exported with its new scraped_at.
+    stored_at follows commit order, so a slow scrape whose rows are written
+    long after their scraped_at is not skipped.
+    """
+    if file_format == 'parquet':
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            print("[ERROR] Parquet export needs pyarrow (pip install pyarrow); use file_format='csv' instead.")
+            return
+    os.makedirs(output_dir, exist_ok=True)
+    run_id = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    watermark = read_watermark(output_dir)
+    today = datetime.date.today()
+    day_cache = {}
+
+    conn = sqlite3.connect(database_path)
+    try:
+        existing_events = {row[1] for row in conn.execute("PRAGMA table_info(events)")}
+        existing_tickets = {row[1] for row in conn.execute("PRAGMA table_info(tickets)")}
+        event_columns = [c for c in (event_columns or dataset_event_columns) if c in existing_events and c not in partition_columns]
+        ticket_columns = [c for c in (ticket_columns or dataset_ticket_columns) if c in existing_tickets or c in stored_name_columns]
+        if 'scraped_at' not in existing_tickets:
+            print("[WARNING] 'scraped_at' column not found in 'tickets' table; tickets are not exported.")
+            ticket_columns = []
+
+        # Stored by migrations.py; older databases parse event_date instead, and are grouped by it
+        if 'event_day' in existing_events:
+            event_day, day_order = "e.event_day", "e.event_day"
+        else:
+            event_day, day_order = "NULL AS event_day", "e.event_date"
+
+        # Events: the table only ever grows, so its rowid is the watermark
+        max_rowid = conn.execute("SELECT COALESCE(MAX(rowid), 0) FROM events").fetchone()[0]
+        events_sql = (f"SELECT {', '.join(f'e.{c}' for c in event_columns)}, e.state, e.city, {event_day}, "
+                      f"e.event_date AS _event_date "
+                      f"FROM events e WHERE e.rowid > ? AND e.rowid <= ? ORDER BY e.state, e.city, {day_order}")
+        events_writer = PartitionWriter(os.path.join(output_dir, "events"), run_id, event_columns, file_format)
+        for frame in pd.read_sql_query(events_sql, conn, params=(watermark['events_rowid'], max_rowid), chunksize=chunk_size):
+            frame = add_partition_columns(frame, day_cache, today)
+            for key, group in frame.groupby(partition_columns, sort=False, dropna=False):
+                events_writer.write(key, group)
+        events_writer.close()
+        print(f"[DEBUG] Exported {events_writer.rows} new events to {events_writer.files} file(s).")
+
+        # Tickets: rows are replaced when rescraped, so the time they were stored is the watermark
+        tickets_writer = None
+        stored_at = "stored_at" if 'stored_at' in existing_tickets else "scraped_at"
+        cutoff = watermark['tickets_stored_at']
+        if ticket_columns:
+            cutoff = max(cutoff, time.time() - settle_seconds)
+            stored = [c for c in stored_name_columns if c in ticket_columns]
+            selected = [c for c in ticket_columns if c in existing_tickets]
+            if stored and 'ticket_name' not in selected:
+                selected.append('ticket_name')
+            if 'event_id' in existing_tickets and 'event_id' in existing_events:
+                # Through the event_id index; one events row per event even if it was found under two links
+                join = "e.rowid = (SELECT MIN(rowid) FROM events WHERE event_id = t.event_id)"
+            else:
+                # Tables from before event_id: tickets.event_link carries the quantity, the events row has quantity=1
+                join = "e.event_link = replace(t.event_link, 'quantity=' || t.quantity, 'quantity=1')"
+            tickets_sql = (f"SELECT {', '.join(f't.{c}' for c in selected)}, e.state, e.city, {event_day}, "
+                           f"e.event_date AS _event_date FROM tickets t LEFT JOIN events e ON {join} "
+                           f"WHERE t.{stored_at} > ? AND t.{stored_at} <= ? ORDER BY e.state, e.city, {day_order}")
+            tickets_writer = PartitionWriter(os.path.join(output_dir, "tickets"), run_id, ticket_columns, file_format)
+            for frame in pd.read_sql_query(tickets_sql, conn, params=(watermark['tickets_stored_at'], cutoff),
+                                           chunksize=chunk_size):
+                if stored:
+                    for column in stored_name_columns:
+                        if column not in frame.columns:
+                            frame[column] = None
+                    unparsed = frame[stored_name_columns].isna().all(axis=1)
+                    if unparsed.any():
+                        parsed = parse_ticket_names(frame.loc[unparsed, 'ticket_name'])
+                        frame.loc[unparsed, stored_name_columns] = parsed.values
+                frame = add_partition_columns(frame, day_cache, today)
+                for key, group in frame.groupby(partition_columns, sort=False, dropna=False):
+                    tickets_writer.write(key, group)
+            tickets_writer.close()
+            print(f"[DEBUG] Exported {tickets_writer.rows} new tickets to {tickets_writer.files} file(s).")
+
+        write_watermark(output_dir, {'events_rowid': max_rowid, 'tickets_stored_at': cutoff,
+                                     'exported_at': time.time(), 'run_id': run_id})
+        print(f"Data successfully exported to {output_dir} ({file_format}).")
+    except Exception as e:
+        print(f"Error exporting data: {e}")
+    finally:
+        conn.close()
+        print("[DEBUG] Database connection closed.")
+
 # Example usage
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export events.db to a styled Excel workbook or a partitioned dataset.")
+    parser.add_argument('--format', choices=['excel', 'parquet', 'csv'], default='excel')
+    parser.add_argument('--output', help="Excel file, or dataset directory for parquet/csv")
+    args = parser.parse_args()
+
     database_path = "events.db"
-    output_file = "styled_event_ticket_data_truncated.xlsx"
-    truncate_columns = ["zone"]  # [MODIFICATION] Updated columns to truncate
-    max_length = 40  # Maximum length for truncated columns
+    if args.format == 'excel':
+        output_file = args.output or "styled_event_ticket_data_truncated.xlsx"
+        truncate_columns = ["zone"]  # [MODIFICATION] Updated columns to truncate
+        max_length = 40  # Maximum length for truncated columns
 
-    export_to_excel_with_truncation(database_path, output_file, truncate_columns, max_length)
+        export_to_excel_with_truncation(database_path, output_file, truncate_columns, max_length)
+    else:
+        export_partitioned_dataset(database_path, args.output or "events_dataset", args.format)
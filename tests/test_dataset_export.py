@@ -0,0 +1,73 @@
+"""
+The partitioned dataset export's watermark and partitions.
+
+    python -m pytest tests
+"""
+import glob
+import os
+import sqlite3
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import main as crawler
+import table
+import tickets
+from db_writer import DatabaseWriter
+
+event_link = "https://www.viagogo.com/Sports-Tickets/Colorado-Mammoth/E-150000001?quantity=1"
+
+class DatasetExportTest(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.path = os.path.join(directory, "events.db")
+        self.output_dir = os.path.join(directory, "dataset")
+        conn = sqlite3.connect(self.path)
+        crawler.setup_database(conn)
+        tickets.setup_tickets_table(conn)
+        conn.execute('''INSERT INTO events (event_link, event_title, event_date, state, city, event_id, event_day)
+                        VALUES (?, 'Colorado Mammoth', 'Sat, Nov 14', 'CO', 'Denver', '150000001', '2026-11-14')''',
+                     (event_link,))
+        conn.commit()
+        conn.close()
+
+    def store_ticket(self, unique_id, scraped_at, link=event_link.replace("quantity=1", "quantity=2")):
+        writer = DatabaseWriter(self.path)
+        writer.write(tickets.insert_ticket_sql,
+                     ("Section 118\nRow 12\n2 tickets", "$70", link, 2,
+                      unique_id, "Ball Arena", "Lower Level", 0, scraped_at, "118", "12", "", "150000001"))
+        writer.close()
+
+    def export(self):
+        with mock.patch.object(table, 'settle_seconds', 0):
+            table.export_partitioned_dataset(self.path, self.output_dir, 'csv')
+        files = glob.glob(os.path.join(self.output_dir, "tickets", "**", "*.csv"), recursive=True)
+        return sorted(os.path.relpath(os.path.dirname(path), self.output_dir) for path in files)
+
+    def test_late_commit_is_exported(self):
+        scrape_started = time.time() - 3600
+        self.store_ticket("first", scrape_started)
+        self.assertEqual(len(self.export()), 1)
+        # A slower scrape that started earlier stores its rows after the export
+        self.store_ticket("late", scrape_started - 60)
+        self.assertEqual(len(self.export()), 2)
+        self.assertEqual(len(self.export()), 2)
+
+    def test_partition_uses_stored_event_day(self):
+        # Not parsed again: the display string alone would give 'unknown'
+        conn = sqlite3.connect(self.path)
+        conn.execute("UPDATE events SET event_date = 'Date to be announced'")
+        conn.commit()
+        conn.close()
+        self.store_ticket("first", time.time())
+        self.assertEqual(self.export(), [os.path.join("tickets", "state=CO", "city=Denver", "event_day=2026-11-14")])
+
+    def test_tickets_join_their_event_by_id(self):
+        # Not the events row's link with quantity=1: another parameter comes first
+        self.store_ticket("first", time.time(), event_link.replace("?quantity=1", "?utm_source=feed&quantity=2"))
+        self.assertEqual(self.export(), [os.path.join("tickets", "state=CO", "city=Denver", "event_day=2026-11-14")])
+
+if __name__ == "__main__":
+    unittest.main()
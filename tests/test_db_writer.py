@@ -0,0 +1,74 @@
+"""
+DatabaseWriter failures reach the thread whose rows were lost.
+
+    python -m pytest tests
+"""
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+
+from db_writer import DatabaseWriteError, DatabaseWriter
+
+insert_sql = 'INSERT INTO cities (name) VALUES (?)'
+
+class DatabaseWriterTest(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.path = os.path.join(directory, "events.db")
+        conn = sqlite3.connect(self.path)
+        conn.execute('CREATE TABLE cities (name TEXT NOT NULL)')
+        conn.close()
+        self.writer = DatabaseWriter(self.path)
+
+    def names(self):
+        conn = sqlite3.connect(self.path)
+        names = sorted(row[0] for row in conn.execute('SELECT name FROM cities'))
+        conn.close()
+        return names
+
+    def run_thread(self, target):
+        outcome = {}
+
+        def run():
+            try:
+                target()
+            except DatabaseWriteError as e:
+                outcome['error'] = e
+
+        thread = threading.Thread(target=run)
+        thread.start()
+        thread.join()
+        return outcome.get('error')
+
+    def test_failure_goes_to_the_thread_that_lost_rows(self):
+        # The bad row is in the same batch as the good thread's rows
+        self.writer.write(insert_sql, ("Denver",), owner='good')
+        self.writer.write(insert_sql, (None,), owner='bad')
+        self.writer.write(insert_sql, ("Boulder",), owner='good')
+        self.assertIsNone(self.run_thread(lambda: self.writer.flush('good')))
+        self.assertIsInstance(self.run_thread(lambda: self.writer.flush('bad')), DatabaseWriteError)
+        # Reported once
+        self.writer.flush('bad')
+        self.writer.close()
+        self.assertEqual(self.names(), ["Boulder", "Denver"])
+
+    def test_rows_are_owned_by_the_writing_thread(self):
+        def lose_a_row():
+            self.writer.write(insert_sql, (None,))
+            self.writer.flush()
+
+        self.writer.write(insert_sql, ("Denver",))
+        self.assertIsInstance(self.run_thread(lose_a_row), DatabaseWriteError)
+        self.writer.flush()
+        self.writer.close()
+
+    def test_close_raises_unclaimed_failures(self):
+        self.writer.write(insert_sql, (None,), owner='worker-1')
+        with self.assertRaises(DatabaseWriteError):
+            self.writer.close()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,43 @@
+"""
+migrate() runs each step once and keeps the indexes in place.
+
+    python -m pytest tests
+"""
+import sqlite3
+import unittest
+
+import migrations
+import tickets
+
+class MigrateTest(unittest.TestCase):
+
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:")
+        self.conn.execute("CREATE TABLE events (event_link TEXT UNIQUE, event_title TEXT, event_date TEXT, "
+                          "event_time TEXT, event_location TEXT, state TEXT, city TEXT)")
+
+    def tearDown(self):
+        self.conn.close()
+
+    def indexes(self):
+        return {row[0] for row in self.conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+
+    def test_only_steps_past_user_version_run(self):
+        first = migrations.migrate(self.conn)
+        self.assertEqual(list(first), [description for description, _ in migrations.migrations])
+        self.assertEqual(self.conn.execute("PRAGMA user_version").fetchone()[0], len(migrations.migrations))
+        self.assertEqual(migrations.migrate(self.conn), {})
+
+    def test_databases_from_before_new_steps_run_those_only(self):
+        self.conn.execute("PRAGMA user_version = 4")
+        changes = migrations.migrate(self.conn)
+        self.assertEqual(list(changes)[:2], [description for description, _ in migrations.migrations[4:]])
+
+    def test_recreated_tickets_table_gets_its_indexes_back(self):
+        tickets.setup_tickets_table(self.conn)
+        self.assertIn('idx_tickets_event_id', self.indexes())
+        tickets.setup_tickets_table(self.conn, drop=True)
+        self.assertIn('idx_tickets_event_id', self.indexes())
+
+if __name__ == "__main__":
+    unittest.main()
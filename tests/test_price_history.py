@@ -0,0 +1,81 @@
+"""
+Listing identity across scrapes of one event.
+
+    python -m pytest tests
+"""
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from db_writer import DatabaseWriter
+from price_history import PreviousListings, identify_listings, record_snapshot, setup_price_history_tables
+
+event_id = '150000001'
+
+def record(price, section='118', row='12'):
+    name = f"Section {section}\nRow {row}\n2 tickets"
+    return {'ticket_name': name, 'raw_name': name, 'price': f"${price}"}
+
+class ListingIdentityTest(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.path = os.path.join(directory, "events.db")
+        conn = sqlite3.connect(self.path)
+        setup_price_history_tables(conn)
+        conn.close()
+        self.previous = PreviousListings()
+        self.previous.configure(self.path)
+        self.observed_at = 0
+
+    def tearDown(self):
+        self.previous.close()
+
+    def scrape(self, *prices):
+        """Identify and record one scrape of the event; returns {price: listing_key}."""
+        self.observed_at += 60
+        results = [(2, [record(price) for price in prices])]
+        listings, keys = identify_listings(event_id, results, self.previous.load(event_id))
+        writer = DatabaseWriter(self.path)
+        record_snapshot(writer, event_id, listings, self.observed_at)
+        writer.close()
+        return dict(zip(prices, keys[0]))
+
+    def changes(self):
+        conn = sqlite3.connect(self.path)
+        rows = conn.execute('SELECT change, price FROM price_history WHERE observed_at = ? ORDER BY price',
+                            (self.observed_at,)).fetchall()
+        conn.close()
+        return rows
+
+    def test_price_change_keeps_other_listings(self):
+        first = self.scrape(100, 150, 200)
+        # The cheapest listing now costs more than the others: their price rank changes, their keys must not
+        second = self.scrape(250, 150, 200)
+        self.assertEqual(second[150], first[150])
+        self.assertEqual(second[200], first[200])
+        self.assertEqual(second[250], first[100])
+        self.assertEqual(self.changes(), [('price', 250.0)])
+
+    def test_new_and_gone_listings(self):
+        first = self.scrape(100, 150)
+        second = self.scrape(150, 120, 180)
+        self.assertEqual(second[150], first[150])
+        self.assertEqual(second[120], first[100])
+        self.assertNotIn(second[180], first.values())
+        self.assertEqual(self.changes(), [('price', 120.0), ('appeared', 180.0)])
+
+    def test_unchanged_scrape_records_nothing(self):
+        first = self.scrape(100, 150)
+        self.assertEqual(self.scrape(150, 100), first)
+        self.assertEqual(self.changes(), [])
+
+    def test_price_order_without_previous_listings(self):
+        results = [(2, [record(200), record(100)])]
+        _, keys = identify_listings(event_id, results)
+        _, again = identify_listings(event_id, [(2, [record(100), record(200)])])
+        self.assertEqual(keys[0], list(reversed(again[0])))
+
+if __name__ == "__main__":
+    unittest.main()
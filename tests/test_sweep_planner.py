@@ -0,0 +1,170 @@
+"""
+The quantity sweep against the saved event page, without a browser.
+
+FixtureEventPage stands in for Chrome on benchmarks/fixtures/event_page.html:
+it shows the listings from the page's listing-data at each ?quantity= the
+way the page's script does (any split, pairs only, or the whole lot only)
+and answers the scripts, XPaths and clicks tickets.scrape_event uses.
+
+    python -m pytest tests
+"""
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import unittest
+from urllib.parse import parse_qs, urlparse
+
+from selenium.common.exceptions import NoSuchElementException
+
+import tickets
+from benchmarks.common import FIXTURES_DIR
+from db_writer import DatabaseWriter
+from sweep_planner import NaiveSweep, QuantitySweep
+
+event_link = "https://www.viagogo.com/Sports-Tickets/Colorado-Mammoth/E-150000001?quantity=1"
+
+def fixture_listings():
+    html = (FIXTURES_DIR / "event_page.html").read_text(encoding="utf-8")
+    data = re.search(r'<script id="listing-data" type="application/json">(.*?)</script>', html, re.S).group(1)
+    return json.loads(data)
+
+def ticket_count(name):
+    match = re.search(r'(\d+) tickets?', name)
+    return int(match.group(1)) if match else 0
+
+def allows(listing, quantity):
+    """The page script's filter."""
+    count = ticket_count(listing['name'])
+    if quantity > count:
+        return False
+    if listing['splits'] == 'whole':
+        return quantity == count
+    return quantity % 2 == 0 if listing['splits'] == 'pairs' else True
+
+class FixtureElement:
+    def __init__(self, page, text='', listing=None, on_click=None):
+        self.page = page
+        self.text = text
+        self.listing = listing
+        self.on_click = on_click
+
+    def is_displayed(self):
+        return True
+
+    def is_enabled(self):
+        return True
+
+    def click(self):
+        if self.on_click:
+            self.on_click()
+
+class FixtureEventPage:
+    """Just enough of a WebDriver for tickets.scrape_event on the fixture event page."""
+
+    def __init__(self, listings):
+        self.listings = listings
+        self.containers = []
+        self.modal = None
+        self.page_loads = 0
+        self.dialogs = 0
+
+    def get(self, url):
+        quantity = int(parse_qs(urlparse(url).query)['quantity'][0])
+        self.page_loads += 1
+        self.modal = None
+        self.containers = [FixtureElement(self, listing=listing, on_click=lambda listing=listing: self.open(listing))
+                           for listing in self.listings if allows(listing, quantity)]
+
+    def open(self, listing):
+        self.dialogs += 1
+        self.modal = listing
+
+    def close(self):
+        self.modal = None
+
+    def find_element(self, by, xpath):
+        if xpath == tickets.event_location_xpath:
+            return FixtureElement(self, "Ball Arena, Denver, CO")
+        if self.modal is not None:
+            if xpath == tickets.zone_xpath:
+                return FixtureElement(self, self.modal['zone'])
+            if xpath == tickets.vip_status_xpath:
+                return FixtureElement(self, 'VIP access included' if self.modal['vip'] else 'Standard entry')
+            if xpath == tickets.close_dialog_xpath:
+                return FixtureElement(self, on_click=self.close)
+        raise NoSuchElementException(xpath)
+
+    def execute_script(self, script, *args):
+        if script == tickets.extract_listings_script:
+            return [{'element': container, 'index': index, 'sold': bool(container.listing.get('sold')),
+                     'name': container.listing['name'], 'price': container.listing['price']}
+                    for index, container in enumerate(self.containers, start=1)]
+        if script == tickets.remove_listings_script:
+            self.containers = [container for container in self.containers if container not in args[0]]
+            return None
+        raise AssertionError("unexpected script")
+
+    def set_script_timeout(self, seconds):
+        pass
+
+    def execute_async_script(self, script, *args):
+        if len(args) == 2:  # wait_for_any([no tickets, listing], timeout)
+            return 1 if self.containers else 0
+        return True  # wait_for_dom_quiet
+
+class QuantitySweepTest(unittest.TestCase):
+
+    def scrape(self, sweep_class, listings=None):
+        directory = tempfile.mkdtemp()
+        path = os.path.join(directory, "tickets.db")
+        conn = sqlite3.connect(path)
+        tickets.setup_tickets_table(conn)
+        writer = DatabaseWriter(path)
+        driver = FixtureEventPage(listings or fixture_listings())
+        sweeps = []
+
+        def recording_sweep(*args):
+            sweeps.append(sweep_class(*args))
+            return sweeps[-1]
+
+        tickets.scrape_event(driver, writer, event_link, sweep_class=recording_sweep)
+        writer.close()
+        rows = conn.execute('''SELECT ticket_name, ticket_price, event_link, quantity, event_location, zone, is_vip, unique_id
+                               FROM tickets ORDER BY quantity, ticket_name, ticket_price''').fetchall()
+        conn.close()
+        return rows, driver, sweeps[0]
+
+    def test_same_rows_as_naive_sweep(self):
+        naive_rows, naive_driver, _ = self.scrape(NaiveSweep)
+        rows, driver, _ = self.scrape(QuantitySweep)
+        self.assertTrue(naive_rows)
+        self.assertEqual(rows, naive_rows)
+        self.assertEqual(driver.page_loads, naive_driver.page_loads)
+
+    def test_listing_sold_whole_is_not_missed(self):
+        # Shown at 3 only: no other quantity's page gives it away
+        listings = [listing for listing in fixture_listings() if listing['splits'] != 'pairs']
+        naive_rows, _, _ = self.scrape(NaiveSweep, listings)
+        rows, _, _ = self.scrape(QuantitySweep, listings)
+        self.assertEqual(rows, naive_rows)
+
+    def test_quantities_follow_each_listings_split(self):
+        rows, _, _ = self.scrape(QuantitySweep)
+        quantities = {}
+        for name, _, _, quantity, *_ in rows:
+            quantities.setdefault(name.split("\n")[1].split()[0], []).append(quantity)
+        self.assertEqual(quantities['150'], [2, 4])  # Pairs only
+        self.assertEqual(quantities['160'], [3])  # The whole lot only
+        self.assertEqual(quantities['118'], [1, 2, 3, 4, 5])
+
+    def test_each_listing_dialog_opened_once(self):
+        _, naive_driver, _ = self.scrape(NaiveSweep)
+        rows, driver, _ = self.scrape(QuantitySweep)
+        self.assertEqual(naive_driver.dialogs, len(rows))
+        self.assertEqual(driver.dialogs, len({(name, price) for name, price, *_ in rows}))
+        self.assertLess(driver.dialogs, naive_driver.dialogs)
+
+if __name__ == "__main__":
+    unittest.main()
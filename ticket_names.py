@@ -0,0 +1,115 @@
+"""
+Split a stored ticket_name into its Section, Row and View parts.
+
+tickets.py stores the listing text with a newline after "Section", "Row" and
+"ticket" (see normalize_ticket_name), e.g.
+
+    Section
+    101
+    Row
+    A
+    2 ticket
+    s together
+    Clear view
+
+split_ticket_name is the line-by-line parser table.py has always used.
+parse_ticket_names gives the same answers for a whole column at once: names
+in the usual shape are matched by one regex with Series.str.extract, and
+only the irregular ones go through split_ticket_name.
+"""
+
+# Whitespace around line breaks and blank lines, removed before matching
+line_break_pattern = r'[^\S\n]*\n\s*'
+
+# The usual shape, once lines are stripped: Section, its value, optionally Row
+# and its value, a "... ticket" line (not a view) and the line it was split
+# from, then at most one more line. ASCII-only case folding so that every
+# match is one the line parser would read the same way.
+ticket_name_pattern = (
+    r'(?ai)^section\n(?P<section>[^\n]+)'
+    r'(?:\nrow\n(?P<row>[^\n]+))?'
+    r'\n(?!(?:[^\n]*view))[^\n]*ticket[^\n]*'
+    r'\n(?P<split>[^\n]+)'
+    r'(?:\n(?P<last>[^\n]+))?$'
+)
+
+def split_ticket_name(ticket_name):
+    """
+    Parse the multi-line ticket_name into separate components:
+    Section Number, Row Letter, and View Type.
+    Handles cases where words like 'tickets' are split across lines.
+    Returns a (section, row, view) tuple; parts that are not found are None.
+    """
+    if not isinstance(ticket_name, str):
+        return None, None, None
+
+    # Split the ticket_name by newline characters and strip whitespace
+    lines = [line.strip() for line in ticket_name.split('\n') if line.strip()]
+
+    section = None
+    row = None
+    view = None
+
+    try:
+        # Iterate through lines to find Section, Row, and View
+        i = 0
+        while i < len(lines):
+            line = lines[i].lower()
+            if line == 'section':
+                if i + 1 < len(lines):
+                    section = lines[i + 1]
+                    i += 2
+                    continue
+            elif line == 'row':
+                if i + 1 < len(lines):
+                    row = lines[i + 1]
+                    i += 2
+                    continue
+            elif 'view' in line:
+                # Assume the entire line is the view type
+                view = lines[i]
+                i += 1
+                continue
+            else:
+                # Handle split words like '2 ticket' + 's together'; the second half is skipped
+                if 'ticket' in line and i + 1 < len(lines):
+                    i += 2
+                    continue
+            i += 1
+
+        # Additional handling if 'View' is not explicitly labeled
+        if not view and len(lines) >= 5:
+            # Assume the last line is the view type
+            view = lines[-1]
+
+    except Exception as e:
+        print(f"[DEBUG] Error parsing ticket_name '{ticket_name}': {e}")
+
+    return section, row, view
+
+def parse_ticket_names(ticket_names):
+    """
+    Vectorized split_ticket_name for a pandas Series of ticket names.
+    Returns a DataFrame with Section, Row and View columns on the same index.
+    """
+    cleaned = ticket_names.where(ticket_names.map(lambda name: isinstance(name, str)))
+    cleaned = cleaned.str.replace(line_break_pattern, '\n', regex=True).str.strip()
+    parts = cleaned.str.extract(ticket_name_pattern).astype(object)
+
+    # With no explicit view line, the parser takes the last line as the view
+    # once there are five or more lines, and that is the split line when
+    # nothing follows it
+    line_count = 4 + parts['row'].notna() * 2 + parts['last'].notna()
+    view = parts['last'].where(parts['last'].notna(), parts['split'].where(line_count >= 5))
+
+    parsed = parts[['section', 'row']].assign(view=view)
+    parsed.columns = ['Section', 'Row', 'View']
+    parsed = parsed.astype(object).where(parsed.notna(), None)
+
+    # Names outside the usual shape (and non-strings) go through the line parser
+    irregular = parts['section'].isna()
+    if irregular.any():
+        parsed.loc[irregular, ['Section', 'Row', 'View']] = [
+            list(split_ticket_name(name)) for name in ticket_names[irregular]
+        ]
+    return parsed
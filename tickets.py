@@ -1,7 +1,4 @@
-from selenium import webdriver
 from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import (
@@ -12,53 +9,34 @@ from selenium.common.exceptions import (
     ElementNotInteractableException
 )
 from urllib.parse import urlparse, parse_qs, urlencode, urlunparse
+import argparse
+import datetime
+import multiprocessing
+import os
+import queue
 import sqlite3
 import time
 import hashlib
 
-def update_query_param(url, key, value):
-    print(f"[DEBUG] Updating query parameter '{key}' to '{value}' in URL: {url}")
-    url_parts = urlparse(url)
-    query_params = parse_qs(url_parts.query)
-    query_params[key] = [str(value)]
-    updated_query = urlencode(query_params, doseq=True)
-    updated_url_parts = url_parts._replace(query=updated_query)
-    new_url = urlunparse(updated_url_parts)
-    print(f"[DEBUG] Updated URL: {new_url}")
-    return new_url
-
-print("[DEBUG] Setting up Selenium WebDriver.")
-chrome_options = Options()
-chrome_options.add_argument("--no-sandbox")
-chrome_options.add_argument("--disable-dev-shm-usage")
-chrome_options.add_argument("--lang=en")
-service = Service()
-
-driver = webdriver.Chrome(service=service, options=chrome_options)
-print("[DEBUG] Selenium WebDriver initialized.")
-
-print("[DEBUG] Connecting to SQLite database 'events.db'.")
-conn = sqlite3.connect('events.db')
-cursor = conn.cursor()
-
-# [MODIFICATION] Drop the existing tickets table if it exists
-cursor.execute("DROP TABLE IF EXISTS tickets")
-
-# [MODIFICATION] Ensure tickets table has event_location, zone, and is_vip columns
-print("[DEBUG] Ensuring tickets table exists with required schema including event_location, zone, and is_vip.")
-cursor.execute('''
-    CREATE TABLE IF NOT EXISTS tickets (
-        ticket_name TEXT,
-        ticket_price REAL,
-        event_link TEXT,
-        quantity INTEGER,
-        unique_id TEXT UNIQUE,
-        event_location TEXT,
-        zone TEXT,
-        is_vip INTEGER,  -- 1 for VIP, 0 for Non-VIP
-        FOREIGN KEY (event_link) REFERENCES events (event_link)
-    )
-''')
+from event_dates import parse_event_date
+from migrations import add_missing_columns, canonical_event_id, migrate
+from price_history import (identify_listings, previous_listings, record_snapshot, setup_price_history_tables,
+                           touch_listings)
+from sweep_planner import QuantitySweep, fingerprint_stats, grid_fingerprint
+from ticket_names import split_ticket_name
+from network_capture import parse_listing_payload
+from zone_cache import ZoneCache
+import browser
+import driver_manager
+import instrumentation
+import pacing
+import page_archive
+import work_queue
+from db_writer import DatabaseWriteError, DatabaseWriter, QueueWriter, configure_connection
+from driver_manager import is_session_dead_error
+from instrumentation import get_logger, tracer
+from page_archive import archive
+from waits import AdaptiveTimeout, resolve_timeout, wait_for_any, wait_for_dom_quiet, wait_stats
 
 no_tickets_xpath = '//*[@id="stubhub-event-detail-listings-grid"]/div[1]/div/div/div[2]/span'
 event_location_xpath = '//*[@id="event-detail-header"]/div/div/div[1]/div[2]/div/div/div[2]/button'
@@ -73,192 +51,938 @@ vip_status_xpath = '//*[@id="selected-buyer-listing"]/div[2]/div[5]/div/div[2]/d
 # Updated XPath to target the SVG parent instead of the path
 close_dialog_xpath = '//*[@id="modal-root"]/div/div/div'
 
+database_path = 'events.db'
+
+logger = get_logger('tickets')
+
+# Chrome options for the browser this script starts (see browser.py); set from --browser-profile
+browser_profile = browser.profiles['performance']
+
+# A listing seen again replaces its old row, which refreshes scraped_at. stored_at is
+# the time the writer stores the row, so it follows commit order (table.py exports by it)
+insert_ticket_sql = '''INSERT OR REPLACE INTO tickets (ticket_name, ticket_price, event_link, quantity, unique_id, event_location, zone, is_vip, scraped_at,
+                                                   ticket_section, ticket_row, ticket_view, event_id, stored_at)
+                       VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, (julianday('now') - 2440587.5) * 86400.0)'''
+
+# A successful scrape also clears the failure count; the fingerprint is kept, scrape_event writes it
+record_scrape_sql = '''INSERT INTO event_scrape_state (event_link, last_scraped, listing_count, volatility) VALUES (?, ?, ?, ?)
+                       ON CONFLICT (event_link) DO UPDATE SET last_scraped = excluded.last_scraped,
+                           listing_count = excluded.listing_count, volatility = excluded.volatility,
+                           failures = 0, retry_after = NULL'''
+
+# The grid fingerprint of the event's first page load and when the grid was last seen
+record_fingerprint_sql = '''INSERT INTO event_scrape_state (event_link, fingerprint, last_seen) VALUES (?, ?, ?)
+                            ON CONFLICT (event_link) DO UPDATE SET fingerprint = excluded.fingerprint,
+                                last_seen = excluded.last_seen, failures = 0, retry_after = NULL'''
+
+# A failed event is not planned again before retry_after; a successful scrape resets both columns
+record_failure_sql = '''INSERT INTO event_scrape_state (event_link, failures, retry_after) VALUES (?, 1, ?)
+                        ON CONFLICT (event_link) DO UPDATE SET failures = failures + 1, retry_after = excluded.retry_after'''
+
+# Columns added to event_scrape_state after it was first created
+scrape_state_columns = [
+    ('failures', 'INTEGER DEFAULT 0'),
+    ('retry_after', 'REAL'),
+    ('fingerprint', 'TEXT'),
+    ('last_seen', 'REAL'),
+]
+
+# Columns tickets.py needs, in case the table was created with an older schema
+ticket_columns = [
+    ('quantity', 'INTEGER'),
+    ('unique_id', 'TEXT'),
+    ('event_location', 'TEXT'),
+    ('zone', 'TEXT'),
+    ('is_vip', 'INTEGER'),
+    ('scraped_at', 'REAL'),
+    ('ticket_section', 'TEXT'),
+    ('ticket_row', 'TEXT'),
+    ('ticket_view', 'TEXT'),
+    ('event_id', 'TEXT'),
+    ('stored_at', 'REAL'),
+]
+
+# Incremental scheduling: events with no parseable date are treated as this many days out
+unknown_date_days = 30
+# Weight of the latest listing-count change in the volatility average
+volatility_smoothing = 0.5
+
 max_quantity = 5
-print(f"[DEBUG] max_quantity set to {max_quantity}")
+listings_grid_selector = '#listings-container'
+# Waits tune themselves from observed latencies, within these bounds
+listings_timeout = AdaptiveTimeout("listings", initial=10, minimum=2, maximum=30)
+# Seconds to keep polling for prices that have not rendered yet
+price_timeout = 5
+price_poll_interval = 0.25
+
+# Reads every listing container in one WebDriver call. Each entry carries the
+# container element itself so the listing can still be clicked for its modal.
+extract_listings_script = """
+    const containerXPath = arguments[0];
+    const nameXPath = arguments[1];
+    const priceXPath = arguments[2];
+    const first = (node, xpath) => document.evaluate(
+        xpath, node, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+    const text = (node, xpath) => {
+        const el = first(node, xpath);
+        return el ? el.innerText : null;
+    };
+    const snapshot = document.evaluate(
+        containerXPath, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+    const listings = [];
+    for (let i = 0; i < snapshot.snapshotLength; i++) {
+        const container = snapshot.snapshotItem(i);
+        const containerText = container.innerText || '';
+        listings.push({
+            element: container,
+            index: i + 1,
+            sold: containerText.toLowerCase().includes('sold'),
+            name: text(container, nameXPath),
+            price: text(container, priceXPath)
+        });
+    }
+    return listings;
+"""
+
+read_prices_script = """
+    const priceXPath = arguments[1];
+    return arguments[0].map(container => {
+        const el = document.evaluate(
+            priceXPath, container, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+        return el ? el.innerText : null;
+    });
+"""
+
+remove_listings_script = """
+    arguments[0].forEach(container => container.remove());
+"""
+
+def update_query_param(url, key, value):
+    url_parts = urlparse(url)
+    query_params = parse_qs(url_parts.query)
+    query_params[key] = [str(value)]
+    updated_query = urlencode(query_params, doseq=True)
+    updated_url_parts = url_parts._replace(query=updated_query)
+    return urlunparse(updated_url_parts)
+
+def create_driver(network_capture=False):
+    logger.debug("Setting up Selenium WebDriver.")
+    driver = browser.create_driver(browser_profile, network_capture)
+    logger.debug("Selenium WebDriver initialized.")
+    return driver
+
+def setup_tickets_table(conn, drop=True):
+    cursor = conn.cursor()
+
+    # [MODIFICATION] Drop the existing tickets table if it exists
+    # Incremental runs keep the table and replace tickets event by event
+    if drop:
+        cursor.execute("DROP TABLE IF EXISTS tickets")
+
+    # [MODIFICATION] Ensure tickets table has event_location, zone, and is_vip columns
+    logger.debug("Ensuring tickets table exists with required schema including event_location, zone, and is_vip.")
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS tickets (
+            ticket_name TEXT,
+            ticket_price REAL,
+            event_link TEXT,
+            quantity INTEGER,
+            unique_id TEXT UNIQUE,
+            event_location TEXT,
+            zone TEXT,
+            is_vip INTEGER,  -- 1 for VIP, 0 for Non-VIP
+            scraped_at REAL,  -- Unix time of the scrape that last saw this listing
+            ticket_section TEXT,  -- ticket_name split into parts when stored
+            ticket_row TEXT,
+            ticket_view TEXT,
+            event_id TEXT,  -- events.event_id; event_link carries the quantity
+            stored_at REAL,  -- Unix time the row was written, in commit order
+            FOREIGN KEY (event_link) REFERENCES events (event_link)
+        )
+    ''')
+
+    # Older tables (including the bare one main.py creates) are upgraded in place
+    columns = [row[1] for row in cursor.execute("PRAGMA table_info(tickets)").fetchall()]
+    for column, column_type in ticket_columns:
+        if column not in columns:
+            cursor.execute(f"ALTER TABLE tickets ADD COLUMN {column} {column_type}")
+    if 'unique_id' not in columns:
+        cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_tickets_unique_id ON tickets (unique_id)")
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS event_scrape_state (
+            event_link TEXT PRIMARY KEY,
+            last_scraped REAL,  -- Unix time
+            listing_count INTEGER,
+            volatility REAL,  -- Smoothed relative change in listing_count between scrapes
+            failures INTEGER DEFAULT 0,  -- Failed scrapes since the last successful one
+            retry_after REAL,  -- Unix time before which a failed event is not retried
+            fingerprint TEXT,  -- Listing count and hash of the grid's first page load (sweep_planner.grid_fingerprint)
+            last_seen REAL,  -- Unix time the grid was last loaded, also when it was unchanged and not scraped
+            FOREIGN KEY (event_link) REFERENCES events (event_link)
+        )
+    ''')
+    add_missing_columns(conn, 'event_scrape_state', scrape_state_columns)
+    conn.commit()
+    setup_price_history_tables(conn)
+
+    # Backfill event keys and (re)create the indexes, also after the table was dropped
+    migrate(conn)
+
+def normalize_ticket_name(raw_ticket_name):
+    # Insert newlines to make the ticket_name more readable
+    ticket_name = raw_ticket_name.replace("Section ", "Section\n")
+    ticket_name = ticket_name.replace("Row ", "Row\n")
+    ticket_name = ticket_name.replace("ticket", "ticket\n")
+    return ticket_name.strip()
+
+def extract_listings(driver):
+    """
+    Return every listing container on the page as a list of dicts with the
+    container element, its 1-based DOM index, raw name, raw price and sold flag.
+    """
+    return driver.execute_script(extract_listings_script, ticket_container_xpath, ticket_name_xpath, ticket_price_xpath)
+
+def wait_for_missing_prices(driver, listings, timeout=price_timeout):
+    """
+    Re-read prices for listings whose price had not rendered yet, polling in
+    one call per round until all are present or the timeout expires.
+    """
+    pending = [listing for listing in listings if listing['price'] is None]
+    if not pending:
+        return
+    started = time.time()
+    deadline = started + timeout
+    while pending and time.time() < deadline:
+        time.sleep(price_poll_interval)
+        prices = driver.execute_script(read_prices_script, [listing['element'] for listing in pending], ticket_price_xpath)
+        for listing, price in zip(pending, prices):
+            listing['price'] = price
+        pending = [listing for listing in pending if listing['price'] is None]
+    wait_stats.record("prices", time.time() - started, not pending)
+    tracer.record('wait', time.time() - started, label="prices", ok=not pending)
+    if pending:
+        logger.debug("%d listing(s) still without a price after %ss.", len(pending), timeout)
+
+def remove_listings(driver, listings):
+    try:
+        driver.execute_script(remove_listings_script, [listing['element'] for listing in listings])
+    except StaleElementReferenceException:
+        pass
+
+def read_listing_details(driver, container, snapshot=None):
+    """
+    Click a listing to open its dialog and read the zone and VIP status.
+    Returns (zone, is_vip), or None if the listing could not be clicked.
+    With --archive the dialog is saved, with snapshot (event_link, raw_name, ...).
+    """
+    # [MODIFICATION] Click the container using Selenium's native click to reveal dialog
+    try:
+        container.click()  # Native Selenium click
+    except (ElementClickInterceptedException, ElementNotInteractableException, StaleElementReferenceException) as e:
+        logger.debug("Could not click the container: %s", e)
+        return None
 
-print("[DEBUG] Retrieving all events from the 'events' table.")
-cursor.execute('SELECT event_link FROM events')
-events = cursor.fetchall()
-print(f"[DEBUG] Found {len(events)} event(s) in the database.")
+    # [MODIFICATION] Extract the 'zone' from the dialog
+    try:
+        zone_element = WebDriverWait(driver, 10).until(
+            EC.visibility_of_element_located((By.XPATH, zone_xpath))
+        )
+        zone = zone_element.text.strip()
+    except (NoSuchElementException, TimeoutException):
+        zone = ""
+        logger.debug("Zone element not found or timed out, proceeding with empty zone.")
+    if snapshot is not None:
+        archive.save_modal(driver, snapshot['url'], snapshot)
 
-for event in events:
-    event_link = event[0]
-    print(f"\n[DEBUG] Processing event: {event_link}")
+    # [MODIFICATION] Extract VIP status from the dialog using provided XPath
+    try:
+        vip_element = driver.find_element(By.XPATH, vip_status_xpath)
+        vip_text = vip_element.text.strip().lower()
+        is_vip = 1 if 'vip' in vip_text else 0
+    except (NoSuchElementException, TimeoutException):
+        is_vip = 0  # Default to Non-VIP if not found
+        logger.debug("VIP status element not found or timed out, defaulting to Non-VIP.")
 
-    quantity = 1
-    any_tickets_found = False
-    event_location = ""
+    # [MODIFICATION] Close the dialog by clicking the "X" button
+    try:
+        close_button = WebDriverWait(driver, 10).until(EC.element_to_be_clickable((By.XPATH, close_dialog_xpath)))
+        close_button.click()
+    except (NoSuchElementException, TimeoutException, ElementClickInterceptedException, ElementNotInteractableException) as e:
+        logger.debug("Could not close the dialog: %s", e)
+
+    return zone, is_vip
 
-    # Fetch the event location once outside the main loop
+def read_event_location(driver):
+    # The location is in the header of every quantity page, so it is read from the first one
     try:
-        print("[DEBUG] Attempting to open event page to get location.")
-        driver.get(event_link)
         event_location = WebDriverWait(driver, 10).until(
             EC.presence_of_element_located((By.XPATH, event_location_xpath))
         ).text
-        print(f"[DEBUG] Event location found once for this event: {event_location}")
+        logger.debug("Event location found once for this event: %s", event_location)
     except (NoSuchElementException, TimeoutException):
         event_location = ""
-        print("[DEBUG] Event location not found or timed out, proceeding with empty location.")
+        logger.debug("Event location not found or timed out, proceeding with empty location.")
+    return event_location
+
+def read_grid_fingerprint(driver):
+    """Fingerprint of the listings the grid has rendered, read in one call before any dialog is opened."""
+    available = [listing for listing in extract_listings(driver) if not listing['sold']]
+    wait_for_missing_prices(driver, available)
+    return grid_fingerprint((listing['name'], listing['price']) for listing in available)
+
+def scrape_listings(driver, event_location="", zone_cache=None, snapshot=None, known=None):
+    """
+    Read every listing on the current page, removing processed containers in
+    batches until the grid is empty. Returns a list of dicts with raw_name,
+    ticket_name, price, zone, is_vip and the container's DOM index.
+    known maps (raw_name, price) to the (zone, is_vip) of listings already
+    read at another quantity of the event, whose dialog is not opened again.
+    With a ZoneCache, the dialog is only opened for sections it has not seen.
+    With --archive, each batch and dialog is saved under snapshot's url and fields.
+    """
+    records = []
 
     while True:
-        print(f"[DEBUG] Starting loop with quantity={quantity} for event: {event_link}")
-
-        if quantity > max_quantity:
-            print(f"[DEBUG] Reached max quantity {max_quantity} for {event_link}. Stopping.")
+        with tracer.span('extract'):
+            listings = extract_listings(driver)
+        if not listings:
+            logger.debug("No more containers found, breaking inner loop.")
             break
+        if snapshot is not None:
+            archive.save_page(driver, 'listings', snapshot['url'], snapshot)
 
-        current_url = update_query_param(event_link, "quantity", quantity)
-        print(f"[DEBUG] Navigating to: {current_url}")
-        driver.get("https://www.viagogo.com/Colorado-Mammoth-Parking-Passes/Colorado-Mammoth-Tickets/E-155401221?quantity=1")
+        available = [listing for listing in listings if not listing['sold']]
+        logger.debug("Read %d container(s), %d sold.", len(listings), len(listings) - len(available))
+        wait_for_missing_prices(driver, available)
 
-        # Check if "no tickets available" element is present
-        try:
-            print("[DEBUG] Checking for 'no tickets available' element.")
-            no_tickets_element = driver.find_element(By.XPATH, no_tickets_xpath)
-            if no_tickets_element:
-                print(f"[DEBUG] No tickets found at quantity {quantity}")
-                if not any_tickets_found and quantity > 20:
-                    print("[DEBUG] No tickets found for any quantity after 20 attempts, moving to next event.")
-                    break
-                quantity += 1
+        for listing in available:
+            index = listing['index']
+            if listing['name'] is None or listing['price'] is None:
+                logger.debug("Container #%d has no ticket name or price, skipping.", index)
                 continue
-        except NoSuchElementException:
-            print("[DEBUG] 'No tickets' element not found, continuing.")
-
-        print("[DEBUG] Waiting 2 seconds for the page to load ticket containers.")
-        time.sleep(2)
 
-        print("[DEBUG] Finding ticket containers.")
-        ticket_containers = driver.find_elements(By.XPATH, ticket_container_xpath)
-        print(f"[DEBUG] Found {len(ticket_containers)} ticket container(s) at quantity={quantity}.")
-
-        if not ticket_containers:
-            if not any_tickets_found and quantity > 20:
-                print("[DEBUG] No tickets found for any quantity after 20 attempts, moving to next event.")
-                break
-            print("[DEBUG] No ticket containers found, incrementing quantity.")
-            quantity += 1
+            try:
+                raw_ticket_name = listing['name'].strip()
+                details = known.get((raw_ticket_name, listing['price'].strip())) if known else None
+                if details is None and zone_cache:
+                    details = zone_cache.lookup(event_location, raw_ticket_name)
+                if details is None:
+                    with tracer.span('modal'):
+                        details = read_listing_details(driver, listing['element'],
+                                                       snapshot and {**snapshot, 'raw_name': raw_ticket_name})
+                    if details is None:
+                        continue  # Skip to next container if click fails
+                    if zone_cache:
+                        zone_cache.store(event_location, raw_ticket_name, *details)
+                zone, is_vip = details
+
+                records.append({
+                    'raw_name': raw_ticket_name,
+                    'ticket_name': normalize_ticket_name(raw_ticket_name),
+                    'price': listing['price'].strip(),
+                    'zone': zone,
+                    'is_vip': is_vip,
+                    'index': index,
+                })
+            except Exception as e:
+                if is_session_dead_error(e):
+                    raise
+                logger.debug("Error extracting ticket info: %s", e)
+
+        # Sold and processed containers leave the DOM together in one call,
+        # then give the grid a moment to render any listings it lazy-loads
+        remove_listings(driver, listings)
+        wait_for_dom_quiet(driver, listings_grid_selector, quiet=0.3, timeout=2, label="grid refill")
+
+    return records
+
+def read_captured_listings(capture, snapshot=None):
+    """
+    Network engine: listings from the grid's JSON responses, zone and VIP
+    included, so no container is clicked. Returns [] if no listing JSON arrived.
+    """
+    records = []
+    responses = capture.wait_for_responses(timeout=resolve_timeout(listings_timeout))
+    if snapshot is not None:
+        archive.save_responses('listings_json', responses, snapshot)
+    for _, payload in responses:
+        records.extend(parse_listing_payload(payload))
+    for index, record in enumerate(records, start=1):
+        record['index'] = index
+        record['ticket_name'] = normalize_ticket_name(record['raw_name'])
+    return records
+
+def store_listings(writer, event_link, quantity, records, event_location, scraped_at, listing_keys):
+    """
+    Queue one quantity's listings on the DatabaseWriter. Returns the number queued.
+    listing_keys has the price history's listing_key of each record, so a
+    listing keeps its unique_id when the grid reorders.
+    """
+    current_url = update_query_param(event_link, "quantity", quantity)
+    event_id = canonical_event_id(event_link)
+    processed_tickets = set()
+    for record, key in zip(records, listing_keys):
+        unique_id = hashlib.sha256(f"{key}-{quantity}".encode('utf-8')).hexdigest()
+
+        if unique_id in processed_tickets:
+            logger.debug("Duplicate detected in this run, skipping: %s, %s, %s, Index: %s",
+                         record['ticket_name'], record['price'], quantity, record['index'])
             continue
-
-        any_tickets_found = True
-        processed_tickets = set()
-        print("[DEBUG] Processing containers until none remain...")
+        section, row, view = split_ticket_name(record['ticket_name'])
+        writer.write(insert_ticket_sql,
+                     (record['ticket_name'], record['price'], current_url, quantity, unique_id,
+                      event_location, record['zone'], record['is_vip'], scraped_at, section, row, view, event_id))
+        processed_tickets.add(unique_id)
+    return len(processed_tickets)
+
+def scrape_event(driver, writer, event_link, scraped_at=None, sweep_class=QuantitySweep, zone_cache=None, capture=None,
+                 known_fingerprint=None):
+    """
+    Scrape the quantities of one event that the sweep planner asks for, store
+    them, then drop the event's tickets that
+    this scrape did not see again and record what changed in the price
+    history (price_history.py). Returns the number of listings stored.
+    The grid of the first page load is fingerprinted; if that matches
+    known_fingerprint (the last scrape's), nothing else is loaded or stored
+    but the event's last_seen time, and None is returned.
+    With a NetworkCapture, listings come from the grid's JSON responses and
+    the DOM is only read when no listing JSON arrived.
+    """
+    logger.debug("Processing event: %s", event_link)
+    with tracer.tagged(event=event_link):
+        listing_count = 0
+        scraped_at = scraped_at or time.time()
+        event_location = ""
+        sweep = sweep_class(max_quantity, known_fingerprint)
 
         while True:
-            print("[DEBUG] Re-checking for containers.")
-            ticket_containers = driver.find_elements(By.XPATH, ticket_container_xpath)
-            if not ticket_containers:
-                print("[DEBUG] No more containers found, breaking inner loop.")
+            quantity = sweep.next_quantity()
+            if quantity is None:
                 break
 
-            for index, container in enumerate(ticket_containers, start=1):
-                print(f"[DEBUG] Processing container #{index}.")
-                try:
-                    container_text = container.text
-                    if "sold" in container_text.lower():
-                        print("[DEBUG] 'sold' detected in container text, removing this container and skipping.")
-                        driver.execute_script("arguments[0].remove();", container)
-                        time.sleep(0.5)
-                        continue
-
-                    print("[DEBUG] Attempting to find ticket_name element.")
-                    ticket_name_element = container.find_element(By.XPATH, ticket_name_xpath)
-                    raw_ticket_name = ticket_name_element.text.strip()
-                    print(f"[DEBUG] Extracted raw_ticket_name: {raw_ticket_name}")
-
-                    # Insert newlines to make the ticket_name more readable
-                    ticket_name = raw_ticket_name.replace("Section ", "Section\n")
-                    ticket_name = ticket_name.replace("Row ", "Row\n")
-                    ticket_name = ticket_name.replace("ticket", "ticket\n")
-                    ticket_name = ticket_name.strip()
-
-                    print(f"[DEBUG] ticket_name after inserting newlines:\n{ticket_name}")
-
-                    print("[DEBUG] Attempting to find ticket_price element.")
-                    while True:
-                        try:
-                            ticket_price_element = container.find_element(By.XPATH, ticket_price_xpath)
-                            break
-                        except NoSuchElementException:
-                            pass
-                    ticket_price = ticket_price_element.text.strip()
-                    print(f"[DEBUG] Extracted ticket_price: {ticket_price}")
-
-                    # [MODIFICATION] Click the container using Selenium's native click to reveal dialog
-                    try:
-                        print("[DEBUG] Attempting to click the container to reveal zone and VIP information.")
-                        container.click()  # Native Selenium click
-                        print("[DEBUG] Container clicked successfully.")
-                    except (ElementClickInterceptedException, ElementNotInteractableException) as e:
-                        print(f"[DEBUG] Could not click the container: {e}")
-                        continue  # Skip to next container if click fails
+            current_url = update_query_param(event_link, "quantity", quantity)
+            tracer.update_tags(quantity=quantity)
+            logger.debug("Navigating to: %s", current_url)
+            if capture is not None:
+                capture.reset()
+            with tracer.span('page_load'):
+                driver.get(current_url)
+
+            if quantity == 1:
+                event_location = read_event_location(driver)
+            snapshot = {'url': current_url, 'event_link': event_link, 'quantity': quantity, 'scraped_at': scraped_at,
+                        'event_location': event_location} if archive.enabled else None
+
+            if capture is not None:
+                with tracer.span('wait', label="listing responses"):
+                    records = read_captured_listings(capture, snapshot)
+                if records:
+                    logger.debug("Read %d listing(s) from JSON at quantity=%d.", len(records), quantity)
+                    if sweep.fingerprint is None and sweep.check_fingerprint(
+                            grid_fingerprint((record['raw_name'], record['price']) for record in records)):
+                        break
+                    sweep.observe(quantity, records)
+                    continue
+
+            # Wait for either the "no tickets available" notice or the first listing
+            found = wait_for_any(driver, [no_tickets_xpath, ticket_container_xpath], listings_timeout, label="listings")
+            if found != 1:
+                logger.debug("No tickets found at quantity %d", quantity)
+                if sweep.fingerprint is None and sweep.check_fingerprint(grid_fingerprint([])):
+                    break
+                sweep.observe(quantity, [])
+                continue
 
-                    # [MODIFICATION] Extract the 'zone' from the dialog
-                    try:
-                        print("[DEBUG] Waiting for zone element in the dialog to be present.")
-                        zone_element = WebDriverWait(driver, 10).until(
-                            EC.visibility_of_element_located((By.XPATH, zone_xpath))
-                        )
-                        zone = zone_element.text.strip()
-                        print(f"[DEBUG] Extracted zone: {zone}")
-                    except (NoSuchElementException, TimeoutException):
-                        zone = ""
-                        print("[DEBUG] Zone element not found or timed out, proceeding with empty zone.")
-
-                    # [MODIFICATION] Extract VIP status from the dialog using provided XPath
-                    try:
-                        print("[DEBUG] Attempting to extract VIP status using provided XPath.")
-                        vip_element = driver.find_element(By.XPATH, vip_status_xpath)
-                        vip_text = vip_element.text.strip().lower()
-                        is_vip = 1 if 'vip' in vip_text else 0
-                        print(f"[DEBUG] Extracted VIP status: {'VIP' if is_vip else 'Non-VIP'}")
-                    except (NoSuchElementException, TimeoutException):
-                        is_vip = 0  # Default to Non-VIP if not found
-                        print("[DEBUG] VIP status element not found or timed out, defaulting to Non-VIP.")
-
-                    # [MODIFICATION] Close the dialog by clicking the "X" button
-                    try:
-                        print("[DEBUG] Attempting to close the dialog by clicking the 'X' button.")
-                        close_button = WebDriverWait(driver, 10).until(EC.element_to_be_clickable((By.XPATH, close_dialog_xpath)))
-                        close_button.click()
-                        print("[DEBUG] Dialog closed successfully.")
-                    except (NoSuchElementException, TimeoutException, ElementClickInterceptedException, ElementNotInteractableException) as e:
-                        print(f"[DEBUG] Could not close the dialog: {e}")
-
-                    unique_str = f"{event_link}-{raw_ticket_name}-{ticket_price}-{quantity}-{index}"
-                    print(f"[DEBUG] Generated unique_str: {unique_str}")
-                    unique_id = hashlib.sha256(unique_str.encode('utf-8')).hexdigest()
-                    print(f"[DEBUG] Generated unique_id: {unique_id}")
-
-                    if unique_id in processed_tickets:
-                        print(f"[DEBUG] Duplicate detected in this run, skipping: {ticket_name}, {ticket_price}, {quantity}, Index: {index}")
-                    else:
-                        print("[DEBUG] Attempting to insert ticket into database with event location, zone, and VIP status.")
-                        try:
-                            cursor.execute('''INSERT INTO tickets (ticket_name, ticket_price, event_link, quantity, unique_id, event_location, zone, is_vip)
-                                              VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
-                                           (ticket_name, ticket_price, current_url, quantity, unique_id, event_location, zone, is_vip))
-                            conn.commit()
-                            processed_tickets.add(unique_id)
-                            print("[DEBUG] Ticket inserted successfully.")
-                        except sqlite3.IntegrityError:
-                            print(f"[DEBUG] Duplicate ticket skipped by DB constraint: {ticket_name}, {ticket_price}, {quantity}, Index: {index}")
-
-                except Exception as e:
-                    print(f"[DEBUG] Error extracting ticket info: {e}")
-
-                print("[DEBUG] Removing processed container from the DOM.")
-                try:
-                    driver.execute_script("arguments[0].remove();", container)
-                except StaleElementReferenceException:
-                    pass
-                time.sleep(0.5)
-
-        print(f"[DEBUG] Finished processing all containers for quantity={quantity}, incrementing quantity.")
-        quantity += 1
-
-print("[DEBUG] All events processed. Closing browser and database connection.")
-driver.quit()
-conn.close()
-print("[DEBUG] Script execution completed.")
+            # Listings are arriving; let the grid finish rendering before reading it
+            wait_for_dom_quiet(driver, listings_grid_selector, quiet=0.3, timeout=5, label="grid render")
+            if sweep.fingerprint is None and sweep.check_fingerprint(read_grid_fingerprint(driver)):
+                break
+            records = scrape_listings(driver, event_location, zone_cache, snapshot, sweep.known_details())
+            logger.debug("Read %d listing(s) at quantity=%d.", len(records), quantity)
+            sweep.observe(quantity, records)
+
+        event_id = canonical_event_id(event_link)
+        writer.write(record_fingerprint_sql, (event_link, sweep.fingerprint, scraped_at))
+        if sweep.unchanged:
+            logger.debug("Listings of %s unchanged since the last scrape (%s), skipping the sweep.",
+                         event_link, sweep.fingerprint)
+            touch_listings(writer, event_id, scraped_at)
+            return None
+
+        results = list(sweep.results())
+        listings, listing_keys = identify_listings(event_id, results, previous_listings.load(event_id))
+        for (quantity, records), quantity_keys in zip(results, listing_keys):
+            listing_count += store_listings(writer, event_link, quantity, records, event_location, scraped_at, quantity_keys)
+        logger.debug("Sweep for %s: %d page load(s) for %d quantities, %d listing(s) stored.",
+                     event_link, sweep.page_loads, max_quantity, listing_count)
+
+        purge_stale_tickets(writer, event_link, scraped_at)
+        record_snapshot(writer, event_id, listings, scraped_at)
+        return listing_count
+
+def purge_stale_tickets(writer, event_link, scraped_at):
+    # Tickets are stored under the quantity URL, one per quantity of the event
+    quantity_links = [update_query_param(event_link, "quantity", quantity) for quantity in range(1, max_quantity + 1)]
+    placeholders = ", ".join("?" for _ in quantity_links)
+    writer.write(f"DELETE FROM tickets WHERE event_link IN ({placeholders}) AND (scraped_at IS NULL OR scraped_at < ?)",
+                 (*quantity_links, scraped_at))
+
+def load_event_schedule(conn):
+    cursor = conn.cursor()
+    # An event found unchanged counts as scraped when it was last seen
+    cursor.execute('''SELECT e.event_link, e.event_date, MAX(s.last_scraped, COALESCE(s.last_seen, s.last_scraped)),
+                             s.listing_count, s.volatility, s.failures, s.retry_after, s.fingerprint
+                      FROM events e LEFT JOIN event_scrape_state s ON s.event_link = e.event_link''')
+    return [
+        {'event_link': row[0], 'event_date': row[1], 'last_scraped': row[2],
+         'listing_count': row[3], 'volatility': row[4] or 0.0, 'failures': row[5] or 0, 'retry_after': row[6],
+         'fingerprint': row[7]}
+        for row in cursor.fetchall()
+    ]
+
+def new_entry(event_link):
+    """Schedule entry for an event scraped without looking at its scrape state (full runs)."""
+    return {'event_link': event_link, 'listing_count': None, 'volatility': 0.0, 'failures': 0, 'retry_after': None,
+            'fingerprint': None}
+
+def schedule_key(entry, now, today):
+    """
+    Sort key for incremental runs, lowest first, or None for past events.
+    Never-scraped events come first, soonest date first. The rest are ranked
+    by hours since their last scrape, weighted up by volatility and down by
+    how far away the event is.
+    """
+    event_date = parse_event_date(entry['event_date'], today)
+    if event_date and event_date < today:
+        return None
+    days_until = (event_date - today).days if event_date else unknown_date_days
+
+    if entry['last_scraped'] is None:
+        return (0, days_until)
+    hours_stale = max(now - entry['last_scraped'], 0) / 3600
+    urgency = hours_stale * (1 + entry['volatility']) / (1 + days_until)
+    return (1, -urgency)
+
+def plan_incremental_run(conn, limit=None, min_age_minutes=0, now=None):
+    """
+    Return the schedule entries to scrape this run in priority order.
+    Past events, events scraped less than min_age_minutes ago and failed
+    events whose retry is not due yet are left out.
+    """
+    now = now or time.time()
+    today = datetime.date.fromtimestamp(now)
+    schedule = load_event_schedule(conn)
+
+    planned = []
+    skipped_past = skipped_fresh = skipped_retry = 0
+    for entry in schedule:
+        key = schedule_key(entry, now, today)
+        if key is None:
+            skipped_past += 1
+            continue
+        if entry['retry_after'] is not None and entry['retry_after'] > now:
+            skipped_retry += 1
+            continue
+        if entry['last_scraped'] is not None and now - entry['last_scraped'] < min_age_minutes * 60:
+            skipped_fresh += 1
+            continue
+        planned.append((key, entry))
+    planned.sort(key=lambda item: item[0])
+    planned = [entry for _, entry in planned]
+    if limit is not None:
+        planned = planned[:limit]
+
+    logger.info("Incremental plan: %d of %d event(s) scheduled, %d past, %d scraped within %s min, %d waiting to be retried.",
+                len(planned), len(schedule), skipped_past, skipped_fresh, min_age_minutes, skipped_retry)
+    return planned
+
+def record_event_scrape(writer, entry, listing_count, scraped_at):
+    previous = entry['listing_count']
+    volatility = entry['volatility']
+    if previous is not None:
+        change = abs(listing_count - previous) / max(previous, 1)
+        volatility = volatility_smoothing * change + (1 - volatility_smoothing) * volatility
+    writer.write(record_scrape_sql, (entry['event_link'], scraped_at, listing_count, volatility))
+    # Keep the entry current for whoever scrapes it next (retries, pipeline.py)
+    entry.update(listing_count=listing_count, volatility=volatility, failures=0, retry_after=None)
+
+def scrape_managed_event(managed, writer, entry, zone_cache=None):
+    """
+    Scrape one event on a ManagedDriver, which replaces a dead browser and
+    retries the event. An event that still fails is logged and skipped, so
+    the rest of the run goes on; its failure is recorded with the time of
+    its next retry, which grows with every failure in a row.
+    An entry with a fingerprint is skipped when its grid has not changed;
+    entry['unchanged'] says which happened.
+    """
+    scraped_at = time.time()
+    try:
+        listing_count = managed.run(lambda driver, capture: scrape_event(driver, writer, entry['event_link'], scraped_at,
+                                                                         zone_cache=zone_cache, capture=capture,
+                                                                         known_fingerprint=entry.get('fingerprint')))
+    except Exception as e:
+        entry['failures'] += 1
+        entry['retry_after'] = time.time() + work_queue.retry_delay(entry['failures'])
+        logger.error("Error processing event %s (failure %d, retry in %.0fs): %s", entry['event_link'],
+                     entry['failures'], entry['retry_after'] - time.time(), e)
+        writer.write(record_failure_sql, (entry['event_link'], entry['retry_after']))
+        return False
+    entry['unchanged'] = listing_count is None
+    if entry['unchanged']:
+        entry.update(failures=0, retry_after=None)
+    else:
+        record_event_scrape(writer, entry, listing_count, scraped_at)
+    return True
+
+def run_full(managed, conn, writer, zone_cache=None):
+    logger.debug("Retrieving all events from the 'events' table.")
+    cursor = conn.cursor()
+    cursor.execute('SELECT event_link FROM events')
+    events = cursor.fetchall()
+    logger.info("Found %d event(s) in the database.", len(events))
+
+    failed = []
+    for event in events:
+        entry = new_entry(event[0])
+        if not scrape_managed_event(managed, writer, entry, zone_cache):
+            failed.append(entry)
+    retry_failed_events(managed, writer, failed, zone_cache)
+
+def retry_failed_events(managed, writer, failed, zone_cache=None, max_attempts=work_queue.default_max_attempts):
+    """Retry the events a full run could not scrape, each once its retry is due, up to max_attempts in all."""
+    while failed:
+        failed.sort(key=lambda entry: entry['retry_after'])
+        entry = failed.pop(0)
+        pause = entry['retry_after'] - time.time()
+        if pause > 0:
+            logger.info("Retrying %d failed event(s), next in %.0fs.", len(failed) + 1, pause)
+            time.sleep(pause)
+        if not scrape_managed_event(managed, writer, entry, zone_cache) and entry['failures'] < max_attempts:
+            failed.append(entry)
+
+def run_incremental(managed, conn, writer, limit=None, min_age_minutes=0, zone_cache=None):
+    for entry in plan_incremental_run(conn, limit, min_age_minutes):
+        scrape_managed_event(managed, writer, entry, zone_cache)
+
+def all_entries(conn):
+    return [new_entry(row[0]) for row in conn.execute('SELECT event_link FROM events')]
+
+def queue_entries(work, entries):
+    """Join (or start) the queue's generation and add the schedule entries; events already in it are ignored."""
+    generation = work.begin_generation()
+    added = work.enqueue_many('event', [(entry['event_link'], entry) for entry in entries])
+    logger.info("Ticket generation %d: %d new event(s) queued, %s.", generation, added, work.counts())
+    return generation
+
+def item_entry(item):
+    # Items queued before entries were stored carry the event link alone
+    return {**new_entry(item.payload['event_link']), **item.payload}
+
+def run_queued(managed, conn, writer, work, zone_cache=None):
+    """
+    A full run shared with other nodes through a work queue: every node
+    queues all events (events already in the generation are ignored) and
+    then leases them one at a time until the generation is drained.
+    """
+    generation = queue_entries(work, all_entries(conn))
+
+    owner = work_queue.node_owner(1)
+    while True:
+        item = work.next_item(owner, ('event',))
+        if item is None:
+            break
+        entry = item_entry(item)
+        with work.keep_alive(item):
+            if scrape_managed_event(managed, writer, entry, zone_cache) and tickets_committed(writer, item):
+                work.complete(item)
+            else:
+                work.release(item, failed=True)
+    if work.finish_generation():
+        logger.info("Ticket generation %d finished: %s.", generation, work.counts())
+
+def tickets_committed(writer, item, owner=None):
+    """
+    Flush the writer so the event is only completed once its tickets are on
+    disk. owner is who wrote them (a worker id), by default this thread.
+    """
+    try:
+        writer.flush(owner)
+    except DatabaseWriteError as e:
+        logger.error("Tickets of %s were not all committed, scraping it again later: %s", item, e)
+        return False
+    return True
+
+class WorkerProgress:
+    """Events finished by one worker process of a parallel run."""
+
+    def __init__(self, worker_id):
+        self.worker_id = worker_id
+        self.done = 0
+        self.failed = 0
+        self.unchanged = 0
+        self.restarts = 0
+        self.started = time.time()
+
+    def events_per_minute(self):
+        elapsed = time.time() - self.started
+        return self.done / (elapsed / 60) if elapsed > 0 else 0.0
+
+    def __str__(self):
+        return (f"[worker {self.worker_id}] {self.done} events ({self.unchanged} unchanged), {self.failed} failed, "
+                f"{self.events_per_minute():.1f} events/min")
+
+def worker_trace_path(trace_path, worker_id):
+    root, extension = os.path.splitext(trace_path)
+    return f"{root}.worker-{worker_id}{extension}"
+
+def ticket_worker(worker_id, args, queue_name, channel, parent_pid, path=database_path, pacer=None):
+    """
+    One process of a parallel run, with its own browser: lease events from
+    the work queue until the generation is drained. Rows are sent to the
+    parent through a QueueWriter, and the parent completes each event once
+    its rows are committed, so a killed run never marks unsaved work done.
+    pacer is the run's shared Pacer (a PacerManager proxy), or None.
+    """
+    global browser_profile
+    instrumentation.configure_logging(args.log_level)
+    tracer.configure(worker_trace_path(args.trace, worker_id) if args.trace else None, args.summary_interval)
+    # Each process writes its own snapshots; the archive is not events.db, so the parent does not relay them
+    page_archive.configure(args)
+    previous_listings.configure(path)
+    browser_profile = browser.profile_from_args(args)
+    # No warm spare: worker_budget counts one browser per worker, and a crashed worker is restarted anyway
+    pool = driver_manager.pool_from_args(args, create_driver, network_capture=args.engine == 'network',
+                                         pacer=pacing.SharedPacer(pacer) if pacer is not None else None, warm=0)
+    managed = pool.acquire()
+    work = work_queue.queue_from_args(args, path, queue_name)
+    work.begin_generation()
+    conn = configure_connection(sqlite3.connect(path))
+    writer = QueueWriter(channel, worker_id)
+    zone_cache = None if args.no_zone_cache else ZoneCache(conn, writer)
+    owner = work_queue.node_owner(worker_id)
+    try:
+        # Stop when the parent is gone; its leases run out and the next run takes the events over
+        while os.getppid() == parent_pid:
+            item = work.next_item(owner, ('event',))
+            if item is None:
+                break
+            entry = item_entry(item)
+            with work.keep_alive(item):
+                if scrape_managed_event(managed, writer, entry, zone_cache):
+                    writer.send('done', (item, entry['unchanged']))
+                else:
+                    work.release(item, failed=True)
+                    writer.send('failed', item)
+    finally:
+        if zone_cache:
+            zone_cache.flush_hits()
+        writer.close()
+        managed.release()
+        pool.close()
+        conn.close()
+        previous_listings.close()
+        archive.close()
+        tracer.log_summary()
+        tracer.close()
+
+def log_progress(progress, work, started):
+    counts = work.counts()
+    done = sum(entry.done for entry in progress.values())
+    unchanged = sum(entry.unchanged for entry in progress.values())
+    elapsed = time.time() - started
+    rate = done / elapsed if elapsed > 0 else 0.0
+    eta = f"{counts['open'] / rate / 60:.0f} min" if rate else "unknown"
+    for entry in progress.values():
+        logger.info("%s", entry)
+    logger.info("Tickets: %d of %d events done (%d this run, %d unchanged and skipped, %.0f%% skip rate), "
+                "%d failed, %.1f events/min, ETA %s.", counts['done'], sum(counts.values()), done, unchanged,
+                unchanged / done * 100 if done else 0.0, counts['failed'], rate * 60, eta)
+
+def run_parallel(args, workers, entries, queue_name, path=database_path, max_restarts=3):
+    """
+    Shard the schedule entries across worker processes, each with its own
+    browser, through the work queue. This process is the only DB writer:
+    workers send their rows here. Progress and an ETA are logged every
+    --summary-interval seconds. A crashed worker is restarted while events
+    are left; a killed run resumes where it stopped when started again.
+    """
+    work = work_queue.queue_from_args(args, path, queue_name)
+    generation = queue_entries(work, entries)
+
+    context = multiprocessing.get_context('spawn')
+    channel = context.Queue()
+    # One pacer for all workers, so --rate holds for the run and not per process
+    pacer_manager, pacer = pacing.shared_pacer_from_args(args, workers, context)
+    writer = DatabaseWriter(path)
+    progress = {worker_id: WorkerProgress(worker_id) for worker_id in range(1, workers + 1)}
+    processes = {}
+
+    def start(worker_id):
+        process = context.Process(target=ticket_worker, args=(worker_id, args, queue_name, channel, os.getpid(), path, pacer),
+                                  name=f"ticket-worker-{worker_id}", daemon=True)
+        process.start()
+        processes[worker_id] = process
+
+    started = last_report = time.time()
+    try:
+        for worker_id in progress:
+            start(worker_id)
+        while processes:
+            try:
+                kind, worker_id, payload = channel.get(timeout=1)
+            except queue.Empty:
+                # Every message a worker sent is in before its exit code is, so nothing is left to read from these
+                for worker_id, process in list(processes.items()):
+                    if process.exitcode is None:
+                        continue
+                    del processes[worker_id]
+                    if process.exitcode != 0 and not work.drained() and progress[worker_id].restarts < max_restarts:
+                        logger.warning("Worker %d died (exit code %s), restarting it.", worker_id, process.exitcode)
+                        progress[worker_id].restarts += 1
+                        start(worker_id)
+                kind = None
+            if kind == 'rows':
+                # Owned by the worker, so a lost row fails that worker's next event and no other's
+                for sql, params in payload:
+                    writer.write(sql, params, worker_id)
+            elif kind == 'done':
+                item, unchanged = payload
+                if tickets_committed(writer, item, worker_id):
+                    work.complete(item)
+                    progress[worker_id].done += 1
+                    progress[worker_id].unchanged += unchanged
+                else:
+                    work.release(item, failed=True)
+                    progress[worker_id].failed += 1
+            elif kind == 'failed':
+                progress[worker_id].failed += 1
+            elif kind == 'exit':
+                # The crash check may have removed or restarted the worker first; only join the one that sent this
+                process = processes.get(worker_id)
+                if process is not None and process.pid == payload:
+                    del processes[worker_id]
+                    process.join()
+            if args.summary_interval and time.time() - last_report >= args.summary_interval:
+                log_progress(progress, work, started)
+                last_report = time.time()
+    finally:
+        for process in processes.values():
+            process.terminate()
+        try:
+            writer.close()
+        finally:
+            if pacer_manager is not None:
+                pacing.log_summary(pacer.summary())
+                pacer_manager.shutdown()
+    log_progress(progress, work, started)
+    if work.finish_generation():
+        logger.info("Ticket generation %d finished.", generation)
+    else:
+        logger.info("Ticket generation %d has events left; run again to resume.", generation)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Scrape ticket listings for the events in events.db.")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Keep existing tickets and rescrape events by priority instead of starting over")
+    parser.add_argument('--limit', type=int, default=None,
+                        help="Incremental mode: scrape at most this many events per pass")
+    parser.add_argument('--min-age', type=float, default=0,
+                        help="Incremental mode: skip events scraped less than this many minutes ago")
+    parser.add_argument('--loop', type=float, default=None,
+                        help="Incremental mode: start a new pass every this many minutes")
+    parser.add_argument('--no-zone-cache', action='store_true',
+                        help="Open the listing dialog for every listing instead of reusing known zone/VIP by venue and section")
+    parser.add_argument('--engine', choices=['dom', 'network'], default='dom',
+                        help="Read listings from the rendered grid (dom) or from its JSON responses (network)")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Worker processes, each with its own browser; more than 1 shards the events across them "
+                             "and resumes an interrupted run")
+    parser.add_argument('--max-workers', type=int, default=None,
+                        help="Upper bound on --workers (default: one per core, as many as fit in free memory at --max-rss each)")
+    browser.add_arguments(parser)
+    driver_manager.add_arguments(parser)
+    pacing.add_arguments(parser)
+    work_queue.add_arguments(parser)
+    instrumentation.add_arguments(parser)
+    page_archive.add_arguments(parser)
+    return parser.parse_args(argv)
+
+def main():
+    global browser_profile
+    args = parse_args()
+    instrumentation.configure(args)
+    page_archive.configure(args)
+    browser_profile = browser.profile_from_args(args)
+    max_workers = args.max_workers or driver_manager.worker_budget(args.max_rss)
+    workers = max(1, min(args.workers, max_workers))
+    if workers != args.workers:
+        logger.info("Limiting workers from %d to %d.", args.workers, workers)
+
+    logger.debug("Connecting to SQLite database 'events.db'.")
+    conn = configure_connection(sqlite3.connect(database_path))
+    # Nodes sharing a queue, and parallel runs that may be resuming, must not drop the tickets already stored
+    setup_tickets_table(conn, drop=not args.incremental and args.queue is None and workers == 1)
+    previous_listings.configure(database_path)
+    pool = managed = writer = zone_cache = None
+    if workers == 1:
+        pool = driver_manager.pool_from_args(args, create_driver, network_capture=args.engine == 'network',
+                                             pacer=pacing.pacer_from_args(args))
+        managed = pool.acquire()
+        writer = DatabaseWriter(database_path)
+        zone_cache = None if args.no_zone_cache else ZoneCache(conn, writer)
+
+    logger.debug("max_quantity set to %d", max_quantity)
+
+    wait_stats.reset()
+    fingerprint_stats.reset()
+    tracer.reset()
+    try:
+        if workers > 1 and not args.incremental:
+            run_parallel(args, workers, all_entries(conn), 'tickets')
+        elif args.queue and not args.incremental:
+            run_queued(managed, conn, writer, work_queue.queue_from_args(args, database_path, 'tickets'), zone_cache)
+        elif not args.incremental:
+            run_full(managed, conn, writer, zone_cache)
+        else:
+            while True:
+                pass_started = time.time()
+                if workers > 1:
+                    run_parallel(args, workers, plan_incremental_run(conn, args.limit, args.min_age), 'tickets-incremental')
+                else:
+                    run_incremental(managed, conn, writer, args.limit, args.min_age, zone_cache)
+                    # The next plan reads the scrape state this pass wrote
+                    writer.flush()
+                if args.loop is None:
+                    break
+                pause = args.loop * 60 - (time.time() - pass_started)
+                if pause > 0:
+                    logger.info("Pass finished, next pass in %.0fs.", pause)
+                    time.sleep(pause)
+    finally:
+        logger.info("All events processed. Closing browser and database connection.")
+        # Flush queued tickets before the browser goes away
+        if zone_cache:
+            zone_cache.flush_hits()
+        try:
+            if writer:
+                writer.close()
+        finally:
+            if managed:
+                managed.release()
+                pool.close()
+            conn.close()
+            previous_listings.close()
+            archive.close()
+        wait_stats.report()
+        if workers == 1:
+            # Parallel runs count unchanged events in their progress log
+            fingerprint_stats.report()
+        tracer.log_summary()
+        tracer.close()
+        if zone_cache:
+            zone_cache.report()
+    logger.info("Script execution completed.")
+
+if __name__ == "__main__":
+    main()
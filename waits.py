@@ -0,0 +1,239 @@
+"""
+Event-driven waits for the scrapers.
+
+Each wait returns as soon as the page is ready (an element count grows, a
+subtree stops mutating, or the network goes quiet) instead of sleeping for a
+fixed time. Timeouts can be AdaptiveTimeout objects that tune themselves from
+the latencies observed so far, and every wait is recorded in wait_stats so a
+run can report how much of its wall-clock time was spent waiting.
+"""
+import threading
+import time
+
+from instrumentation import get_logger, tracer
+
+logger = get_logger('waits')
+
+# Resolves once the number of nodes matching an XPath is above a threshold.
+# A MutationObserver re-checks the count on every DOM change, so no polling
+# round-trips are needed while the page loads.
+count_above_script = """
+    const xpath = arguments[0];
+    const threshold = arguments[1];
+    const timeoutMs = arguments[2];
+    const done = arguments[arguments.length - 1];
+    const count = () => document.evaluate(
+        xpath, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null).snapshotLength;
+    let finished = false;
+    let observer = null;
+    let hard = null;
+    const finish = (ok) => {
+        if (finished) return;
+        finished = true;
+        if (observer) observer.disconnect();
+        clearTimeout(hard);
+        done({ok: ok, count: count()});
+    };
+    if (count() > threshold) { finish(true); return; }
+    observer = new MutationObserver(() => { if (count() > threshold) finish(true); });
+    observer.observe(document.documentElement, {childList: true, subtree: true});
+    hard = setTimeout(() => finish(false), timeoutMs);
+"""
+
+# Resolves once any of the XPaths matches a node; returns the index of the
+# first one that matched, or -1 on timeout.
+any_present_script = """
+    const xpaths = arguments[0];
+    const timeoutMs = arguments[1];
+    const done = arguments[arguments.length - 1];
+    const match = () => xpaths.findIndex(xpath => document.evaluate(
+        xpath, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue);
+    let finished = false;
+    let observer = null;
+    let hard = null;
+    const finish = (index) => {
+        if (finished) return;
+        finished = true;
+        if (observer) observer.disconnect();
+        clearTimeout(hard);
+        done(index);
+    };
+    const first = match();
+    if (first >= 0) { finish(first); return; }
+    observer = new MutationObserver(() => { const index = match(); if (index >= 0) finish(index); });
+    observer.observe(document.documentElement, {childList: true, subtree: true});
+    hard = setTimeout(() => finish(-1), timeoutMs);
+"""
+
+# Resolves once the subtree under a CSS selector has gone quietMs without any
+# mutation (the listings grid has finished re-rendering).
+dom_quiet_script = """
+    const selector = arguments[0];
+    const quietMs = arguments[1];
+    const timeoutMs = arguments[2];
+    const done = arguments[arguments.length - 1];
+    const target = document.querySelector(selector) || document.body;
+    let finished = false;
+    let quiet = null;
+    const finish = (ok) => {
+        if (finished) return;
+        finished = true;
+        observer.disconnect();
+        clearTimeout(quiet);
+        clearTimeout(hard);
+        done(ok);
+    };
+    const observer = new MutationObserver(() => {
+        clearTimeout(quiet);
+        quiet = setTimeout(() => finish(true), quietMs);
+    });
+    observer.observe(target, {childList: true, subtree: true, characterData: true});
+    quiet = setTimeout(() => finish(true), quietMs);
+    const hard = setTimeout(() => finish(false), timeoutMs);
+"""
+
+# Resolves once no new resource (XHR, fetch, script, ...) has completed for
+# idleMs, using the Resource Timing buffer as the record of finished requests.
+network_idle_script = """
+    const idleMs = arguments[0];
+    const timeoutMs = arguments[1];
+    const done = arguments[arguments.length - 1];
+    performance.setResourceTimingBufferSize(100000);
+    const started = performance.now();
+    let seen = performance.getEntriesByType('resource').length;
+    let lastChange = started;
+    const timer = setInterval(() => {
+        const now = performance.now();
+        const current = performance.getEntriesByType('resource').length;
+        if (current !== seen) {
+            seen = current;
+            lastChange = now;
+        }
+        if (now - lastChange >= idleMs) {
+            clearInterval(timer);
+            done(true);
+        } else if (now - started >= timeoutMs) {
+            clearInterval(timer);
+            done(false);
+        }
+    }, 50);
+"""
+
+class AdaptiveTimeout:
+    """
+    A timeout that follows the observed latency of one kind of wait.
+    Until enough samples are collected the initial value is used; afterwards
+    the timeout is the 95th percentile latency times headroom, kept within
+    [minimum, maximum].
+    """
+
+    def __init__(self, name, initial, minimum=1.0, maximum=30.0, headroom=2.0, window=100, min_samples=5):
+        self.name = name
+        self.initial = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.headroom = headroom
+        self.window = window
+        self.min_samples = min_samples
+        self.samples = []
+        self.lock = threading.Lock()
+
+    def observe(self, seconds):
+        with self.lock:
+            self.samples.append(seconds)
+            if len(self.samples) > self.window:
+                del self.samples[0]
+
+    def current(self):
+        with self.lock:
+            if len(self.samples) < self.min_samples:
+                return self.initial
+            ordered = sorted(self.samples)
+        p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+        return max(self.minimum, min(self.maximum, p95 * self.headroom))
+
+def resolve_timeout(timeout):
+    return timeout.current() if isinstance(timeout, AdaptiveTimeout) else timeout
+
+class WaitStats:
+    """Time spent in each kind of wait, to compare against total wall-clock time."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.started = time.time()
+            self.waits = {}
+
+    def record(self, label, seconds, ok):
+        with self.lock:
+            entry = self.waits.setdefault(label, {'count': 0, 'seconds': 0.0, 'timeouts': 0})
+            entry['count'] += 1
+            entry['seconds'] += seconds
+            if not ok:
+                entry['timeouts'] += 1
+
+    def report(self, workers=1):
+        """
+        Log waiting versus working time. With several workers the wall clock
+        is multiplied by the worker count, since each one waits independently.
+        """
+        with self.lock:
+            wall = (time.time() - self.started) * workers
+            waits = dict(self.waits)
+        waited = sum(entry['seconds'] for entry in waits.values())
+        share = waited / wall * 100 if wall > 0 else 0.0
+        logger.info("Wait report: %.1fs waiting, %.1fs working (%.0f%% waiting)", waited, max(wall - waited, 0.0), share)
+        for label, entry in sorted(waits.items()):
+            logger.info("  %s: %d waits, %.1fs total, %.2fs avg, %d timeouts", label, entry['count'], entry['seconds'],
+                        entry['seconds'] / entry['count'], entry['timeouts'])
+
+wait_stats = WaitStats()
+
+def _run_async(driver, timeout, script, *args):
+    """Run one of the wait scripts with the script timeout raised to cover it."""
+    seconds = resolve_timeout(timeout)
+    driver.set_script_timeout(seconds + 5)
+    started = time.time()
+    result = driver.execute_async_script(script, *args, int(seconds * 1000))
+    return result, started
+
+def _finish(label, timeout, started, ok):
+    elapsed = time.time() - started
+    wait_stats.record(label, elapsed, ok)
+    tracer.record('wait', elapsed, label=label, ok=ok)
+    if ok and isinstance(timeout, AdaptiveTimeout):
+        timeout.observe(elapsed)
+    return elapsed
+
+def wait_for_count_above(driver, xpath, count, timeout, label="count"):
+    """
+    Wait until more than `count` nodes match xpath. Returns the new count,
+    or None if the timeout expired first.
+    """
+    result, started = _run_async(driver, timeout, count_above_script, xpath, count)
+    _finish(label, timeout, started, result['ok'])
+    return result['count'] if result['ok'] else None
+
+def wait_for_any(driver, xpaths, timeout, label="presence"):
+    """
+    Wait until one of the XPaths matches. Returns the index of the first
+    XPath that matched, or None if the timeout expired first.
+    """
+    index, started = _run_async(driver, timeout, any_present_script, list(xpaths))
+    _finish(label, timeout, started, index >= 0)
+    return index if index >= 0 else None
+
+def wait_for_dom_quiet(driver, selector, quiet=0.3, timeout=5, label="dom quiet"):
+    """Wait until the subtree under selector has stopped changing for `quiet` seconds."""
+    ok, started = _run_async(driver, timeout, dom_quiet_script, selector, int(quiet * 1000))
+    _finish(label, timeout, started, ok)
+    return ok
+
+def wait_for_network_idle(driver, idle=0.5, timeout=10, label="network idle"):
+    """Wait until no request has completed for `idle` seconds."""
+    ok, started = _run_async(driver, timeout, network_idle_script, int(idle * 1000))
+    _finish(label, timeout, started, ok)
+    return ok
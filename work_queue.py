@@ -0,0 +1,548 @@
+"""
+Leased work items, so a crawl can be split across processes and machines.
+
+Each crawl is a generation with its own set of work items (states, cities,
+events). A worker works through an item in five steps:
+
+- it leases the item;
+- it heartbeats while it works, which keeps the lease alive;
+- it completes the item;
+- if the worker dies, the lease is not renewed and expires, and the next
+  worker that asks takes the item over, so nothing is lost;
+- if the item fails, it is released and comes back after a delay that
+  doubles with every attempt (retry_delay), until max_attempts;
+- an item can be completed only once per generation.
+
+When no item is left open, the generation is finished and the next run
+starts a new one. Finished generations stay on record; nothing is deleted
+to reset the crawl.
+
+Backends:
+- SQLiteWorkQueue keeps the items in the work_items and crawl_generations
+  tables of events.db. It serves any number of processes on one host.
+- KeyValueWorkQueue works on any store with the small part of the Redis API
+  it uses. That can be Redis itself (redis://host:port/db, needs the redis
+  package) or the stand-in server in this module (kv://host:port), which
+  needs nothing installed:
+
+    python work_queue.py serve --port 6380 --authkey secret
+    python main.py --workers 4 --queue kv://queue-host:6380 --queue-authkey secret
+"""
+import argparse
+import contextlib
+import json
+import os
+import random
+import socket
+import sqlite3
+import threading
+import time
+from multiprocessing.managers import BaseManager
+from urllib.parse import urlparse
+
+from db_writer import configure_connection
+from instrumentation import configure_logging, get_logger
+
+logger = get_logger('work_queue')
+
+default_lease_seconds = 120
+default_max_attempts = 3
+# Seconds between lease attempts while other workers still hold the remaining items
+poll_interval = 2.0
+# A failed item waits retry_backoff seconds before its second attempt, twice that before its third, ...
+retry_backoff = 15.0
+max_retry_backoff = 600.0
+
+def retry_delay(attempts):
+    """Seconds to wait after the given number of failed attempts, with +-20% jitter so retries spread out."""
+    return min(max_retry_backoff, retry_backoff * 2 ** max(attempts - 1, 0)) * random.uniform(0.8, 1.2)
+
+def node_owner(worker_id):
+    """Lease owner name for one worker of this process, unique across machines."""
+    return f"{socket.gethostname()}:{os.getpid()}:{worker_id}"
+
+class WorkItem:
+    def __init__(self, generation, kind, key, payload, owner, attempts=1):
+        self.generation = generation
+        self.kind = kind
+        self.key = key
+        self.payload = payload
+        self.owner = owner
+        self.attempts = attempts
+
+    def __repr__(self):
+        return f"WorkItem({self.kind} {self.key!r}, generation {self.generation}, attempt {self.attempts})"
+
+class WorkQueue:
+    """
+    Operations every backend implements:
+
+    begin_generation()            join the open generation of this queue name, or start one
+    enqueue(kind, key, payload)   add an item; False if the generation already has it
+    enqueue_many(kind, items)     add [(key, payload)] items; returns how many were new
+    lease(owner, kinds)           lease the oldest available item of the first kind that has one
+    heartbeat(item)               extend the lease; False if it was lost to another worker
+    complete(item)                mark done; False if another worker completed it first
+    release(item, failed=False)   give the item back; a failed one after retry_delay, or never after max_attempts
+    counts()                      {'open': n, 'done': n, 'failed': n}
+    finish_generation()           close the generation if nothing is open; True if closed
+    """
+
+    def __init__(self, name, lease_seconds=default_lease_seconds, max_attempts=default_max_attempts):
+        self.name = name
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.generation = None
+
+    def enqueue_many(self, kind, items):
+        return sum(1 for key, payload in items if self.enqueue(kind, key, payload))
+
+    def drained(self):
+        return self.counts()['open'] == 0
+
+    def next_item(self, owner, kinds, stop=None):
+        """
+        Lease the next item, waiting while other workers hold the last open
+        ones (their leases may still expire). Returns None once the generation
+        is drained, or when the stop event is set.
+        """
+        while stop is None or not stop.is_set():
+            item = self.lease(owner, kinds)
+            if item is not None:
+                return item
+            if self.drained():
+                return None
+            time.sleep(poll_interval)
+        return None
+
+    @contextlib.contextmanager
+    def keep_alive(self, item):
+        """Heartbeat the item's lease from a background thread while the block runs."""
+        done = threading.Event()
+
+        def beat():
+            while not done.wait(self.lease_seconds / 3):
+                if not self.heartbeat(item):
+                    logger.warning("Lease on %s was lost; another worker may take it over.", item)
+                    return
+
+        thread = threading.Thread(target=beat, name=f"heartbeat-{item.kind}", daemon=True)
+        thread.start()
+        try:
+            yield item
+        finally:
+            done.set()
+            thread.join()
+
+class SQLiteWorkQueue(WorkQueue):
+    """Work items in SQLite. Every thread gets its own connection; leases are taken inside BEGIN IMMEDIATE."""
+
+    def __init__(self, path, name, lease_seconds=default_lease_seconds, max_attempts=default_max_attempts):
+        super().__init__(name, lease_seconds, max_attempts)
+        self.path = path
+        self.local = threading.local()
+        conn = self.connection()
+        with conn:
+            conn.execute('''CREATE TABLE IF NOT EXISTS crawl_generations (
+                generation INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT,
+                started_at REAL,
+                finished_at REAL
+            )''')
+            conn.execute('''CREATE TABLE IF NOT EXISTS work_items (
+                generation INTEGER,
+                kind TEXT,
+                key TEXT,
+                payload TEXT,
+                status TEXT DEFAULT 'open',  -- open, done or failed
+                owner TEXT,
+                lease_expires REAL,
+                attempts INTEGER DEFAULT 0,
+                completed_at REAL,
+                PRIMARY KEY (generation, kind, key)
+            )''')
+            conn.execute('''CREATE INDEX IF NOT EXISTS idx_work_items_open
+                            ON work_items (generation, kind, status, lease_expires)''')
+
+    def connection(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            # Autocommit mode, so BEGIN IMMEDIATE can be issued explicitly
+            conn = configure_connection(sqlite3.connect(self.path, isolation_level=None))
+            self.local.conn = conn
+        return conn
+
+    @contextlib.contextmanager
+    def immediate(self):
+        """A write transaction that holds the lock from its first statement."""
+        conn = self.connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def begin_generation(self):
+        with self.immediate() as conn:
+            row = conn.execute('''SELECT generation FROM crawl_generations
+                                  WHERE name = ? AND finished_at IS NULL ORDER BY generation DESC LIMIT 1''',
+                               (self.name,)).fetchone()
+            if row:
+                self.generation = row[0]
+            else:
+                cursor = conn.execute("INSERT INTO crawl_generations (name, started_at) VALUES (?, ?)",
+                                      (self.name, time.time()))
+                self.generation = cursor.lastrowid
+        return self.generation
+
+    def enqueue(self, kind, key, payload=None):
+        cursor = self.connection().execute(
+            "INSERT OR IGNORE INTO work_items (generation, kind, key, payload) VALUES (?, ?, ?, ?)",
+            (self.generation, kind, key, json.dumps(payload or {})))
+        return cursor.rowcount == 1
+
+    def enqueue_many(self, kind, items):
+        with self.immediate() as conn:
+            before = conn.total_changes
+            conn.executemany("INSERT OR IGNORE INTO work_items (generation, kind, key, payload) VALUES (?, ?, ?, ?)",
+                             ((self.generation, kind, key, json.dumps(payload or {})) for key, payload in items))
+            return conn.total_changes - before
+
+    def lease(self, owner, kinds):
+        now = time.time()
+        with self.immediate() as conn:
+            for kind in kinds:
+                row = conn.execute('''SELECT rowid, key, payload, attempts FROM work_items
+                                      WHERE generation = ? AND kind = ? AND status = 'open'
+                                        AND (lease_expires IS NULL OR lease_expires < ?)
+                                      ORDER BY rowid LIMIT 1''', (self.generation, kind, now)).fetchone()
+                if row:
+                    rowid, key, payload, attempts = row
+                    conn.execute("UPDATE work_items SET owner = ?, lease_expires = ?, attempts = attempts + 1 WHERE rowid = ?",
+                                 (owner, now + self.lease_seconds, rowid))
+                    return WorkItem(self.generation, kind, key, json.loads(payload), owner, attempts + 1)
+        return None
+
+    def heartbeat(self, item):
+        cursor = self.connection().execute(
+            '''UPDATE work_items SET lease_expires = ?
+               WHERE generation = ? AND kind = ? AND key = ? AND owner = ? AND status = 'open' ''',
+            (time.time() + self.lease_seconds, item.generation, item.kind, item.key, item.owner))
+        return cursor.rowcount == 1
+
+    def complete(self, item):
+        cursor = self.connection().execute(
+            '''UPDATE work_items SET status = 'done', completed_at = ?, lease_expires = NULL
+               WHERE generation = ? AND kind = ? AND key = ? AND status = 'open' ''',
+            (time.time(), item.generation, item.kind, item.key))
+        return cursor.rowcount == 1
+
+    def release(self, item, failed=False):
+        status = 'failed' if failed and item.attempts >= self.max_attempts else 'open'
+        # An unowned lease that has not expired yet keeps a failed item back until its retry is due
+        available_at = time.time() + retry_delay(item.attempts) if failed and status == 'open' else None
+        self.connection().execute(
+            '''UPDATE work_items SET status = ?, owner = NULL, lease_expires = ?
+               WHERE generation = ? AND kind = ? AND key = ? AND owner = ? AND status = 'open' ''',
+            (status, available_at, item.generation, item.kind, item.key, item.owner))
+
+    def counts(self):
+        counts = {'open': 0, 'done': 0, 'failed': 0}
+        for status, count in self.connection().execute(
+                "SELECT status, COUNT(*) FROM work_items WHERE generation = ? GROUP BY status", (self.generation,)):
+            counts[status] = count
+        return counts
+
+    def finish_generation(self):
+        with self.immediate() as conn:
+            still_open = conn.execute("SELECT 1 FROM work_items WHERE generation = ? AND status = 'open' LIMIT 1",
+                                      (self.generation,)).fetchone()
+            if still_open:
+                return False
+            conn.execute("UPDATE crawl_generations SET finished_at = ? WHERE generation = ? AND finished_at IS NULL",
+                         (time.time(), self.generation))
+        return True
+
+class KeyValueWorkQueue(WorkQueue):
+    """
+    Work items in a Redis-like store. Keys, with p = "<name>:<generation>":
+
+      <name>:generations, <name>:current   generation counter and the open generation
+      p:items        hash "kind|key" -> JSON payload (HSETNX makes enqueue idempotent)
+      p:open:<kind>  sorted set of open items, scored by enqueue order
+      p:lease:<kind|key>  lease owner, SET NX with an expiry, so an expired lease simply disappears;
+                          "retry" while a failed item waits for its retry_delay
+      p:attempts     hash of lease counts;  p:done / p:failed  sets
+    """
+
+    def __init__(self, store, name, lease_seconds=default_lease_seconds, max_attempts=default_max_attempts,
+                 scan_batch=50):
+        super().__init__(name, lease_seconds, max_attempts)
+        self.store = store
+        self.scan_batch = scan_batch
+        self.kinds_seen = set()
+
+    def prefix(self, generation=None):
+        return f"{self.name}:{self.generation if generation is None else generation}"
+
+    def begin_generation(self):
+        current = self.store.get(f"{self.name}:current")
+        if current is None:
+            candidate = self.store.incr(f"{self.name}:generations")
+            self.store.set(f"{self.name}:current", candidate, nx=True)
+            current = self.store.get(f"{self.name}:current")
+        self.generation = int(current)
+        return self.generation
+
+    def enqueue(self, kind, key, payload=None):
+        prefix = self.prefix()
+        member = f"{kind}|{key}"
+        if not self.store.hsetnx(f"{prefix}:items", member, json.dumps(payload or {})):
+            return False
+        self.store.sadd(f"{prefix}:kinds", kind)
+        self.store.zadd(f"{prefix}:open:{kind}", {member: self.store.incr(f"{prefix}:sequence")})
+        return True
+
+    def lease(self, owner, kinds):
+        prefix = self.prefix()
+        lease_ms = int(self.lease_seconds * 1000)
+        for kind in kinds:
+            start = 0
+            while True:
+                members = self.store.zrange(f"{prefix}:open:{kind}", start, start + self.scan_batch - 1)
+                if not members:
+                    break
+                for member in members:
+                    if not self.store.set(f"{prefix}:lease:{member}", owner, nx=True, px=lease_ms):
+                        continue
+                    # Completed between the scan and the lease
+                    if self.store.zscore(f"{prefix}:open:{kind}", member) is None:
+                        self.store.delete(f"{prefix}:lease:{member}")
+                        continue
+                    attempts = self.store.hincrby(f"{prefix}:attempts", member, 1)
+                    payload = self.store.hget(f"{prefix}:items", member)
+                    return WorkItem(self.generation, kind, member.split('|', 1)[1], json.loads(payload), owner, attempts)
+                start += self.scan_batch
+        return None
+
+    def heartbeat(self, item):
+        lease_key = f"{self.prefix(item.generation)}:lease:{item.kind}|{item.key}"
+        if self.store.get(lease_key) != item.owner:
+            return False
+        return bool(self.store.pexpire(lease_key, int(self.lease_seconds * 1000)))
+
+    def complete(self, item):
+        prefix = self.prefix(item.generation)
+        member = f"{item.kind}|{item.key}"
+        completed = self.store.zrem(f"{prefix}:open:{item.kind}", member) == 1
+        if completed:
+            self.store.sadd(f"{prefix}:done", member)
+        self.store.delete(f"{prefix}:lease:{member}")
+        return completed
+
+    def release(self, item, failed=False):
+        prefix = self.prefix(item.generation)
+        member = f"{item.kind}|{item.key}"
+        if self.store.get(f"{prefix}:lease:{member}") != item.owner:
+            return
+        if failed and item.attempts >= self.max_attempts and self.store.zrem(f"{prefix}:open:{item.kind}", member):
+            self.store.sadd(f"{prefix}:failed", member)
+        elif failed:
+            # The lease key stays taken until the retry is due
+            self.store.set(f"{prefix}:lease:{member}", 'retry', px=int(retry_delay(item.attempts) * 1000))
+            return
+        self.store.delete(f"{prefix}:lease:{member}")
+
+    def counts(self):
+        prefix = self.prefix()
+        kinds = self.store.smembers(f"{prefix}:kinds")
+        return {
+            'open': sum(self.store.zcard(f"{prefix}:open:{kind}") for kind in kinds),
+            'done': self.store.scard(f"{prefix}:done"),
+            'failed': self.store.scard(f"{prefix}:failed"),
+        }
+
+    def finish_generation(self):
+        if not self.drained():
+            return False
+        self.store.set(f"{self.prefix()}:finished", time.time())
+        if self.store.get(f"{self.name}:current") == str(self.generation):
+            self.store.delete(f"{self.name}:current")
+        return True
+
+class MemoryStore:
+    """
+    The part of the Redis API that KeyValueWorkQueue uses, in memory and
+    thread-safe. Values come back as strings, like a redis-py client with
+    decode_responses=True. Served to other processes by `serve`.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.data = {}
+        self.expires = {}
+
+    def _live(self, name):
+        expires = self.expires.get(name)
+        if expires is not None and expires <= time.time():
+            self.data.pop(name, None)
+            self.expires.pop(name, None)
+        return self.data.get(name)
+
+    def get(self, name):
+        with self.lock:
+            return self._live(name)
+
+    def set(self, name, value, nx=False, px=None):
+        with self.lock:
+            if nx and self._live(name) is not None:
+                return None
+            self.data[name] = str(value)
+            if px is None:
+                self.expires.pop(name, None)
+            else:
+                self.expires[name] = time.time() + px / 1000
+            return True
+
+    def pexpire(self, name, milliseconds):
+        with self.lock:
+            if self._live(name) is None:
+                return False
+            self.expires[name] = time.time() + milliseconds / 1000
+            return True
+
+    def delete(self, *names):
+        with self.lock:
+            deleted = 0
+            for name in names:
+                if self._live(name) is not None:
+                    deleted += 1
+                self.data.pop(name, None)
+                self.expires.pop(name, None)
+            return deleted
+
+    def incr(self, name):
+        with self.lock:
+            value = int(self._live(name) or 0) + 1
+            self.data[name] = str(value)
+            return value
+
+    def hsetnx(self, name, key, value):
+        with self.lock:
+            mapping = self.data.setdefault(name, {})
+            if key in mapping:
+                return 0
+            mapping[key] = str(value)
+            return 1
+
+    def hget(self, name, key):
+        with self.lock:
+            return self.data.get(name, {}).get(key)
+
+    def hincrby(self, name, key, amount=1):
+        with self.lock:
+            mapping = self.data.setdefault(name, {})
+            mapping[key] = str(int(mapping.get(key, 0)) + amount)
+            return int(mapping[key])
+
+    def zadd(self, name, mapping):
+        with self.lock:
+            scores = self.data.setdefault(name, {})
+            added = sum(1 for member in mapping if member not in scores)
+            scores.update({member: float(score) for member, score in mapping.items()})
+            return added
+
+    def zrange(self, name, start, end):
+        with self.lock:
+            ordered = sorted(self.data.get(name, {}).items(), key=lambda item: (item[1], item[0]))
+            return [member for member, _ in ordered[start:end + 1 if end != -1 else None]]
+
+    def zscore(self, name, member):
+        with self.lock:
+            return self.data.get(name, {}).get(member)
+
+    def zrem(self, name, *members):
+        with self.lock:
+            scores = self.data.get(name, {})
+            return sum(1 for member in members if scores.pop(member, None) is not None)
+
+    def zcard(self, name):
+        with self.lock:
+            return len(self.data.get(name, {}))
+
+    def sadd(self, name, *members):
+        with self.lock:
+            values = self.data.setdefault(name, set())
+            added = len(set(members) - values)
+            values.update(members)
+            return added
+
+    def smembers(self, name):
+        with self.lock:
+            return set(self.data.get(name, set()))
+
+    def scard(self, name):
+        with self.lock:
+            return len(self.data.get(name, set()))
+
+class StoreManager(BaseManager):
+    pass
+
+def serve(host, port, authkey):
+    """Serve one MemoryStore to KeyValueWorkQueue clients on other processes or machines."""
+    store = MemoryStore()
+    StoreManager.register('store', callable=lambda: store)
+    manager = StoreManager(address=(host, port), authkey=authkey.encode())
+    logger.info("Serving the work queue store on %s:%d", host, port)
+    manager.get_server().serve_forever()
+
+def connect_store(host, port, authkey):
+    StoreManager.register('store')
+    manager = StoreManager(address=(host, port), authkey=authkey.encode())
+    manager.connect()
+    return manager.store()
+
+def open_queue(queue_url, database_path, name, lease_seconds=default_lease_seconds, authkey='viagogo'):
+    """
+    The work queue for queue_url:
+        None or sqlite:///path.db   SQLite (database_path if no path is given)
+        kv://host:port              the stand-in server started with `python work_queue.py serve`
+        redis://host:port/db        Redis (needs the redis package)
+    """
+    parsed = urlparse(queue_url or 'sqlite://')
+    if parsed.scheme == 'sqlite':
+        # sqlite:///events.db is relative, sqlite:////data/events.db absolute
+        return SQLiteWorkQueue(parsed.path[1:] or database_path, name, lease_seconds)
+    if parsed.scheme == 'kv':
+        return KeyValueWorkQueue(connect_store(parsed.hostname, parsed.port or 6380, authkey), name, lease_seconds)
+    if parsed.scheme in ('redis', 'rediss'):
+        try:
+            import redis
+        except ImportError:
+            raise SystemExit("A redis:// queue needs the redis package (pip install redis); use kv:// for the stand-in server.")
+        return KeyValueWorkQueue(redis.Redis.from_url(queue_url, decode_responses=True), name, lease_seconds)
+    raise ValueError(f"Unsupported work queue URL: {queue_url}")
+
+def add_arguments(parser):
+    """The work queue options shared by main.py and tickets.py."""
+    parser.add_argument('--queue', metavar='URL',
+                        help="Work queue shared by every node: sqlite:///path.db (default: the events database), "
+                             "kv://host:port (python work_queue.py serve) or redis://host:port/0")
+    parser.add_argument('--queue-authkey', default='viagogo', help="Key for a kv:// queue server")
+    parser.add_argument('--lease', type=float, default=default_lease_seconds,
+                        help="Seconds a work item stays leased without a heartbeat before another node may take it")
+
+def queue_from_args(args, database_path, name):
+    return open_queue(args.queue, database_path, name, args.lease, args.queue_authkey)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the stand-in work queue server shared by crawl nodes.")
+    parser.add_argument('command', choices=['serve'])
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=6380)
+    parser.add_argument('--authkey', default='viagogo')
+    args = parser.parse_args()
+    configure_logging('INFO')
+    serve(args.host, args.port, args.authkey)
@@ -0,0 +1,117 @@
+"""
+Persistent cache of zone and VIP status per venue and section.
+
+Reading a listing's zone means clicking it, waiting for the dialog and
+closing it again, and the answer almost never changes for a given venue and
+section. ZoneCache keeps those answers in the zone_cache table so the dialog
+only opens for sections it has not seen, and counts hits so a run can report
+how many clicks were saved.
+"""
+import re
+import threading
+import time
+
+from instrumentation import get_logger
+
+logger = get_logger('zone_cache')
+
+# "Section 101", "Section FLR3", "Suite 12", "Box A"
+section_pattern = re.compile(r'\b(Section|Suite|Box|Loge|Table)\s+([A-Za-z0-9][A-Za-z0-9-]*)', re.IGNORECASE)
+
+upsert_zone_sql = '''INSERT INTO zone_cache (venue, section, zone, is_vip, hits, updated_at)
+                     VALUES (?, ?, ?, ?, 0, ?)
+                     ON CONFLICT (venue, section) DO UPDATE SET zone = excluded.zone, is_vip = excluded.is_vip,
+                                                                updated_at = excluded.updated_at'''
+add_hits_sql = 'UPDATE zone_cache SET hits = hits + ? WHERE venue = ? AND section = ?'
+
+def setup_zone_cache_table(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS zone_cache (
+            venue TEXT,
+            section TEXT,
+            zone TEXT,
+            is_vip INTEGER,
+            hits INTEGER DEFAULT 0,  -- Dialog opens saved by this entry, across runs
+            updated_at REAL,
+            PRIMARY KEY (venue, section)
+        )
+    ''')
+    conn.commit()
+
+def parse_section(raw_ticket_name):
+    """Return the section label of a listing ("Section 101"), or None if the name has none."""
+    if not raw_ticket_name:
+        return None
+    match = section_pattern.search(raw_ticket_name)
+    if not match:
+        return None
+    return f"{match.group(1).title()} {match.group(2).upper()}"
+
+def venue_key(event_location):
+    return " ".join(event_location.split()).lower() if event_location else None
+
+class ZoneCache:
+    """
+    Lookups are served from memory. New entries and hit counts are written
+    through the DatabaseWriter; hit counts are added up at flush_hits().
+    """
+
+    def __init__(self, conn, writer):
+        setup_zone_cache_table(conn)
+        self.writer = writer
+        self.lock = threading.Lock()
+        self.entries = {
+            (venue, section): (zone, is_vip)
+            for venue, section, zone, is_vip in conn.execute('SELECT venue, section, zone, is_vip FROM zone_cache')
+        }
+        self.pending_hits = {}
+        self.hits = 0
+        self.misses = 0
+        self.uncacheable = 0
+
+    def _key(self, event_location, raw_ticket_name):
+        venue = venue_key(event_location)
+        section = parse_section(raw_ticket_name)
+        if venue is None or section is None:
+            return None
+        return venue, section
+
+    def lookup(self, event_location, raw_ticket_name):
+        """Return (zone, is_vip) for the listing's venue and section, or None if the dialog must be opened."""
+        key = self._key(event_location, raw_ticket_name)
+        with self.lock:
+            if key is None:
+                self.uncacheable += 1
+                return None
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.pending_hits[key] = self.pending_hits.get(key, 0) + 1
+            return entry
+
+    def store(self, event_location, raw_ticket_name, zone, is_vip):
+        key = self._key(event_location, raw_ticket_name)
+        # An empty zone means the dialog did not load; do not remember that
+        if key is None or not zone:
+            return
+        with self.lock:
+            if self.entries.get(key) == (zone, is_vip):
+                return
+            self.entries[key] = (zone, is_vip)
+        self.writer.write(upsert_zone_sql, (key[0], key[1], zone, is_vip, time.time()))
+
+    def flush_hits(self):
+        with self.lock:
+            pending, self.pending_hits = self.pending_hits, {}
+        for (venue, section), hits in pending.items():
+            self.writer.write(add_hits_sql, (hits, venue, section))
+
+    def report(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            hit_rate = self.hits / lookups * 100 if lookups else 0.0
+            logger.info("Zone cache: %d hits, %d misses (%.0f%% hit rate), %d listings without venue/section, "
+                        "%d entries. Saved %d dialog clicks.", self.hits, self.misses, hit_rate, self.uncacheable,
+                        len(self.entries), self.hits)